@@ -21,10 +21,56 @@ __gg_setup()
 
 	GG_CFGDIR=${GG_CFGDIR:-$xdg_config_home/git-clone-completion}
 	GG_CACHEDIR=${GG_CACHEDIR:-$xdg_cache_home/git-clone-completion}
+
+	# where this script lives (used to launch the daemon and other
+	# helpers as separate processes)
+	__gg_script=${BASH_SOURCE[0]}
+	[[ $__gg_script != /* ]] && __gg_script="$PWD/$__gg_script"
 }
 __gg_setup
 unset -f __gg_setup
 
+# are we being executed (as opposed to sourced)? see the end of the file.
+__gg_executed=
+[[ "${BASH_SOURCE[0]}" == "$0" ]] && { __gg_executed=1; GG_SILENT=1; }
+
+#
+# Lazy loading. Parsing the rest of this file, checking for jq and patching
+# git's completion costs every new shell some time, though most will never
+# complete a `git clone`. With GG_LAZY=1 set before sourcing, we only
+# register completion hooks for git and git-get here; the first TAB after
+# either loads the rest, and hands that completion on to the real thing.
+#
+if [[ -n $GG_LAZY && -z $__gg_executed ]]; then
+	__gg_lazy_complete()
+	{
+		unset -f __gg_lazy_complete
+
+		# (nothing is declared at the top level of the script without
+		# -g, so what it defines ends up global even though we source it
+		# from a function. warnings would land in the middle of the command
+		# line, so we keep quiet.)
+		local GG_LAZY= GG_SILENT=1
+		source "$__gg_script"
+
+		# give git back to git's completion (or to our standalone one
+		# if there isn't any; see "Install completions"), and pass this
+		# completion on
+		local fn=_git
+		declare -F __git_wrap__git_main >/dev/null && fn=__git_wrap__git_main
+		complete -o bashdefault -o default -o nospace -F "$fn" git 2>/dev/null \
+			|| complete -o default -o nospace -F "$fn" git
+		[[ ${1##*/} == git-get ]] && fn=_git_get
+		"$fn" "$@"
+	}
+
+	complete -o bashdefault -o default -o nospace -F __gg_lazy_complete git 2>/dev/null \
+		|| complete -o default -o nospace -F __gg_lazy_complete git
+	complete -o bashdefault -o default -o nospace -F __gg_lazy_complete git-get 2>/dev/null \
+		|| complete -o default -o nospace -F __gg_lazy_complete git-get
+	return 0
+fi
+
 #############################
 #                           #
 #    Completion utilities   #
@@ -180,8 +226,8 @@ __arg_index()
 	# returned list of positional arguments
 	_posargs=( "${words[0]}" )
 
-	local c p i o idx=0
-	for i in $(seq 1 $cword); do
+	local c p i o=1 idx=0
+	for (( i = 1; i <= cword; i++ )); do
 		p=${words[i-1]}	# previous word
 		c=${words[i]}	# current word
 		o=1			# was this word an option (begin by assuming it was)?
@@ -190,7 +236,7 @@ __arg_index()
 		[[ $c == -* ]] && continue
 
 		# an argument of a previously specified option
-		[[ $p == -* && $p != -*=* ]] && (echo "$@" | grep -qw -- "$p=") && continue
+		[[ $p == -* && $p != -*=* && " $* " == *[[:space:]]"$p="[[:space:]]* ]] && continue
 
 		# a positional argument
 		o=0
@@ -202,36 +248,215 @@ __arg_index()
 	[[ $o == 0 ]] && _argidx=$idx || _argidx=
 }
 
-# find and echo the common prefix of passed arguments
+# find the common prefix of passed arguments, and store it into
+# the variable named by $1
 # inspired by https://stackoverflow.com/a/28647824
 __mj_common_prefix()
 {
+	local __var="$1"
+	shift
+	printf -v "$__var" ''
 	[[ $# -eq 0 ]] && return 0
 
-	local first prefix v
-	first="$1"
+	local __first __prefix __v __i
+	__first="$1"
 	shift
-	for ((i = 0; i < ${#first}; ++i)); do
-		prefix=${first:0:i+1}
-		_dbg "PREFIX: $prefix"
-		for v; do
-			if [[ ${v:0:i+1} != "$prefix" ]]; then
-				echo "${first:0:i}"
+	for ((__i = 0; __i < ${#__first}; ++__i)); do
+		__prefix=${__first:0:__i+1}
+		for __v; do
+			if [[ ${__v:0:__i+1} != "$__prefix" ]]; then
+				printf -v "$__var" '%s' "${__first:0:__i}"
 				return
 			fi
 		done
 	done
 
-	echo "$first"
+	printf -v "$__var" '%s' "$__first"
 }
 
 #
 # debugging utility. set GG_DEBUG="$HOME/_completion.log" and run
 # `tail -f $GG_DEBUG` to observe what's going on.
 #
+# note: the arguments are expanded even when debugging is off, so guard
+# calls that are expensive to build (or in loops) with
+# `[[ -n $GG_DEBUG ]] && _dbg ...`
+#
 _dbg()
 {
-	[[ -n $GG_DEBUG ]] && echo "[$(date)]" "$@" >> "$GG_DEBUG"
+	[[ -n $GG_DEBUG ]] || return 0
+
+	local ts
+	if (( BASH_VERSINFO[0] > 4 || (BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] >= 2) )); then
+		printf -v ts '%(%c)T' -1
+	else
+		ts=$(date)
+	fi
+	echo "[$ts]" "$@" >> "$GG_DEBUG"
+}
+
+#
+# Tracing. Set GG_TRACE to a file name, and every completion appends
+# JSON lines describing how long each of its phases took:
+#
+#    {"t":1700000000123456,"pid":123,"span":"cache_read","depth":1,"dur_us":812,"repos":"20"}
+#
+# where t is the start time (microseconds since the epoch), depth the
+# nesting level, and any further keys are span-specific attributes.
+# gg-trace-report summarizes them. Phases are wrapped as:
+#
+#    _trace_begin <span>
+#    ...
+#    _trace_end <span> [key=value ...]
+#
+# With GG_TRACE unset, these cost a function call and a test. Timings use
+# $EPOCHREALTIME (bash 5+); older versions of bash only have a resolution
+# of a second (and fork, on bash < 4.2).
+#
+
+# __gg_now_us: store microseconds since the epoch into $__now_us
+__gg_now_us()
+{
+	if [[ -n $EPOCHREALTIME ]]; then
+		__now_us=${EPOCHREALTIME/[.,]/}
+	else
+		local __now
+		__gg_now
+		__now_us=${__now}000000
+	fi
+}
+
+# _trace_begin <span>
+_trace_begin()
+{
+	[[ -n $GG_TRACE ]] || return 0
+
+	local __now_us
+	__gg_now_us
+	__gg_trace_stack[${#__gg_trace_stack[@]}]="$1 $__now_us"
+}
+
+# _trace_end <span> [key=value ...]
+_trace_end()
+{
+	[[ -n $GG_TRACE ]] || return 0
+
+	local __now_us
+	__gg_now_us
+
+	# pop the stack down to <span> (spans left open by early returns are
+	# dropped)
+	local n=${#__gg_trace_stack[@]} top=
+	while (( n-- > 0 )); do
+		top=${__gg_trace_stack[n]}
+		unset "__gg_trace_stack[n]"
+		[[ ${top%% *} == "$1" ]] && break
+		top=
+	done
+	[[ -n $top ]] || return 0
+
+	local start=${top#* } span="$1" attrs= kv
+	shift
+	for kv; do
+		kv=${kv//\\/\\\\}
+		kv=${kv//\"/\\\"}
+		attrs+=",\"${kv%%=*}\":\"${kv#*=}\""
+	done
+
+	printf '{"t":%s,"pid":%s,"span":"%s","depth":%d,"dur_us":%d%s}\n' \
+		"$start" "${BASHPID:-$$}" "$span" "$n" $(( __now_us - start )) "$attrs" >> "$GG_TRACE"
+}
+
+#
+# gg-trace-report [trace_file]
+#
+# summarize a trace (default: $GG_TRACE): for each span, the number of
+# times it ran, total, mean, median, 90th percentile and maximum time (in
+# milliseconds), and its share of the total time spent completing. Note
+# that spans that ran in the background (e.g., "fetch") can add up to
+# more than 100%.
+#
+gg-trace-report()
+{
+	local trace="${1:-$GG_TRACE}"
+	[[ -f "$trace" ]] || { echo "usage: gg-trace-report <trace_file> (or set GG_TRACE)" 1>&2; return 1; }
+
+	printf '%-14s %7s %10s %7s %9s %9s %9s %9s\n' span count "total ms" share "mean ms" "p50 ms" "p90 ms" "max ms"
+
+	# extract "span duration", sort by span then duration, and compute the
+	# statistics one span at a time. the share is relative to the total
+	# time of the "complete" spans (one per TAB press).
+	awk '
+		function field(name,    m) {
+			if (!match($0, "\"" name "\":\"?[^,\"}]*")) return ""
+			m = substr($0, RSTART + length(name) + 3, RLENGTH - length(name) - 3)
+			sub(/^"/, "", m)
+			return m
+		}
+		{ print field("span"), field("dur_us") }
+	' "$trace" | LC_ALL=C sort -k1,1 -k2,2n | awk '
+		# nearest-rank percentile of the (sorted) durations
+		function pct(q,    i) {
+			i = int(q * n)
+			if (i < q * n) i++
+			return d[i < 1 ? 1 : i]
+		}
+		function flush() {
+			if (!n) return
+			line[++nspans] = sprintf("%-14s %7d %10.1f %%6.1f%%%% %9.2f %9.2f %9.2f %9.2f", \
+				span, n, sum / 1000, sum / n / 1000, pct(0.5) / 1000, pct(0.9) / 1000, d[n] / 1000)
+			tot[nspans] = sum
+			n = sum = 0
+		}
+		$1 != span { flush(); span = $1 }
+		{ d[++n] = $2; sum += $2; if ($1 == "complete") outer += $2 }
+		END {
+			flush()
+			for (i = 1; i <= nspans; i++)
+				printf line[i] "\n", outer ? 100 * tot[i] / outer : 0
+		}
+	' | LC_ALL=C sort -k3,3nr
+}
+
+#
+# __gg_now: store the current time (seconds since the epoch) into $__now,
+# without forking if the version of bash allows it. Callers should declare
+# `local __now` to avoid leaking it into the environment.
+#
+__gg_now()
+{
+	if (( BASH_VERSINFO[0] > 4 || (BASH_VERSINFO[0] == 4 && BASH_VERSINFO[1] >= 2) )); then
+		printf -v __now '%(%s)T' -1
+	else
+		__now=$(date +%s)
+	fi
+}
+
+#
+# __gg_now_ms: like __gg_now, but store milliseconds since the epoch into
+# $__now_ms. With bash < 5 (no $EPOCHREALTIME), the resolution is a second.
+#
+__gg_now_ms()
+{
+	if [[ -n $EPOCHREALTIME ]]; then
+		__now_ms=${EPOCHREALTIME/[.,]/}
+		__now_ms=${__now_ms%???}
+	else
+		local __now
+		__gg_now
+		__now_ms=$(( __now * 1000 ))
+	fi
+}
+
+#
+# __gg_isodate <seconds_since_epoch>
+#
+# print the time in ISO 8601 format (UTC), as expected by the APIs
+#
+__gg_isodate()
+{
+	# GNU, then BSD date
+	date -u -d "@$1" +%Y-%m-%dT%H:%M:%SZ 2>/dev/null || date -u -r "$1" +%Y-%m-%dT%H:%M:%SZ
 }
 
 # _msg <warning|error> <text>
@@ -320,13 +545,14 @@ __mj_ltrim_completions()
 	# find the longest prefix delimited by a char in $nobreak
 	# that also appears in $COMP_WORDBREAKS
 	local prefix=
-	local c char
-	while read -r -n1 c; do
+	local c char j try
+	for (( j = 0; j < ${#nobreak}; j++ )); do
+		c=${nobreak:j:1}
 		[[ "$COMP_WORDBREAKS" != *"$c"* ]] && continue
 
-		local try=${1%"${1##*$c}"}     # "
+		try=${1%"${1##*$c}"}     # "
 		[[ "${#try}" -gt "${#prefix}" ]] && { prefix="$try"; char=$c; }
-	done < <(echo -n "$nobreak")
+	done
 
 	# bugfix for bash 3.2 (macOS): leave the delimiter if it's not ':'
 	[[ "$char" != ':' ]] && prefix=${prefix%"$char"}
@@ -337,8 +563,7 @@ __mj_ltrim_completions()
 		COMPREPLY[$i]=${COMPREPLY[$i]#"$prefix"}
 	done
 
-	_dbg "input=$1 || prefix=$prefix || char=$char"
-	_dbg COMPREPLY="${COMPREPLY[*]}"
+	[[ -n $GG_DEBUG ]] && _dbg "input=$1 || prefix=$prefix || char=$char" && _dbg COMPREPLY="${COMPREPLY[*]}"
 }
 
 #
@@ -363,24 +588,32 @@ __mj_ltrim_completions()
 _fancy_autocomplete()
 {
 
-	# a single or no completions: bash will autocomplete
-	[[ ${#COMPREPLY[@]} -le 1 ]] && return
+	# a single or no completions: bash will autocomplete. (unless they
+	# come from a partial list of repositories; see below)
+	[[ ${#COMPREPLY[@]} == 0 ]] && return
+	[[ ${#COMPREPLY[@]} == 1 && -z $REPOS_PARTIAL ]] && return
 
 	# check if the completions share a common prefix, and if
 	# that prefix is longer than what's been typed so far. if so,
 	# bash will autocomplete up to that prefix and not show the
-	# suggestions (so send it the autocompletion text).
-	local prefix
-	prefix=$(__mj_common_prefix "${COMPREPLY[@]}")
-
-	# bugfix for bash 3.2 (macOS): the delimiter is a part of the word if it's not ':'
-	local curtrm="${cur#*[$COMP_WORDBREAKS]}"
-	local len="${#curtrm}"
-	local char="${cur:(-len-1):1}"
-	[[ "$char" != ':' ]] && curtrm="$char$curtrm"
-	#
+	# suggestions (so send it the autocompletion text). fuzzy
+	# matches (see _complete_fragment) needn't begin with what's been
+	# typed, and a partial list (see _get_repo_list) may be missing the
+	# repositories that don't share the prefix, so with those the
+	# suggestions are always shown.
+	if [[ ${fuzzy_hits:-0} == 0 && -z $REPOS_PARTIAL ]]; then
+		local prefix
+		__mj_common_prefix prefix "${COMPREPLY[@]}"
+
+		# bugfix for bash 3.2 (macOS): the delimiter is a part of the word if it's not ':'
+		local curtrm="${cur#*[$COMP_WORDBREAKS]}"
+		local len="${#curtrm}"
+		local char="${cur:(-len-1):1}"
+		[[ "$char" != ':' ]] && curtrm="$char$curtrm"
+		#
 
-	[[ "$prefix" != "$curtrm" ]] && return
+		[[ "$prefix" != "$curtrm" ]] && return
+	fi
 
 	# Not possible to autocomplete beyond what's currently been
 	# typed, so bash will show suggestions. Send the human-readable
@@ -413,8 +646,13 @@ _colon_autocomplete()
 {
 	# save the human form
 	local compreply=("${COMPREPLY[@]}")
+	_trace_begin ltrim
 	__mj_ltrim_completions "$cur"
+	_trace_end ltrim
+
+	_trace_begin fancy
 	_fancy_autocomplete
+	_trace_end fancy "replies=${#COMPREPLY[@]}"
 }
 
 
@@ -439,58 +677,62 @@ _colon_autocomplete()
 # when it gets the results from the cache).
 #
 
-# the directory where the spinner will create start/stop flags
-__spinflagdir="$GG_CACHEDIR"
-__spinflag="${__spinflagdir}/spinflag.$$"
-__inspin="${__spinflagdir}/inspin.$$"
+# The spinner runs in a process substitution, read by the shell on
+# descriptor 215. It first reports its pid there, and then 'drawn' once
+# it's put something on the screen. To stop it, we kill it, read the pipe
+# until it's closed (i.e., the spinner is gone), and erase what it drew.
+# Nothing polls, and stopping a spinner that hasn't shown yet costs
+# no waiting at all.
+__spinpid=
 
 # The function that draws the spinner, run in a subprocess.
 # Properties:
 #   - begins showing the spinner only after a ~second has passed
-#   - runs as long as $__spinflag is set (set by start_spinner, removed by stop_spinner)
-#   - signals it's finished running by removing $__inspin (checked by stop_spinner)
+#   - runs until killed (by stop_spinner)
+#   - reports its pid, and whether it drew anything, on its standard output
 spin_wait()
 {
 	# wait with spinner (pattern from https://github.com/swelljoe/spinner/blob/master/spinner.sh)
 	local -a marks=(⠋ ⠙ ⠹ ⠸ ⠼ ⠴ ⠦ ⠧ ⠇ ⠏)
 	local i=0
-	local spinstart=10
 
-	while [[ -f "${__spinflag}" ]]; do
-		if [[ $i -ge $spinstart ]]; then
-			# show the spinner if we've waited for longer than a second
-			[[ $i -eq $spinstart ]] && printf '  ' >&2
-			printf '\b\b%s ' "${marks[i % ${#marks[@]}]}" >&2
-		fi
-		sleep 0.1
+	echo "${BASHPID:-$(exec sh -c 'echo $PPID')}"
+
+	# show the spinner only if we've waited for longer than a second.
+	# (sleep mustn't hold on to the pipe once we're killed.)
+	sleep 1 >/dev/null
+	while :; do
+		[[ $i -eq 0 ]] && { printf '  ' >&2; echo drawn; }
+		printf '\b\b%s ' "${marks[i % ${#marks[@]}]}" >&2
 		(( i++ ))
+		sleep 0.1 >/dev/null
 	done
-	[[ $i -gt $spinstart ]] && printf '\b\b  \b\b' >&2
-
-	rm -f "${__inspin}"
 }
 
-# Starts the spinner by launching it in a background subprocess which will
-# spin as long as $__spinflag file exists
+# Starts the spinner by launching it in a background subprocess, which will
+# spin until stop_spinner is called
 start_spinner()
 {
-	mkdir -p "${__spinflagdir}"
-	touch "${__spinflag}" "${__inspin}"
-
-	( spin_wait & )
+	exec 215< <(spin_wait)
+	read -r __spinpid <&215
 }
 
-# Stops the spinner by removing $__spinflag, then spinning until spin_wait()
-# signals it exited by the removal of $__inspin
+# Stops the spinner by killing it, waiting until it's gone (its end of the
+# pipe is closed), and erasing it if it was shown
 stop_spinner()
 {
-	# signal the spinner to stop
-	rm -f "${__spinflag}"
+	[[ -n $__spinpid ]] || return 0
 
-	# wait for the spinner to stop
-	while [[ -f "${__inspin}" ]]; do
-		sleep 0.01;
-	done
+	kill "$__spinpid" 2>/dev/null
+	local line drawn=
+	while read -r line; do
+		[[ $line == drawn ]] && drawn=1
+	done <&215
+	exec 215<&-
+	__spinpid=
+
+	[[ -n $drawn ]] && printf '\b\b  \b\b' >&2
+	return 0
 }
 
 
@@ -500,26 +742,246 @@ stop_spinner()
 #                                                 #
 ###################################################
 
+#
+# parse the HTTP response headers stored by `curl -D <header_file>`,
+# setting:
+#
+#   hdr_status: the HTTP status code
+#   hdr_etag:   the ETag of the response
+#   hdr_next:   the URL of the next page, from the rel="next" Link: header
+#   hdr_total_pages: the total number of pages (GitLab's X-Total-Pages:)
+#   hdr_ratelimit_remaining: requests left in the current rate limit window
+#                (X-RateLimit-Remaining: or RateLimit-Remaining:)
+#   hdr_ratelimit_reset: when the window resets (X-RateLimit-Reset: or
+#                RateLimit-Reset:), as sent by the server
+#
+# Callers should declare these local.
+#
+# __gg_parse_headers <header_file>
+#
+__gg_parse_headers()
+{
+	local line value
+	hdr_status= hdr_etag= hdr_next= hdr_total_pages=
+	hdr_ratelimit_remaining= hdr_ratelimit_reset=
+
+	while IFS= read -r line; do
+		line=${line%$'\r'}
+		case "$line" in
+		HTTP/*)
+			# there may be more than one response (e.g., with
+			# redirects); the last one counts
+			value=${line#* }
+			hdr_status=${value%% *}
+			hdr_etag= hdr_next= hdr_total_pages=
+			hdr_ratelimit_remaining= hdr_ratelimit_reset=
+			;;
+		[Ee][Tt][Aa][Gg]:*)
+			hdr_etag=${line#*:}
+			hdr_etag=${hdr_etag# }
+			;;
+		[Ll][Ii][Nn][Kk]:*)
+			# Link: <url1>; rel="prev", <url2>; rel="next", ...
+			[[ $line == *'rel="next"'* ]] || continue
+			value=${line%%rel=\"next\"*}
+			value=${value%>*}
+			hdr_next=${value##*<}
+			;;
+		[Xx]-[Tt][Oo][Tt][Aa][Ll]-[Pp][Aa][Gg][Ee][Ss]:*)
+			hdr_total_pages=${line#*:}
+			hdr_total_pages=${hdr_total_pages# }
+			;;
+		*[Rr][Aa][Tt][Ee][Ll][Ii][Mm][Ii][Tt]-[Rr][Ee][Mm][Aa][Ii][Nn][Ii][Nn][Gg]:*)
+			# X-RateLimit-Remaining (GitHub, Bitbucket) or
+			# RateLimit-Remaining (GitLab)
+			hdr_ratelimit_remaining=${line#*:}
+			hdr_ratelimit_remaining=${hdr_ratelimit_remaining# }
+			;;
+		*[Rr][Aa][Tt][Ee][Ll][Ii][Mm][Ii][Tt]-[Rr][Ee][Ss][Ee][Tt]:*)
+			hdr_ratelimit_reset=${line#*:}
+			hdr_ratelimit_reset=${hdr_ratelimit_reset# }
+			;;
+		esac
+	done < "$1"
+}
+
+#
+# __gg_note_ratelimit
+#
+# record the rate limit reported in the last parsed response (see
+# __gg_parse_headers) into $meta_ratelimit_remaining and
+# $meta_ratelimit_reset (epoch seconds), for the refresh scheduler (see
+# __gg_schedule_refresh).
+#
+__gg_note_ratelimit()
+{
+	[[ $hdr_ratelimit_remaining =~ ^[0-9]+$ && $hdr_ratelimit_reset =~ ^[0-9]+$ ]] || return 0
+
+	meta_ratelimit_remaining=$hdr_ratelimit_remaining
+	meta_ratelimit_reset=$hdr_ratelimit_reset
+
+	# GitHub and GitLab send the reset time as seconds since the epoch,
+	# others (following the IETF draft) as seconds from now
+	if (( meta_ratelimit_reset < 1000000000 )); then
+		local __now
+		__gg_now
+		meta_ratelimit_reset=$(( __now + meta_ratelimit_reset ))
+	fi
+}
+
+# called by the listing functions each time they've passed on another page
+# of results. while downloading an org's list for the first time, someone's
+# waiting for it (see _get_repo_list): we tell them by writing a line to
+# descriptor 216, when $__gg_progress is set.
+__gg_page_done()
+{
+	# (once they've stopped listening, we stop telling them)
+	[[ -n $__gg_progress ]] && { echo >&216 || __gg_progress=; } 2>/dev/null
+	return 0
+}
+
+# number of pages of a paginated result to download concurrently, when the
+# total number of pages is known in advance. set to 1 to fetch pages one by
+# one.
+GG_FETCH_WORKERS=${GG_FETCH_WORKERS:-4}
+
+#
+# Download pages <first>..<last> of <url> (by appending &page=N to it)
+# concurrently, at most $GG_FETCH_WORKERS at a time, storing page N into
+# <dir>/N. Returns non-zero if any of the downloads failed.
+#
+# We use curl's own --parallel mode if available (curl 7.66+), and a pool
+# of background curl processes otherwise.
+#
+# __gg_fetch_pages <curl_with_auth> <url> <first> <last> <dir>
+#
+__gg_fetch_pages()
+{
+	local curl="$1" url="$2" first="$3" last="$4" dir="$5"
+	local page
+
+	if [[ -z $__gg_curl_parallel ]]; then
+		__gg_curl_parallel=no
+		curl --help all 2>/dev/null | grep -q -- '--parallel-max' && __gg_curl_parallel=yes
+	fi
+
+	if [[ $__gg_curl_parallel == yes ]]; then
+		local -a args=()
+		for ((page = first; page <= last; page++)); do
+			args+=( "$url&page=$page" -o "$dir/$page" )
+		done
+		# (some curl versions show the progress meter in --parallel mode
+		# even with -s, hence the redirect)
+		$curl -f -s --parallel --parallel-max "$GG_FETCH_WORKERS" "${args[@]}" 2>/dev/null || return 1
+	else
+		local running=0
+		for ((page = first; page <= last; page++)); do
+			$curl -f -s -o "$dir/$page" "$url&page=$page" &
+			if (( ++running >= GG_FETCH_WORKERS )); then
+				wait
+				running=0
+			fi
+		done
+		wait
+	fi
+
+	# make sure we got them all
+	for ((page = first; page <= last; page++)); do
+		[[ -f "$dir/$page" ]] || return 1
+	done
+}
+
 # call an endpoint and retrieve the full result.
 # reads all pages if the result is paginated and has the
-# standard Link: header.
+# standard Link: header. If the server tells us the total number of pages
+# (GitLab's X-Total-Pages), pages 2..N are downloaded concurrently (see
+# __gg_fetch_pages).
+#
+# If $meta_etag is set (see _refresh_repo_cache), it's sent along with
+# the request for the first page as If-None-Match. If the server replies
+# the result hasn't changed (304 Not Modified), we return 3. If it replies
+# there's no such thing (404 Not Found), we return 4 (and 1 on other
+# failures). $meta_etag is updated with the ETag of the first page of the
+# response, and $meta_ratelimit_* with the rate limit the server reported
+# (see __gg_note_ratelimit).
 #
-# _rest_call <curl_with_auth> <url>
+# If <jq_filter> is given, each page is passed through it (jq -r) as soon
+# as it's been downloaded, rather than returned as JSON.
+#
+# _rest_call <curl_with_auth> <url> [jq_filter]
 #
 _rest_call()
 {
 	local curl="$1"
 	local url="$2"
+	local filter="$3"
 
 	local tmp
 	tmp=$(mktemp)
 
+	local hdr_status hdr_etag hdr_next hdr_total_pages
+	local hdr_ratelimit_remaining hdr_ratelimit_reset
+	local -a conditional=()
+	[[ -n $meta_etag ]] && conditional=(-H "If-None-Match: $meta_etag")
+
 	while [[ -n "$url" ]]; do
 		# download page
-		$curl -f -s -D "$tmp" "$url" || { rm -f "$tmp"; return 1; }
+		if ! $curl -f -s -D "$tmp" "${conditional[@]}" "$url" > "$tmp.page"; then
+			# (a rate-limited request fails, but tells us when to come back)
+			__gg_parse_headers "$tmp"
+			__gg_note_ratelimit
+			rm -f "$tmp" "$tmp.page"
+			[[ $hdr_status == 404 ]] && return 4
+			return 1
+		fi
+		__gg_parse_headers "$tmp"
+		__gg_note_ratelimit
+
+		if [[ $url == "$2" ]]; then
+			# first page of a conditional request
+			[[ ${#conditional[@]} -ne 0 && $hdr_status == 304 ]] && { rm -f "$tmp" "$tmp.page"; return 3; }
+			conditional=()
+		fi
+
+		# pass the page on
+		if [[ -n $filter ]]; then
+			jq -r "$filter" "$tmp.page"
+		else
+			cat "$tmp.page"
+		fi
+		rm -f "$tmp.page"
+		__gg_page_done
+
+		if [[ $url == "$2" ]]; then
+			[[ -n $hdr_etag ]] && meta_etag=$hdr_etag
+
+			# if we know how many pages there are, get the rest concurrently
+			if [[ $GG_FETCH_WORKERS -gt 1 && $hdr_total_pages -gt 1 && -n $hdr_next ]]; then
+				rm -f "$tmp"
+				mkdir "$tmp" || return 1
+
+				local page rc=0
+				local -a pages=()
+				__gg_fetch_pages "$curl" "$url" 2 "$hdr_total_pages" "$tmp" || rc=1
+				for ((page = 2; page <= hdr_total_pages; page++)); do
+					pages+=( "$tmp/$page" )
+				done
+				if [[ $rc != 0 ]]; then
+					:
+				elif [[ -n $filter ]]; then
+					jq -r "$filter" "${pages[@]}"
+				else
+					cat "${pages[@]}"
+				fi
+				__gg_page_done
+
+				rm -rf "$tmp"
+				return $rc
+			fi
+		fi
 
 		# find the next URL
-		url=$(sed -En 's/^Link: (.*)/\1/p' "$tmp" | tr ',' '\n' | grep 'rel="next"' | sed -nE 's/^.*<(.*)>.*$/\1/p')
+		url=$hdr_next
 	done
 	rm -f "$tmp"
 }
@@ -534,8 +996,14 @@ defgraphql()
 {
 	# squash the graphql text into a single line (as Javascript
 	# doesn't allow multiline strings) and assign it to
-	# variable $1
-	read -r -d '' "$1" < <(tr -s ' \t\n' ' ')
+	# variable $1. (this runs as the script is sourced, so we
+	# don't fork.)
+	local -a words
+	local text=
+	while read -ra words; do
+		(( ${#words[@]} )) && text+="${words[*]} "
+	done
+	printf -v "$1" '%s' "${text% }"
 }
 
 
@@ -559,6 +1027,7 @@ __SERVICES+=( gitlab )
 __gitlab_PREFIXES="https://gitlab.com/ git@gitlab.com:" 
 GG_AUTH_gitlab="$GG_CFGDIR/gitlab.auth.curl"
 GG_CANONICAL_HOST_gitlab="gitlab.com"
+GG_API_gitlab=${GG_API_gitlab:-https://gitlab.com/api/v4}
 }
 
 #
@@ -605,7 +1074,7 @@ init-gitlab-completion()
 
 	# verify that the token works
 	if ! _gitlab_call "users/$GLUSER/projects" >/dev/null; then
-		_gitlab_curl -s "https://gitlab.com/api/v4/users/$GLUSER/projects"; echo
+		_gitlab_curl -s "$GG_API_gitlab/users/$GLUSER/projects"; echo
 		echo
 		echo "Hmm, something went wrong -- check the token for typos and/or proper scope. Then try again."
 		rm -f "$GG_AUTH_gitlab"
@@ -622,7 +1091,7 @@ _gitlab_curl()
 	curl --config "$GG_AUTH_gitlab" "$@"
 }
 
-# _gitlab_call <endpoint> <options>
+# _gitlab_call <endpoint> <options> [jq_filter]
 #
 # example: _gitlab_call groups/gitlab-org/projects simple=true
 #
@@ -631,16 +1100,73 @@ _gitlab_call()
 	local endpoint="$1"
 	local options="$2"
 
-	_rest_call _gitlab_curl "https://gitlab.com/api/v4/$endpoint?per_page=100&$options"
+	_rest_call _gitlab_curl "$GG_API_gitlab/$endpoint?per_page=100&$options" "$3"
 }
 
-# download the repository list of <user|org>
+# download the repository list of <user|org>, optionally only those
+# active since <since> (seconds since the epoch)
+#
+# GitLab doesn't have a unified API for both users and orgs ('groups' in
+# GitLab parlance), so we ask for <org> as whichever it was the last time
+# ($meta_owner_type, see _refresh_repo_cache), and as the other if that
+# doesn't exist. Which one it was is stored back into $meta_owner_type.
+#
+# _gitlab_repo_list <org> [since]
+#
 _gitlab_repo_list()
 {
-	# GitLab doesn't have a unified API for both users and orgs
-	# ('groups' in GitLab parlance). We try users then groups.
+	local options="simple=true"
+	[[ -n $2 ]] && options+="&order_by=last_activity_at&last_activity_after=$(__gg_isodate "$2")"
+
+	local -a owners=( user group )
+	[[ $meta_owner_type == group ]] && owners=( group user )
+
+	# (the names are written out page by page, as they arrive)
+	local owner rc
+	for owner in "${owners[@]}"; do
+		_gitlab_call "${owner}s/$1/projects" "$options" '.[].path'
+		rc=$?
+		[[ $rc == 4 ]] || break
+	done
+	[[ $rc == 0 || $rc == 3 ]] && meta_owner_type=$owner
+	return $rc
+}
+
+# list the user's own namespace, and the (top-level) groups they're a
+# member of
+#
+# _gitlab_org_list
+#
+_gitlab_org_list()
+{
+	# (unconditional requests; the lists are short)
+	local meta_etag=
+	_gitlab_call user "" '.username' || return
+	meta_etag=
+	_gitlab_call groups "min_access_level=10&top_level_only=true" '.[].full_path'
+}
+
+# list the repositories of <user|org> beginning with <prefix>, with a
+# server-side search (see _get_repo_list). <prefix> may only contain
+# characters valid in repository names.
+#
+# _gitlab_repo_search <org> <prefix>
+#
+_gitlab_repo_search()
+{
+	local filter=".[].path | select(startswith(\"$2\"))"
 
-	( _gitlab_call users/"$1"/projects simple=true || _gitlab_call groups/"$1"/projects simple=true ) | jq -r '.[].path'
+	# (users or groups first, as in _gitlab_repo_list)
+	local meta_owner_type= owner
+	_meta_read "$GG_CACHEDIR/gitlab.$1.meta" owner_type
+	local -a owners=( user group )
+	[[ $meta_owner_type == group ]] && owners=( group user )
+
+	for owner in "${owners[@]}"; do
+		_gitlab_call "${owner}s/$1/projects" "simple=true&search=$2" "$filter"
+		[[ $? == 4 ]] || return
+	done
+	return 4
 }
 
 ##########################
@@ -655,6 +1181,7 @@ __SERVICES+=( github )
 __github_PREFIXES="https://github.com/ git@github.com:"
 GG_AUTH_github="$GG_CFGDIR/github.auth.netrc"
 GG_CANONICAL_HOST_github="github.com"
+GG_API_github=${GG_API_github:-https://api.github.com}
 }
 
 #
@@ -695,12 +1222,13 @@ init-github-completion()
 	touch "$tmpname"
 	chmod 600 "$tmpname"
 	# note: echo is a builtin so this is secure (https://stackoverflow.com/a/15229498)
-	echo "machine api.github.com login $GHUSER password $TOKEN" >> "$tmpname"
+	local host=${GG_API_github#*://}
+	echo "machine ${host%%/*} login $GHUSER password $TOKEN" >> "$tmpname"
 	mv "$tmpname" "$GG_AUTH_github"
 
 	# verify that the token works
-	if ! curl -I -f -s --netrc-file "$GG_AUTH_github" "https://api.github.com/user" >/dev/null; then
-		curl -s "https://api.github.com/user"
+	if ! curl -I -f -s --netrc-file "$GG_AUTH_github" "$GG_API_github/user" >/dev/null; then
+		curl -s "$GG_API_github/user"
 		echo "Hmm, something went wrong -- most likely you've typed the token incorretly. Rerun and try again."
 		rm -f "$GG_AUTH_github"
 		return 1
@@ -730,63 +1258,248 @@ _github_auto_auth()
 }
 
 #
-# GraphQL query returning all repositories with given user/org.
-# used by _github_repo_list()
+# download the repository lists of several users/orgs at once, into
+# <outdir>/<org> (one repository per line). An org given as <org>:<since>
+# only gets the repositories updated or pushed to since <since> (seconds
+# since the epoch).
 #
-defgraphql __github_list_repos_query <<-'EOF'
-	query list_repos($queryString: String!, $first: Int = 100, $after: String) { 
-	  search(query: $queryString, type:REPOSITORY, first:$first, after: $after) {
-	    repositoryCount
-	    pageInfo {
-	      endCursor
-	      hasNextPage
-	    }
-	    edges {
-	      node {
-	        ... on Repository {
-	          name
-	        }
+# Each request asks for the next page of every org that has one, using a
+# GraphQL alias (o0, o1, ...) per org:
+#
+#    query {
+#      o0: repositoryOwner(login: "foo") { repositories(first: 100, after: "...", ...) { ... } }
+#      o1: repositoryOwner(login: "bar") { ... }
+#    }
+#
+# and each response is parsed by a single jq. Unlike the search API, this
+# isn't capped at 1000 results, and only the names are transferred (plus
+# the timestamps, for incremental listings).
+#
+# Orgs whose listing failed get no <outdir>/<org> file, and those that
+# don't exist get an (empty) <outdir>/<org>.missing instead. Returns 1 if a
+# request failed altogether (including rate limiting).
+#
+# With <outdir> '-', the listing of a single org is written to the standard
+# output, page by page as it arrives, and 1 is returned if it failed (4 if
+# the org doesn't exist).
+#
+# _github_repo_lists <outdir> <org>[:<since>]...
+#
+_github_repo_lists()
+{
+	local outdir="$1"
+	shift
+
+	local stream=
+	[[ $outdir == - ]] && stream=1
+
+	local -a orgs=() since=() after=() active=()
+	local spec i n=0 sinces=
+	for spec; do
+		orgs[n]=${spec%%:*}
+		since[n]=
+		[[ $spec == *:* ]] && since[n]=$(__gg_isodate "${spec#*:}")
+		sinces+="${sinces:+,}\"$n\":\"${since[n]}\""
+		after[n]=
+		active[n]=1
+		[[ -n $stream ]] || : > "$outdir/${orgs[n]}.tmp"
+		(( n++ ))
+	done
+
+	local hdr hdr_status hdr_etag hdr_next hdr_total_pages hdr_ratelimit_remaining hdr_ratelimit_reset
+	hdr=$(mktemp)
+
+	local query args result rc more kind a b c
+	while :; do
+		# one alias per org with more to list. when listing only recent
+		# changes, ask for the most recently updated repositories first,
+		# so we can stop at the first one that's older.
+		query= more=
+		for ((i = 0; i < n; i++)); do
+			[[ -n ${active[i]} ]] || continue
+			args="first: 100, ownerAffiliations: OWNER"
+			[[ -n ${after[i]} ]] && args+=", after: \\\"${after[i]}\\\""
+			if [[ -n ${since[i]} ]]; then
+				args+=", orderBy: {field: UPDATED_AT, direction: DESC}"
+				query+=" o$i: repositoryOwner(login: \\\"${orgs[i]}\\\") { repositories($args) { pageInfo { endCursor hasNextPage } nodes { name updatedAt pushedAt } } }"
+			else
+				query+=" o$i: repositoryOwner(login: \\\"${orgs[i]}\\\") { repositories($args) { pageInfo { endCursor hasNextPage } nodes { name } } }"
+			fi
+			more=1
+		done
+		[[ -n $more ]] || break
+
+		# execute the query
+		result=$(curl \
+		  -f -s \
+		  -D "$hdr" \
+		  --netrc-file "$GG_AUTH_github" \
+		  -X POST \
+		  --data "{ \"query\": \"query list_repos {$query }\" }" \
+		  --url "$GG_API_github/graphql")
+		rc=$?
+		__gg_parse_headers "$hdr"
+		__gg_note_ratelimit
+		[[ $rc == 0 ]] || break
+
+		# the orgs that aren't in the response failed (GraphQL errors
+		# come back with a 200)
+		for ((i = 0; i < n; i++)); do
+			[[ -n ${active[i]} ]] && active[i]=failed
+		done
+
+		# a line per repository, and one with the paging information
+		# (and whether we've reached repositories older than <since>)
+		# for each org, or one saying it doesn't exist. (repositoryOwner
+		# is null for those, usually without an error; one that isn't a
+		# NOT_FOUND means the lookup itself failed.)
+		while IFS=$'\t' read -r i kind a b c; do
+			case "$kind" in
+			r)	if [[ -n $stream ]]; then
+					printf '%s\n' "$a"
+				else
+					printf '%s\n' "$a" >> "$outdir/${orgs[i]}.tmp"
+				fi ;;
+			p)	active[i]= after[i]=$b
+				[[ $a == true && -z $c ]] && active[i]=1 ;;
+			n)	active[i]=missing ;;
+			esac
+		done < <(jq -r --argjson s "{$sinces}" '
+			((.data // {}) | to_entries[] | select(.value != null) |
+			 (.key[1:]) as $i | .value.repositories as $r | ($s[$i] // "") as $since |
+			 ($r.nodes[] | select($since == "" or .updatedAt > $since or .pushedAt > $since) | "\($i)\tr\t\(.name)"),
+			 "\($i)\tp\t\($r.pageInfo.hasNextPage)\t\($r.pageInfo.endCursor)\t\(if $since != "" and any($r.nodes[]; .updatedAt <= $since and .pushedAt <= $since) then "stop" else "" end)"),
+			((.errors // [])[] | select(.type == "NOT_FOUND") | .path[0] | strings | select(startswith("o")) | "\(.[1:])\tn"),
+			((.errors // []) as $e | (.data // {}) | to_entries[] | select(.value == null) | .key as $k |
+			 select(all($e[]; .type == "NOT_FOUND" or ((.path // [])[0] | . != null and . != $k))) | "\($k[1:])\tn")
+		' <<<"$result")
+		__gg_page_done
+
+		for ((i = 0; i < n; i++)); do
+			case "${active[i]}" in
+			failed)  [[ -n $stream ]] && { rc=1; break 2; } ;;
+			missing) [[ -n $stream ]] && { rc=4; break 2; }
+				 : > "$outdir/${orgs[i]}.missing" ;;
+			*)	 continue ;;
+			esac
+			rm -f "$outdir/${orgs[i]}.tmp"
+			active[i]=
+		done
+	done
+	rm -f "$hdr"
+	[[ -n $stream ]] && return $rc
+
+	# the listings that completed
+	for ((i = 0; i < n; i++)); do
+		[[ -f "$outdir/${orgs[i]}.tmp" ]] || continue
+		if [[ $rc == 0 ]]; then
+			mv "$outdir/${orgs[i]}.tmp" "$outdir/${orgs[i]}"
+		else
+			rm -f "$outdir/${orgs[i]}.tmp"
+		fi
+	done
+	[[ $rc == 0 ]]
+}
+
+# download the repository list of <user|org>, optionally only those
+# updated or pushed to since <since> (seconds since the epoch)
+#
+# returns 1 on failure (including errors reported by the GraphQL API), and
+# 4 if there's no such user or org.
+#
+# _github_repo_list <org> [since]
+#
+_github_repo_list()
+{
+	_github_repo_lists - "$1${2:+:$2}"
+}
+
+# list the repositories of <user|org> beginning with <prefix>, with a
+# server-side search (see _get_repo_list). <prefix> may only contain
+# characters valid in repository names.
+#
+# (this uses the search API, which has a tighter rate limit than the
+# rest; it's only used to answer the first completion in an org while its
+# full list is being downloaded. we only ask for the first 100 results,
+# rather than paging through them: the answer is marked partial anyway, so
+# it's offered as suggestions, and the rest come with the full list.)
+#
+# _github_repo_search <org> <prefix>
+#
+_github_repo_search()
+{
+	local result
+	result=$(curl \
+	  -f -s \
+	  --netrc-file "$GG_AUTH_github" \
+	  -X POST \
+	  --data "{ \"query\": \"query search_repos { search(query: \\\"user:$1 $2 in:name fork:true\\\", type: REPOSITORY, first: 100) { nodes { ... on Repository { name } } } }\" }" \
+	  --url "$GG_API_github/graphql") || return 1
+
+	# (GraphQL errors come back with a 200, and no data)
+	jq -e -r --arg p "$2" '.data.search.nodes[].name | select(startswith($p))' <<<"$result"
+}
+
+#
+# GraphQL query returning the user's login and a page of their
+# organizations (those after the cursor $after, or the first ones if it's
+# null). used by _github_org_list()
+#
+defgraphql __github_list_orgs_query <<-'EOF'
+	query list_orgs($after: String) {
+	  viewer {
+	    login
+	    organizations(first: 100, after: $after) {
+	      pageInfo {
+	        endCursor
+	        hasNextPage
+	      }
+	      nodes {
+	        login
 	      }
 	    }
 	  }
 	}
 EOF
 
-# download the repository list of <user|org>
-_github_repo_list()
+# list the user's own login, and the organizations they're a member of
+#
+# _github_org_list
+#
+_github_org_list()
 {
-	local after="null"
-	local hasNextPage="true"
-	local data result
+	local result rc lines after=null first=true
+	local hdr hdr_status hdr_etag hdr_next hdr_total_pages hdr_ratelimit_remaining hdr_ratelimit_reset
+	hdr=$(mktemp)
 
-	while [[ $hasNextPage == true ]]; do
-		# __github_list_repos_query is defined using defgraphql:
+	while [[ -n $after ]]; do
+		# __github_list_orgs_query is defined using defgraphql:
 		# shellcheck disable=SC2154
-		read -r -d '' data <<-EOF
-			{
-				"query": "$__github_list_repos_query",
-				"variables": {
-					"queryString": "user:$1 fork:true",
-					"after": $after
-				}
-			}
-		EOF
-
-		# execute the query
 		result=$(curl \
-		  -s \
+		  -f -s \
+		  -D "$hdr" \
 		  --netrc-file "$GG_AUTH_github" \
 		  -X POST \
-		  --data "$data" \
-		  --url https://api.github.com/graphql)
-
-		# get information about the enxt page
-		IFS=$'\t' read -r hasNextPage endCursor < <(jq -r '.data.search.pageInfo | [.hasNextPage, .endCursor] | @tsv' <<<"$result")
-		after="\"$endCursor\""
-
-		# write out the desired result
-		jq -r '.data.search.edges[].node.name' <<<"$result"
+		  --data "{ \"query\": \"$__github_list_orgs_query\", \"variables\": { \"after\": $after } }" \
+		  --url "$GG_API_github/graphql")
+		rc=$?
+		__gg_parse_headers "$hdr"
+		__gg_note_ratelimit
+		[[ $rc == 0 ]] || break
+
+		# the login (with the first page), the orgs, and a last line
+		# with the (JSON-quoted) cursor of the next page, if there is
+		# one. (GraphQL errors come back with a 200, and no data)
+		lines=$(jq -e -r --argjson first "$first" '
+			.data.viewer | (if $first then .login else empty end), .organizations.nodes[].login,
+			(.organizations.pageInfo | "@\(if .hasNextPage then .endCursor | tojson else "" end)")
+		' <<<"$result") || { rc=1; break; }
+		[[ $lines == *$'\n'@* ]] && printf '%s\n' "${lines%$'\n'@*}"
+		after=${lines##*$'\n'} first=false
+		after=${after#@}
 	done
+	rm -f "$hdr"
+	[[ $rc == 0 ]]
 }
 
 ##########################
@@ -801,6 +1514,7 @@ __SERVICES+=( bitbucket )
 __bitbucket_PREFIXES="https://bitbucket.org/ git@bitbucket.org:"
 GG_AUTH_bitbucket="$GG_CFGDIR/bitbucket.auth.curl"
 GG_CANONICAL_HOST_bitbucket="bitbucket.org"
+GG_API_bitbucket=${GG_API_bitbucket:-https://api.bitbucket.org}
 }
 
 #
@@ -867,36 +1581,114 @@ _bitbucket_curl()
 	curl --config "$GG_AUTH_bitbucket" "$@"
 }
 
-# _bitbucket_call <endpoint> <options>
+# _bitbucket_call <endpoint> <options> [jq_filter]
 #
 # example: _bitbucket_call 2.0/repositories/atlassian simple=true
 #
+# supports conditional requests via $meta_etag, downloads pages 2..N
+# concurrently (computing N from the 'size' and 'pagelen' in the first
+# page), passes the pages' values through <jq_filter>, and returns 3 or 4
+# for 304 Not Modified or 404 Not Found, the same way _rest_call does.
+#
 _bitbucket_call()
 {
 	local endpoint="$1"
 	local options="$2"
+	local values=".values${3:+ | $3}"
 
-	local url="https://api.bitbucket.org/$endpoint?pagelen=100&$options"
+	local url="$GG_API_bitbucket/$endpoint?pagelen=100&$options"
 
-	local tmp
+	local tmp hdr_status hdr_etag hdr_next first=1
+	local hdr_total_pages hdr_ratelimit_remaining hdr_ratelimit_reset
 	tmp=$(mktemp)
+
+	local -a conditional=()
+	[[ -n $meta_etag ]] && conditional=(-H "If-None-Match: $meta_etag")
+
 	while [[ -n "$url" ]]; do
 		# download page
-		_bitbucket_curl -f -s "$url" > "$tmp" || { rm -f "$tmp"; return 1; }
+		if ! _bitbucket_curl -f -s -D "$tmp.hdr" "${conditional[@]}" "$url" > "$tmp"; then
+			__gg_parse_headers "$tmp.hdr"
+			__gg_note_ratelimit
+			rm -f "$tmp" "$tmp.hdr"
+			[[ $hdr_status == 404 ]] && return 4
+			return 1
+		fi
+		__gg_parse_headers "$tmp.hdr"
+		__gg_note_ratelimit
+
+		if [[ -n $first ]]; then
+			# a conditional request for the first page
+			[[ $hdr_status == 304 ]] && { rm -f "$tmp" "$tmp.hdr"; return 3; }
+			[[ -n $hdr_etag ]] && meta_etag=$hdr_etag
+			conditional=() first=
+
+			# if we know how many pages there are, get the rest concurrently
+			local npages
+			npages=$(jq -r 'if .size and .pagelen then (.size + .pagelen - 1) / .pagelen | floor else 0 end' "$tmp")
+			if [[ $GG_FETCH_WORKERS -gt 1 && $npages -gt 1 ]]; then
+				# (the first page is passed on while we wait for the rest)
+				jq -r "$values" "$tmp"
+				__gg_page_done
+
+				local page rc=0
+				local -a pages=()
+				mkdir "$tmp.d" || rc=1
+				[[ $rc == 0 ]] && __gg_fetch_pages _bitbucket_curl "$url" 2 "$npages" "$tmp.d" || rc=1
+				for ((page = 2; page <= npages; page++)); do
+					pages+=( "$tmp.d/$page" )
+				done
+
+				[[ $rc == 0 ]] && jq -r "$values" "${pages[@]}" && __gg_page_done
+
+				rm -rf "$tmp" "$tmp.hdr" "$tmp.d"
+				return $rc
+			fi
+		fi
 
 		# echo the content
-		jq -r '.values' "$tmp"
+		jq -r "$values" "$tmp"
+		__gg_page_done
 
 		# find next page (jq trick from https://github.com/stedolan/jq/issues/354#issuecomment-43147898)
 		url=$(jq -r '.next // empty' "$tmp")
 	done
-	rm -f "$tmp"
+	rm -f "$tmp" "$tmp.hdr"
 }
 
-# download the repository list of <user|org>
+# download the repository list of <user|org>, optionally only those
+# updated since <since> (seconds since the epoch)
+#
+# _bitbucket_repo_list <org> [since]
+#
 _bitbucket_repo_list()
 {
-	_bitbucket_call 2.0/repositories/"$1" | jq -r '.[].name'
+	local options=
+	[[ -n $2 ]] && options="sort=-updated_on&q=updated_on%3E%3D%22$(__gg_isodate "$2")%22"
+
+	# (written out page by page, as they arrive)
+	_bitbucket_call 2.0/repositories/"$1" "$options" '.[].name'
+}
+
+# list the workspaces the user is a member of (including their own)
+#
+# _bitbucket_org_list
+#
+_bitbucket_org_list()
+{
+	local meta_etag=
+	_bitbucket_call 2.0/user/permissions/workspaces "" '.[].workspace.slug'
+}
+
+# list the repositories of <user|org> beginning with <prefix>, with a
+# server-side search (see _get_repo_list). <prefix> may only contain
+# characters valid in repository names.
+#
+# _bitbucket_repo_search <org> <prefix>
+#
+_bitbucket_repo_search()
+{
+	_bitbucket_call 2.0/repositories/"$1" "q=name~%22$2%22" ".[].name | select(startswith(\"$2\"))"
 }
 
 ############################
@@ -926,28 +1718,45 @@ _timeout()
 	_dbg "exiting _timeout"
 }
 
-# variables holding the global state for SSH connections
-__ssh_msg_sentinel=
-__ssh_fifo=
-__ssh_host=
+#
+# The SSH connection pool: up to $GG_SSH_POOL_SIZE connections, to
+# different hosts, are kept open in the background (until they've been
+# idle for two minutes). When the pool is full, opening a new connection
+# closes the least recently used one.
+#
+# The connection in slot <i> is written to via descriptor 217+2i, and read
+# from via 218+2i. The per-slot state is kept in the arrays below, and
+# $__ssh_slot is the slot __mj_ssh_write/__mj_ssh_read talk to.
+#
+GG_SSH_POOL_SIZE=${GG_SSH_POOL_SIZE:-4}
+
+__ssh_hosts=()
+__ssh_fifos=()
+__ssh_sentinels=()
+__ssh_lru=()
+__ssh_clock=0
+__ssh_slot=
 
-# __mj_ssh_start <host>
+# __mj_ssh_start <slot> <host>
 __mj_ssh_start()
 {
 	_dbg "in __mj_ssh_start"
-	local host="$1"
+	local slot="$1" host="$2"
 
-	__ssh_host="$host"
-	__ssh_msg_sentinel="--mj-git-cl-comp-$RANDOM-$RANDOM-$RANDOM--"
-	__ssh_fifo="$(mktemp -d)/fifo"
+	local fifo
+	fifo="$(mktemp -d)/fifo" || return 1
+	__ssh_hosts[slot]="$host"
+	__ssh_fifos[slot]="$fifo"
+	__ssh_sentinels[slot]="--mj-git-cl-comp-$RANDOM-$RANDOM-$RANDOM--"
 
 	# create the pipe for ssh output
-	_dbg "__ssh_fifo=$__ssh_fifo"
-	mkfifo "${__ssh_fifo}"
+	_dbg "fifo=$fifo"
+	mkfifo "$fifo"
 
-	# we'll write commands to descriptor 217, and read output on descriptor 218
-	# we trap the SIGINT to stop the user's CTRL-C in the terminal from killing the
-	# background ssh connection. e.g.,, imagine the scenario like:
+	# we'll write commands to descriptor 217+2*slot, and read output on
+	# descriptor 218+2*slot. we trap the SIGINT to stop the user's CTRL-C in
+	# the terminal from killing the background ssh connection. e.g.,,
+	# imagine the scenario like:
 	#
 	#   $ git clone epyc.astro.washington.edu:<TAB> (...and then <CTRL-C>...)
 	#   $ ... user looks something up ...
@@ -955,27 +1764,38 @@ __mj_ssh_start()
 	#
 	# we want the second invocation to re-use the background connection. w/o
 	# trapping SIGINT, the <CTRL-C> would kill it.
-	exec 217> >( trap '' SIGINT; _timeout 120 | ssh -o 'Batchmode yes' "$host" 2>/dev/null >"${__ssh_fifo}"; rm -f "${__ssh_fifo}"; _dbg "== ssh to $__ssh_host exited." )
-	exec 218< "${__ssh_fifo}"
+	eval "exec $((217 + 2*slot))> >( trap '' SIGINT; _timeout 120 | ssh -o 'Batchmode yes' \"\$host\" 2>/dev/null >\"\$fifo\"; rm -f \"\$fifo\"; _dbg \"== ssh to \$host exited.\" )"
+	eval "exec $((218 + 2*slot))< \"\$fifo\""
 }
 
-# stop the currently running SSH connection, deleting the FIFO
+# __mj_ssh_stop [slot]
+#
+# stop the SSH connection in <slot> (or all of them), deleting the FIFO
 __mj_ssh_stop()
 {
-	_dbg "in __mj_ssh_stop"
+	_dbg "in __mj_ssh_stop $*"
+
+	if [[ $# == 0 ]]; then
+		local i
+		for i in "${!__ssh_hosts[@]}"; do
+			__mj_ssh_stop "$i"
+		done
+		return 0
+	fi
 
-	exec 217>&-
-	exec 218<&-
+	local slot="$1"
+	eval "exec $((217 + 2*slot))>&- $((218 + 2*slot))<&-"
 
-	[[ -n "${__ssh_fifo}" ]] && rm -f "${__ssh_fifo}"
+	[[ -n "${__ssh_fifos[slot]}" ]] && rm -f "${__ssh_fifos[slot]}"
 
-	__ssh_host=
+	__ssh_hosts[slot]=
+	__ssh_fifos[slot]=
 }
 
 # __mj_ssh_write <commands>
 #
-# writes to the SSH pipe, adding a command to echo a sentinel at the end
-# which read_ssh uses to recognize the end of message.
+# writes to the SSH pipe of the current slot, adding a command to echo a
+# sentinel at the end which read_ssh uses to recognize the end of message.
 #
 # WARNING: if you're pairing write/read in the same process, the command
 # being written should be small enough to fit into the pipe capacity on your
@@ -985,18 +1805,19 @@ __mj_ssh_write()
 {
 	# https://www.gnu.org/software/bash/manual/html_node/Special-Builtins.html
 	# https://unix.stackexchange.com/questions/206786/testing-if-a-file-descriptor-is-valid
-	/bin/echo "$@" "; echo ${__ssh_msg_sentinel}" 2>/dev/null >&217
+	/bin/echo "$@" "; echo ${__ssh_sentinels[__ssh_slot]}" 2>/dev/null >&$((217 + 2*__ssh_slot))
 }
 
 # __mj_ssh_read
 #
-# reads output from the SSH pipe, echoing them to stdout, until the
-# sentinel is encountered.
+# reads output from the SSH pipe of the current slot, echoing them to
+# stdout, until the sentinel is encountered.
 __mj_ssh_read()
 {
 	local IFS=$'\n'
-	while read -r line <&218; do
-		if [[ $line == "${__ssh_msg_sentinel}" ]]; then
+	local sentinel="${__ssh_sentinels[__ssh_slot]}"
+	while read -r line <&$((218 + 2*__ssh_slot)); do
+		if [[ $line == "$sentinel" ]]; then
 			return
 		fi
 
@@ -1007,20 +1828,40 @@ __mj_ssh_read()
 
 # _ssh_ensure_started <host>
 #
-# ensure there's an open connection to $host
+# ensure there's an open connection to $host, and make its slot current
 #
 _ssh_ensure_started()
 {
 	local host="$1"
-	if [[ "$host" != "${__ssh_host}" ]] || ! { /bin/echo '' >&217; } 2>/dev/null; then
+
+	# look for the host in the pool, keeping track of the first free and
+	# the least recently used slot in case it's not there
+	local i slot= free= lru=
+	for (( i = 0; i < GG_SSH_POOL_SIZE; i++ )); do
+		if [[ ${__ssh_hosts[i]} == "$host" ]]; then
+			slot=$i
+			break
+		elif [[ -z ${__ssh_hosts[i]} ]]; then
+			[[ -z $free ]] && free=$i
+		elif [[ -z $lru || ${__ssh_lru[i]} -lt ${__ssh_lru[lru]} ]]; then
+			lru=$i
+		fi
+	done
+
+	if [[ -z $slot ]] || ! { /bin/echo '' >&$((217 + 2*slot)); } 2>/dev/null; then
 		_dbg "new connection for $host"
-		# close any open connection
-		__mj_ssh_stop
+		# reuse the host's slot if its connection died, otherwise take a
+		# free one, or evict the least recently used connection
+		slot=${slot:-${free:-$lru}}
+		__mj_ssh_stop "$slot"
 		# open connection
-		__mj_ssh_start "$host" || { _dbg "open failed"; return 1; }
+		__mj_ssh_start "$slot" "$host" || { _dbg "open failed"; return 1; }
 	else
-		_dbg "reusing connection for $host"
+		_dbg "reusing connection for $host (slot $slot)"
 	fi
+
+	__ssh_slot=$slot
+	__ssh_lru[slot]=$(( ++__ssh_clock ))
 }
 
 # _ssh <host> [commands]
@@ -1033,202 +1874,2149 @@ _ssh()
 	local host="$1"
 	shift
 
-	_ssh_ensure_started "$host"
+	_trace_begin ssh
+	_ssh_ensure_started "$host" || return 1
 
-	__mj_ssh_write "(" "$@" ")" || { _dbg "write failed"; __mj_ssh_stop; return 1; }
+	__mj_ssh_write "(" "$@" ")" || { _dbg "write failed"; __mj_ssh_stop "$__ssh_slot"; return 1; }
 
-	__mj_ssh_read || { _dbg "read failed"; __mj_ssh_stop; return 1; }
+	__mj_ssh_read || { _dbg "read failed"; __mj_ssh_stop "$__ssh_slot"; return 1; }
+	_trace_end ssh "host=$host"
 }
 
-# Find completions for <fragment> on <host>, return them in ${COMPREPLY[@]}
 #
-# _ssh_list_repos <url>:<fragment>
+# Snapshots of remote directories. The first completion in a directory on
+# a host lists it over SSH, classifying its subdirectories into git
+# repositories and plain directories, and stores the result in
 #
-# Once the initial SSH connection is established, this is typically fast
-# (on order of 50msec, depending on the speed of your server.)
+#    $GG_CACHEDIR/ssh.snapshots/<user@host>/<directory>
 #
-_ssh_list_repos()
+# (with the directory name %-encoded). Subsequent completions in that
+# directory are answered from the snapshot, until it's older than
+# $GG_SSH_SNAPSHOT_TTL seconds (set to 0 to disable the snapshots). In the
+# background, we then also list (over a separate connection) the
+# directories one level down, so descending into them is answered locally
+# as well. gg-ssh-invalidate drops snapshots on request.
+#
+# A snapshot is a file whose first line is the time it was taken, followed
+# by one line per subdirectory: "r <name>" for repositories (bare or not),
+# and "d <name>" for everything else.
+#
+GG_SSH_SNAPSHOT_TTL=${GG_SSH_SNAPSHOT_TTL:-300}
+
+# __gg_ssh_ls_cmd <dir>
+#
+# print the (POSIX shell) command listing the subdirectories of <dir> in
+# the snapshot format, where <dir> is shell-escaped and either empty or
+# ending with a slash
+__gg_ssh_ls_cmd()
 {
-	local IFS=$'\n'
+	printf '%s' "for f in $1.* $1*; do [ -d \"\$f\" ] || continue; n=\${f##*/}; case \$n in .|..) continue;; esac; if [ -e \"\$f/HEAD\" ] || [ -d \"\$f/.git\" ]; then echo \"r \$n\"; else echo \"d \$n\"; fi; done 2>/dev/null"
+}
 
-	# split url
-	local userhost=${1%%:*}
-	local path=${1#*:}
+# __gg_ssh_unescape <var> <string>
+#
+# remove backslash escapes from <string>, storing the result into <var>
+__gg_ssh_unescape()
+{
+	local __s="$2" __out=
+	while [[ $__s == *\\* ]]; do
+		__out+=${__s%%\\*}
+		__s=${__s#*\\}
+		__out+=${__s:0:1}
+		__s=${__s:1}
+	done
+	printf -v "$1" '%s' "$__out$__s"
+}
 
-	# remove any trailing backslashes. This can happen if we have a
+# __gg_ssh_escape <var> <string>
+#
+# escape the characters the shell (or readline) would be unhappy about with
+# backslashes, storing the result into <var>
+__gg_ssh_escape()
+{
+	local __s="$2" __out= __c __i
+	for (( __i = 0; __i < ${#__s}; __i++ )); do
+		__c=${__s:__i:1}
+		case "$__c" in
+		[][\(\)\{\}\<\>\",:\;^\&\!\$=?\`\|\\\'[:space:]]) __out+="\\$__c" ;;
+		*) __out+=$__c ;;
+		esac
+	done
+	printf -v "$1" '%s' "$__out"
+}
+
+# __gg_ssh_snapshot <var> <user@host> [dir]
+#
+# store the name of the snapshot file of (unescaped) <dir> into <var>
+__gg_ssh_snapshot()
+{
+	local __key="$3"
+	__key=${__key//%/%25}
+	__key=${__key//\//%2F}
+	printf -v "$1" '%s' "$GG_CACHEDIR/ssh.snapshots/$2/_$__key"
+}
+
+# __gg_ssh_snapshot_read <user@host> <dir>
+#
+# load the fresh snapshot of (unescaped) <dir> into ${entries[@]}, or
+# return 1 if there isn't one
+__gg_ssh_snapshot_read()
+{
+	[[ $GG_SSH_SNAPSHOT_TTL -gt 0 ]] || return 1
+
+	local snap taken line __now
+	__gg_ssh_snapshot snap "$1" "$2"
+	[[ -f $snap ]] || return 1
+
+	# (an expired snapshot leaves ${entries[@]} alone, as the caller will
+	# fill it with a fresh listing)
+	__gg_now
+	{
+		read -r taken
+		[[ $taken =~ ^[0-9]+$ ]] && (( __now - taken < GG_SSH_SNAPSHOT_TTL )) || return 1
+
+		entries=()
+		while IFS= read -r line; do
+			entries+=( "$line" )
+		done
+	} < "$snap"
+}
+
+# __gg_ssh_snapshot_write <user@host> <dir> [entry...]
+#
+# store the snapshot of (unescaped) <dir>
+__gg_ssh_snapshot_write()
+{
+	local snap __now
+	__gg_ssh_snapshot snap "$1" "$2"
+	shift 2
+
+	mkdir -p "${snap%/*}" || return 1
+	__gg_now
+	{
+		echo "$__now"
+		[[ $# -gt 0 ]] && printf '%s\n' "$@"
+	} > "$snap.$$" && mv -f "$snap.$$" "$snap"
+}
+
+# __gg_ssh_prefetch <user@host> <dir> <subdir...>
+#
+# take snapshots of the <subdir>s of (unescaped) <dir>, with a single
+# command over a new SSH connection (so as not to get in the way of the
+# completions using the pooled one). At most one runs per host at a time.
+__gg_ssh_prefetch()
+{
+	local userhost="$1" dir="$2"
+	shift 2
+
+	local LOCK="$GG_CACHEDIR/ssh.snapshots/$userhost.lock"
+	__gg_lock "$LOCK" || return 0
+
+	# for each subdirectory, print "@ <index>" followed by its listing
+	local cmd= i=0 sub tilde
+	for sub; do
+		# quote the name for the remote (POSIX) shell, keeping ~/ expandable
+		sub="$dir$sub" tilde=
+		[[ $sub == "~/"* ]] && { tilde="~/"; sub=${sub#"~/"}; }
+		sub=${sub//\'/\'\\\'\'}
+		sub="$tilde'$sub'/"
+		cmd+="echo '@ $i'; $(__gg_ssh_ls_cmd "$sub"); "
+		(( i++ ))
+	done
+
+	local -a subdirs=( "$@" ) entries=()
+	local line cur=
+	while IFS= read -r line; do
+		if [[ $line == "@ "* ]]; then
+			[[ -n $cur ]] && __gg_ssh_snapshot_write "$userhost" "$dir${subdirs[cur]}/" "${entries[@]}"
+			cur=${line#@ }
+			entries=()
+		else
+			entries+=( "$line" )
+		fi
+	done < <(ssh -o 'Batchmode yes' "$userhost" "$cmd" 2>/dev/null)
+	[[ -n $cur ]] && __gg_ssh_snapshot_write "$userhost" "$dir${subdirs[cur]}/" "${entries[@]}"
+
+	rm -f "$LOCK"
+}
+
+# Find completions for <fragment> on <host>, return them in ${COMPREPLY[@]}
+#
+# _ssh_list_repos <url>:<fragment>
+#
+# Once the initial SSH connection is established, this is typically fast
+# (on order of 50msec, depending on the speed of your server.) If the
+# directory has been visited recently (see above), it's instantaneous.
+#
+_ssh_list_repos()
+{
+	local IFS=$'\n'
+
+	# split url
+	local userhost=${1%%:*}
+	local path=${1#*:}
+
+	# remove any trailing backslashes. This can happen if we have a
 	# situation like ('a\ b\ c' 'a\=b\ c'), where the first autocomplete
 	# will match to 'a\'. For the remote ls to work (see below), we have
 	# to drop that trailing backslash.
 	path=${path%\\}
 
-	# prime the cached connection (as all subsequent invocations will be
-	# in subshells and can't set the various __ssh_* variables with
-	# connection reuse info)
-	_ssh_ensure_started "$userhost" &>/dev/null
+	# split the path into the directory (as typed, i.e. escaped) and the
+	# name we're completing; the snapshots are keyed on the unescaped
+	# directory name.
+	local dir= base="$path" rawdir rawbase
+	[[ $path == */* ]] && { dir=${path%/*}/; base=${path##*/}; }
+	__gg_ssh_unescape rawdir "$dir"
+	__gg_ssh_unescape rawbase "$base"
+
+	local -a entries=()
+	if ! __gg_ssh_snapshot_read "$userhost" "$rawdir"; then
+		# prime the cached connection (as all subsequent invocations will be
+		# in subshells and can't set the various __ssh_* variables with
+		# connection reuse info)
+		_ssh_ensure_started "$userhost" &>/dev/null
+
+		local listing rc
+		start_spinner
+		listing=$(_ssh "$userhost" "$(__gg_ssh_ls_cmd "$dir")")
+		rc=$?
+		stop_spinner
+		[[ $rc == 0 ]] || { COMPREPLY=(); return; }
+		_dbg "===$listing==="
+		local line
+		while IFS= read -r line; do
+			[[ -n $line ]] && entries+=( "$line" )
+		done <<< "$listing"
+
+		if [[ $GG_SSH_SNAPSHOT_TTL -gt 0 ]]; then
+			__gg_ssh_snapshot_write "$userhost" "$rawdir" "${entries[@]}"
+
+			# look one level down, in the background
+			local entry subdirs=()
+			for entry in "${entries[@]}"; do
+				[[ $entry == "d "* ]] && subdirs+=( "${entry#d }" )
+			done
+			[[ ${#subdirs[@]} -gt 0 ]] && ( __gg_ssh_prefetch "$userhost" "$rawdir" "${subdirs[@]}" </dev/null >/dev/null 2>&1 & )
+		fi
+	fi
+
+	# directories beginning with a dot are only offered if asked for
+	local entry name
+	COMPREPLY=()
+	for entry in "${entries[@]}"; do
+		name=${entry#? }
+		[[ $name == "$rawbase"* ]] || continue
+		[[ $name == .* && $rawbase != .* ]] && continue
+
+		__gg_ssh_escape name "$name"
+		if [[ $entry == "r "* ]]; then
+			COMPREPLY+=( "$dir$name " )
+		else
+			COMPREPLY+=( "$dir$name/" )
+		fi
+	done
+}
+
+# gg-ssh-invalidate [<user@host>[:<dir>]]
+#
+# drop the snapshots of <dir> and the directories below it on <user@host>,
+# all of the snapshots of <user@host> if no directory is given, or all of
+# the snapshots if called without arguments.
+#
+gg-ssh-invalidate()
+{
+	local snapdir="$GG_CACHEDIR/ssh.snapshots"
+	[[ $# == 0 ]] && { rm -rf "$snapdir"; return; }
+
+	local userhost=${1%%:*}
+	[[ $1 != *:* ]] && { rm -rf "${snapdir:?}/$userhost"; return; }
+
+	local dir=${1#*:} snap
+	[[ -n $dir && $dir != */ ]] && dir+=/
+	__gg_ssh_snapshot snap "$userhost" "$dir"
+	rm -f "$snap"*
+}
+
+# test if we're completing a generic SSH URL, complete it if so, return 1
+# otherwise and the URL prefix to watch for in __PREFIXES
+#
+# args:
+#       $cur
+#
+# opts:
+#      -p  -- only add prefixes to __PREFIXES, don't match URL
+#
+# returns:
+#	COMPREPLY
+#	Adds own prefixes to __PREFIXES
+#
+# author: mjuric@astro.washington.edu
+#
+_complete_ssh_url()
+{
+	local prefix_only=
+	[[ "$1" == "-p" ]] && { prefix_only=1; shift; }
+
+	local cur="$1"
+	local recent="$GG_CACHEDIR/ssh.recent"
+
+	# $cur may be [foo@]example.com:[dir]; check if that's the case
+	_dbg "_complete_ssh_url: cur=$cur"
+	if [[ $cur != *:* || $prefix_only == 1 ]]; then
+		local offers=() ts userhost rest
+		if [[ -f $recent ]]; then
+			while read -r ts userhost rest; do
+				[[ -n $userhost ]] && offers+=( "$userhost:" )
+			done < "$recent"
+		fi
+		#_dbg "offers=[${offers[*]}]"
+		__PREFIXES="$__PREFIXES ${offers[*]}"
+		return 1
+	fi
+	_dbg "_complete_ssh_url: cur=$cur PASSED"
+
+	# autocomplete the path
+	_ssh_list_repos "$cur"
+
+	# remember last few successful completions to offer to
+	# autocomplete them (unless this host is the most recent one already).
+	local userhost=${cur%%:*} ts last=
+	[[ -f $recent ]] && read -r ts last < "$recent"
+	if [[ ${#COMPREPLY[@]} != 0 && $last != "$userhost" ]]; then
+		#_dbg "recent=[$recent]"
+		mkdir -p "$(dirname "$recent")"
+
+		local tmp="$recent.$$.$RANDOM.tmp"
+		cat "$recent" >"$tmp" 2>/dev/null
+		echo "$(date +%s) $userhost" >> "$tmp"
+
+		# keep 5 most recently used unique entries
+		# algorithm: sort desc by hostname, time | keep first of each hosts | sort desc by time | keep first 5
+		sort -k2,2 -k1,1 -r "$tmp" | uniq -f 1 | sort -rn -k1,1 | head -n 5 > "$tmp.2"
+		mv "$tmp.2" "$recent"
+
+		rm -f "$tmp" "$tmp.2"
+	fi
+
+	return 0
+}
+
+#########################
+#                       #
+#   Completion daemon   #
+#                       #
+#########################
+#
+# An optional, per-user background process that holds the repository lists
+# of all orgs in memory, owns their refresh schedule, and answers completion
+# queries over a named pipe. This spares the interactive shell from checking
+# cache staleness, launching refreshes and reading the cache files on every
+# TAB. Start it with:
+#
+#    gg-daemon start
+#
+# (e.g., from your ~/.bashrc). Completion uses the daemon when it's running,
+# and silently falls back to reading the caches directly when it isn't.
+#
+# Protocol: clients write single-line, tab-separated requests of the form
+#
+#    <id> <reply_fifo> <service> <org> <prefix>
+#
+# into $GG_CACHEDIR/daemon.fifo. The daemon answers with the line
+#
+#    <id> <hit|miss>
+#
+# in <reply_fifo>, having first written the repositories (one per line)
+# into $GG_CACHEDIR/daemon.reply.<pid>, <pid> being the client's (the
+# part of <id> before the dot). The fifo only ever carries these short
+# notices: the daemon opens it read-write, so a write into it never fails,
+# and a long reply to a client that's stopped listening would block the
+# daemon on a full pipe. Requests and notices are shorter than PIPE_BUF,
+# so concurrent writes from different shells won't interleave.
+#
+# Note: we use named pipes rather than a Unix domain socket because bash
+# can't talk to the latter without forking an external tool (socat, nc),
+# which would defeat the purpose.
+#
+
+__gg_daemon_fifo="$GG_CACHEDIR/daemon.fifo"
+__gg_daemon_pidfile="$GG_CACHEDIR/daemon.pid"
+
+# seconds to wait for the daemon to reply before falling back to the cache files
+GG_DAEMON_TIMEOUT=${GG_DAEMON_TIMEOUT:-1}
+
+# __gg_daemon_pid: return 0 and store the PID in $pid if the daemon is running
+__gg_daemon_pid()
+{
+	[[ -p "$__gg_daemon_fifo" ]] || return 1
+	read -r pid 2>/dev/null < "$__gg_daemon_pidfile" || return 1
+	kill -0 "$pid" 2>/dev/null
+}
+
+# _daemon_query <service> <org> <prefix>
+#
+# ask the daemon for repositories of <org> beginning with <prefix>. returns
+# them in ${REPOS[@]}, or returns 1 if the daemon isn't running or doesn't
+# (yet) have the list.
+#
+_daemon_query()
+{
+	local service="$1" org="$2" prefix="$3"
+
+	local pid
+	__gg_daemon_pid || return 1
+	_trace_begin daemon_query
+
+	# open our reply pipe once per shell, on fd 214. we open it read-write
+	# so that open() doesn't block waiting for the daemon.
+	if [[ $__gg_daemon_reply != "$__gg_daemon_fifo.$$" ]]; then
+		__gg_daemon_reply="$__gg_daemon_fifo.$$"
+		[[ -p "$__gg_daemon_reply" ]] || mkfifo -m 600 "$__gg_daemon_reply" 2>/dev/null || { __gg_daemon_reply=; return 1; }
+		exec 214<>"$__gg_daemon_reply"
+	fi
+
+	# send the request. the daemon's pipe is opened read-write as well,
+	# so we never block here even if the daemon has just died.
+	local id="$$.$(( ++__gg_daemon_seq ))"
+	printf '%s\t%s\t%s\t%s\t%s\n' "$id" "$__gg_daemon_reply" "$service" "$org" "$prefix" 2>/dev/null 1<>"$__gg_daemon_fifo" || return 1
+
+	# wait for the notice, skipping those of earlier (timed out) requests,
+	# then read the reply. (the daemon answers requests in order, so the
+	# reply file isn't rewritten until we've sent another one.)
+	local line status=
+	REPOS=()
+	while IFS= read -r -t "$GG_DAEMON_TIMEOUT" -u 214 line; do
+		[[ $line == "$id "* ]] && { status=${line#"$id "}; break; }
+	done
+	[[ $status == hit ]] && __readlines REPOS < "$GG_CACHEDIR/daemon.reply.$$"
+	_dbg "_daemon_query: $service $org $prefix -> $status (${#REPOS[@]} repos)"
+	_trace_end daemon_query "status=$status" "repos=${#REPOS[@]}"
+
+	[[ $status == hit ]]
+}
+
+# _gg_daemon_answer
+#
+# answer a single request (passed in via $id, $reply, $service, $org and
+# $prefix from _gg_daemon_serve). the list of org number i is kept in
+# the array __gg_d_repos_<i>.
+#
+_gg_daemon_answer()
+{
+	# don't answer clients that have gone away
+	[[ -p "$reply" && $id =~ ^[0-9]+\.[0-9]+$ ]] && kill -0 "${id%%.*}" 2>/dev/null || return
+
+	local key="$service.$org" cache="$GG_CACHEDIR/$service.$org.cache"
+	local i n=${#__gg_d_keys[@]} status=miss
+	for ((i = 0; i < n; i++)); do
+		[[ ${__gg_d_keys[i]} == "$key" ]] && break
+	done
+
+	if [[ $org == */* || " ${__SERVICES[*]} " != *" $service "* ]]; then
+		: # not something we know how to serve
+	elif (( i == n )) || { [[ -n ${__gg_d_pids[i]} ]] && ! kill -0 "${__gg_d_pids[i]}" 2>/dev/null; }; then
+		# first time we're asked about this org, or a refresh we launched
+		# has finished; (re)load it. if there's no cache yet, let the
+		# client fetch it.
+		if [[ -f "$cache" ]]; then
+			# caches written by older versions may not be sorted
+			__readlines "__gg_d_repos_$i" < <(LC_ALL=C sort -u "$cache")
+			__gg_d_keys[i]=$key
+			__gg_d_pids[i]=
+			status=hit
+		fi
+	else
+		status=hit
+
+		# serve what we have, but refresh in the background if it's due
+		if [[ -z ${__gg_d_pids[i]} ]] && __gg_refresh_due "$cache"; then
+			_refresh_repo_cache "$service" "$org" "$cache" </dev/null >/dev/null 2>&1 &
+			__gg_d_pids[i]=$!
+		fi
+	fi
+
+	# (if the reply can't be written, it's a miss, and the client reads
+	# the cache itself)
+	if [[ $status == hit ]]; then
+		__gg_print_prefixed "__gg_d_repos_$i" "$prefix" 2>/dev/null > "$GG_CACHEDIR/daemon.reply.${id%%.*}" || status=miss
+	fi
+	printf '%s %s\n' "$id" "$status" 2>/dev/null 1<>"$reply"
+
+	# (misses are logged by the client, which falls back to the cache)
+	[[ $status == hit ]] && __gg_cache_access "$key" hit
+}
+
+# __gg_print_prefixed <array_name> <prefix>
+#
+# print the elements of the (sorted) array <array_name> that begin with
+# <prefix>. uses binary search to find the first one, so the cost doesn't
+# grow with the size of the array.
+#
+__gg_print_prefixed()
+{
+	local arr="$1" prefix="$2"
+	local LC_ALL=C
+	local lo=0 hi mid ref
+
+	eval "hi=\${#$arr[@]}"
+	while (( lo < hi )); do
+		mid=$(( (lo + hi) / 2 ))
+		ref="$arr[$mid]"
+		if [[ ${!ref} < "$prefix" ]]; then
+			lo=$(( mid + 1 ))
+		else
+			hi=$mid
+		fi
+	done
+
+	for (( ; ; lo++ )); do
+		ref="$arr[$lo]"
+		[[ -n ${!ref} && ${!ref} == "$prefix"* ]] || break
+		printf '%s\n' "${!ref}"
+	done
+}
+
+# the daemon's main loop
+_gg_daemon_serve()
+{
+	__gg_d_keys=() __gg_d_pids=()
+
+	echo $$ > "$__gg_daemon_pidfile"
+	trap 'rm -f "$__gg_daemon_fifo" "$__gg_daemon_pidfile"; exit' TERM INT HUP
+
+	local id reply service org prefix
+	exec 3<>"$__gg_daemon_fifo"
+	while :; do
+		IFS=$'\t' read -r -u 3 id reply service org prefix || continue
+		_gg_daemon_answer
+	done
+}
+
+#
+# gg-daemon <start|stop|status>
+#
+# control the completion daemon.
+#
+gg-daemon()
+{
+	local pid
+
+	case "$1" in
+	start)
+		__gg_daemon_pid && { echo "gg-daemon: already running (pid $pid)"; return 0; }
+
+		mkdir -p "$GG_CACHEDIR"
+		rm -f "$__gg_daemon_fifo" "$__gg_daemon_pidfile"
+		mkfifo -m 600 "$__gg_daemon_fifo" || return 1
+		( nohup bash "$__gg_script" daemon run </dev/null >/dev/null 2>&1 & )
+
+		# wait for it to come up
+		local i
+		for ((i = 0; i < 50; i++)); do
+			__gg_daemon_pid && return 0
+			sleep 0.1
+		done
+		echo "gg-daemon: failed to start" 1>&2
+		return 1
+		;;
+	stop)
+		__gg_daemon_pid && kill "$pid"
+		rm -f "$__gg_daemon_fifo" "$__gg_daemon_pidfile"
+		;;
+	status)
+		if __gg_daemon_pid; then
+			echo "gg-daemon: running (pid $pid)"
+		else
+			echo "gg-daemon: not running"
+			return 1
+		fi
+		;;
+	run)
+		_gg_daemon_serve
+		;;
+	*)
+		echo "usage: gg-daemon <start|stop|status>" 1>&2
+		return 1
+		;;
+	esac
+}
+
+######################
+
+#
+# Per-org metadata
+#
+# Along with <service>.<org>.cache, we keep a <service>.<org>.meta file
+# with key=value lines recording what we know about the org and how the
+# list was fetched. _meta_read loads these into variables named
+# meta_<key> (which callers should declare local), and _meta_write stores
+# them back.
+#
+# keys:
+#   last_full:   when the list was last downloaded in full (epoch seconds)
+#   last_sync:   when the list was last synchronized (full or incremental)
+#   etag:        ETag of the last incremental response, for conditional
+#                requests (see _rest_call)
+#   next_refresh: the earliest time of the next refresh, when backing off
+#                (see __gg_schedule_refresh)
+#   failures:    the number of consecutive failed refreshes
+#   miss_at:     when the service last told us there's no such org (so we
+#                don't ask again for $GG_NEGATIVE_TTL seconds); empty
+#                once it's been found
+#   owner_type:  'user' or 'group', for services that list the two with
+#                different requests (GitLab; see _gitlab_repo_list)
+#   ratelimit_remaining, ratelimit_reset: the API rate limit, as last
+#                reported by the service (see __gg_note_ratelimit)
+#
+
+# _meta_read <meta_fn> [key...]
+#
+# load all keys, or only the given ones
+_meta_read()
+{
+	local key value k
+	[[ -f "$1" ]] || return 0
+
+	while IFS='=' read -r key value; do
+		[[ $key =~ ^[a-z_]+$ ]] || continue
+		if [[ $# -gt 1 ]]; then
+			for k in "${@:2}"; do
+				[[ $k == "$key" ]] && break
+			done
+			[[ $k == "$key" ]] || continue
+		fi
+		printf -v "meta_$key" '%s' "$value"
+	done < "$1"
+}
+
+# _meta_write <meta_fn> <key> [key...]
+#
+# atomically update the given keys (from $meta_<key>), keeping the others
+_meta_write()
+{
+	local meta="$1"
+	shift
+
+	local tmp="$meta.$$.$RANDOM.tmp"
+	local key value k
+	{
+		if [[ -f "$meta" ]]; then
+			while IFS='=' read -r key value; do
+				for k; do
+					[[ $k == "$key" ]] && continue 2
+				done
+				printf '%s=%s\n' "$key" "$value"
+			done < "$meta"
+		fi
+		for k; do
+			key="meta_$k"
+			printf '%s=%s\n' "$k" "${!key}"
+		done
+	} > "$tmp" && mv "$tmp" "$meta"
+}
+
+# how often (in seconds) to download the full list of repositories, rather
+# than just the ones that changed since the last full download. only full
+# downloads notice deleted or renamed repositories. set to 0 to always
+# download the full list.
+GG_FULL_REFRESH=${GG_FULL_REFRESH:-3600}
+
+# seconds for which a repository list is considered fresh. once it's
+# stale, completions are still served from it while it's being refreshed
+# in the background.
+GG_CACHE_TTL=${GG_CACHE_TTL:-15}
+# seconds for which the list of orgs the user belongs to is considered
+# fresh (these rarely change)
+GG_ORGS_TTL=${GG_ORGS_TTL:-3600}
+# longest wait (in seconds) between retries of a failing refresh
+GG_BACKOFF_MAX=${GG_BACKOFF_MAX:-3600}
+# seconds for which we don't ask again for an org the service told us
+# doesn't exist
+GG_NEGATIVE_TTL=${GG_NEGATIVE_TTL:-600}
+# number of API requests to leave unused when close to the rate limit
+GG_RATELIMIT_RESERVE=${GG_RATELIMIT_RESERVE:-50}
+# seconds after which a refresh lock is considered abandoned
+GG_LOCK_TIMEOUT=${GG_LOCK_TIMEOUT:-300}
+
+#
+# __gg_lock <lock_fn>
+#
+# atomically create <lock_fn> (recording the time in it), or return 1 if
+# someone else holds it. Locks older than $GG_LOCK_TIMEOUT seconds are
+# assumed to have been left behind by a killed process, and are taken
+# over.
+#
+# We use noclobber (O_EXCL) rather than mkdir, so taking a lock doesn't
+# cost a fork.
+#
+__gg_lock()
+{
+	local lock="$1"
+	local started attempt rc noclobber __now
+	__gg_now
+
+	for attempt in 1 2; do
+		noclobber=
+		[[ $- == *C* ]] && noclobber=1
+		set -C
+		{ echo "$__now" > "$lock"; } 2>/dev/null
+		rc=$?
+		[[ -z $noclobber ]] && set +C
+		[[ $rc == 0 ]] && return 0
+
+		# held by someone else; is it still alive? (note: an empty file
+		# means the other process has just created it)
+		started=
+		read -r started 2>/dev/null < "$lock"
+		[[ $started =~ ^[0-9]+$ ]] && (( __now - started >= GG_LOCK_TIMEOUT )) || return 1
+		_dbg "__gg_lock: breaking stale lock $lock (taken at $started)"
+		rm -f "$lock"
+	done
+	return 1
+}
+
+#
+# __gg_refresh_due <cache_fn> [ttl]
+#
+# return 0 if the list in <cache_fn> should be refreshed, i.e. if it's
+# been synchronized more than <ttl> (default: $GG_CACHE_TTL) seconds ago,
+# and we're not backing off (see __gg_schedule_refresh). Doesn't fork.
+#
+__gg_refresh_due()
+{
+	local meta_last_sync= meta_next_refresh= __now
+	_meta_read "${1%.cache}.meta" last_sync next_refresh
+	__gg_now
+
+	(( __now >= ${meta_last_sync:-0} + ${2:-$GG_CACHE_TTL} && __now >= ${meta_next_refresh:-0} ))
+}
+
+#
+# __gg_schedule_refresh <rc>
+#
+# decide how long to hold off the next refresh beyond the usual
+# $GG_CACHE_TTL (storing the earliest time into $meta_next_refresh), given
+# the outcome <rc> of the refresh that's just been attempted:
+#
+#   * after n consecutive failures, wait $GG_CACHE_TTL * 2^n seconds, up to
+#     $GG_BACKOFF_MAX. The failures are counted in $meta_failures.
+#   * if the service told us we're running low on requests
+#     ($meta_ratelimit_*), spread the ones that are left (less
+#     $GG_RATELIMIT_RESERVE) over the time until the limit resets, or wait
+#     for the reset if we're out.
+#
+# Expects $__now, and the meta_* variables of _refresh_repo_cache.
+#
+__gg_schedule_refresh()
+{
+	local rc="$1"
+	local delay=0
+
+	if [[ $rc == 0 ]]; then
+		meta_failures=0
+	else
+		meta_failures=$(( ${meta_failures:-0} + 1 ))
+		local n=$meta_failures
+		(( n > 20 )) && n=20
+		delay=$GG_CACHE_TTL
+		(( delay < 1 )) && delay=1
+		delay=$(( delay << n ))
+		(( delay > GG_BACKOFF_MAX )) && delay=$GG_BACKOFF_MAX
+	fi
+
+	if [[ -n $meta_ratelimit_remaining ]] && (( meta_ratelimit_reset > __now )); then
+		local left=$(( meta_ratelimit_remaining - GG_RATELIMIT_RESERVE ))
+		local window=$(( meta_ratelimit_reset - __now ))
+		if (( left <= 0 )); then
+			(( delay < window )) && delay=$window
+		elif (( delay < window / left )); then
+			delay=$(( window / left ))
+		fi
+	fi
+
+	meta_next_refresh=$(( __now + delay ))
+	_dbg "__gg_schedule_refresh: rc=$rc failures=$meta_failures ratelimit=$meta_ratelimit_remaining/$meta_ratelimit_reset -> in ${delay}s"
+}
+
+#
+# Download the list of repositories of <service>/<org> into <dest_cache_fn>,
+# and schedule the next refresh (see __gg_schedule_refresh).
+#
+# Only one refresh of an org runs at a time: if another one is in progress
+# (holding <dest_cache_fn without .cache>.lock), we return right away. If
+# the download fails, the existing list is kept. If the org doesn't exist,
+# we don't try again for (at least) $GG_NEGATIVE_TTL seconds.
+#
+# Within $GG_FULL_REFRESH seconds of the last full download, we only ask
+# the service for repositories that changed since then, and merge them into
+# the existing list. These requests are made conditional (with the ETag of
+# the previous one), so if nothing changed the refresh costs a single,
+# cheap request.
+#
+# _refresh_repo_cache <service_slug> <org> <dest_cache_fn>
+#
+# author: mjuric@astro.washington.edu
+#
+_refresh_repo_cache()
+{
+	local LOCK="${3%.cache}.lock"
+
+	mkdir -p "$(dirname "$3")"
+	__gg_lock "$LOCK" || return 0
+
+	local rc
+	__gg_refresh_repo_cache "$@"
+	rc=$?
+
+	rm -f "$LOCK"
+	return $rc
+}
+
+#
+# __gg_refresh_since <cache_fn>
+#
+# set $since to the time (seconds since the epoch) from which the
+# repository list in <cache_fn> can be refreshed incrementally, or to ''
+# if it's due for a full download.
+#
+__gg_refresh_since()
+{
+	local meta_last_full= __now
+	_meta_read "${1%.cache}.meta" last_full
+	__gg_now
+
+	since=
+	if [[ -f "$1" && -n $meta_last_full ]] && (( __now - meta_last_full < GG_FULL_REFRESH )); then
+		# note: the window begins a bit before the last full download, to
+		# allow for clock skew. it's kept fixed until the next one, so the
+		# request (and its ETag) stays the same until something changes.
+		since=$(( meta_last_full - 60 ))
+	fi
+}
+
+# _refresh_repo_cache, to be called with the lock held.
+#
+# If <downloaded_fn> is given, the list has already been downloaded into
+# it (by a batched request, see __gg_prefetch_batch), since <since> (as
+# returned by __gg_refresh_since); if it doesn't exist, the download failed
+# (and if <downloaded_fn>.missing does, the org doesn't exist).
+#
+# __gg_refresh_repo_cache <service_slug> <org> <dest_cache_fn> [<downloaded_fn> <since>]
+#
+__gg_refresh_repo_cache()
+{
+	local service="$1"
+	local ORG="$2"
+	local CACHE="$3"
+	local META="${CACHE%.cache}.meta"
+
+	# create a temp file on the same filesystem as the destination file
+	local TMP="$CACHE.$$.$RANDOM.tmp"
+
+	# the first download of an org goes to <org>.partial, which fills up
+	# page by page, so a completion waiting for it can already look at
+	# what's arrived (see _get_repo_list)
+	local NEW="$TMP.new"
+	[[ -f "$CACHE" ]] || NEW="${CACHE%.cache}.partial"
+
+	local meta_last_full= meta_last_sync= meta_etag= meta_next_refresh= meta_failures=
+	local meta_miss_at= meta_owner_type= meta_ratelimit_remaining= meta_ratelimit_reset= __now
+	_meta_read "$META"
+	__gg_now
+
+	# (this is what adds to the cache, so now's the time to keep it in check)
+	__gg_cache_autogc
+
+	local etag=$meta_etag
+
+	# full or incremental?
+	local since rc
+	if [[ -n $4 ]]; then
+		since=$5
+	else
+		__gg_refresh_since "$CACHE"
+	fi
+	[[ -z $since ]] && meta_etag=
+
+	_trace_begin fetch
+	if [[ -n $4 ]]; then
+		[[ -f "$4" ]] && mv "$4" "$NEW"
+		rc=$?
+		[[ -f "$4.missing" ]] && rc=4
+	else
+		"_${service}_repo_list" "$ORG" $since > "$NEW"
+		rc=$?
+	fi
+	_trace_end fetch "service=$service" "org=$ORG" "since=$since" "rc=$rc"
+	_dbg "_refresh_repo_cache: $service $ORG since=$since rc=$rc"
+
+	if [[ -n $since && $rc == 3 ]]; then
+		# nothing changed
+		rm -f "$NEW"
+		touch "$CACHE"
+		[[ -d "$CACHE.t" ]] && touch "$CACHE.t"	# (still up to date)
+		meta_last_sync=$__now
+		meta_miss_at=
+		__gg_schedule_refresh 0
+		_meta_write "$META" last_sync next_refresh failures miss_at owner_type ratelimit_remaining ratelimit_reset
+		return
+	fi
+
+	if [[ $rc != 0 ]]; then
+		# keep what we have, and back off (for a while, if there's no
+		# such org: it's probably been mistyped)
+		rm -f "$NEW"
+		meta_etag=$etag
+		__gg_schedule_refresh "$rc"
+		if [[ $rc == 4 ]]; then
+			meta_miss_at=$__now
+			(( meta_next_refresh < __now + GG_NEGATIVE_TTL )) && meta_next_refresh=$(( __now + GG_NEGATIVE_TTL ))
+		fi
+		_meta_write "$META" next_refresh failures miss_at ratelimit_remaining ratelimit_reset
+		return 1
+	fi
+
+	# the list is kept sorted (in the C locale), so it can be indexed
+	if [[ -n $since ]]; then
+		LC_ALL=C sort -u "$CACHE" "$NEW" > "$TMP"
+	else
+		LC_ALL=C sort -u "$NEW" > "$TMP"
+		meta_last_full=$__now
+	fi
+
+	# atomic update. (mv keeps the time sort wrote $TMP at, which a memo
+	# stamp touched since would be newer than; see __gg_memo_lookup)
+	mv "$TMP" "$CACHE"
+	touch "$CACHE"
+	rm -f "$NEW"
+
+	meta_last_sync=$__now
+	meta_miss_at=
+	__gg_schedule_refresh 0
+	_meta_write "$META" last_full last_sync etag next_refresh failures miss_at owner_type ratelimit_remaining ratelimit_reset
+
+	_repo_cache_index "$CACHE"
+	[[ -n $GG_FUZZY ]] && _repo_cache_trigrams "$CACHE"
+	return 0
+}
+
+# minimum number of repositories in an org for its cache to get indexed
+GG_INDEX_MIN=${GG_INDEX_MIN:-1000}
+
+#
+# Build the prefix index of a (sorted) repository cache. The index is a
+# directory named <cache>.d, with one shard per distinct two-character
+# prefix holding all repositories beginning with that prefix. The shards
+# are named by the hex-encoded prefix (e.g., 'ap' -> '6170'), so arbitrary
+# characters are safe.
+#
+# This lets _repo_cache_lookup read only the repositories matching what's
+# been typed instead of the whole list. We use shard files rather than
+# offsets into the list as bash has no way to seek within a file without
+# forking.
+#
+# Lists shorter than $GG_INDEX_MIN are cheaper to just read in full, and
+# aren't indexed.
+#
+# _repo_cache_index <cache_fn>
+#
+_repo_cache_index()
+{
+	local cache="$1"
+	local dir="$cache.d"
+	local tmp="$cache.d.$$.$RANDOM.tmp"
+	local old="$cache.d.$$.$RANDOM.old"
+
+	if (( $(wc -l < "$cache") < GG_INDEX_MIN )); then
+		rm -rf "$dir"
+		return
+	fi
+
+	# write out the shards. the input is sorted, so each shard's lines
+	# are contiguous and we only need one open file at a time.
+	mkdir -p "$tmp"
+	LC_ALL=C awk -v dir="$tmp" '
+		BEGIN {
+			for (i = 1; i < 256; i++) hex[sprintf("%c", i)] = sprintf("%02x", i)
+			hex[""] = ""
+		}
+		{
+			fn = dir "/" hex[substr($0, 1, 1)] hex[substr($0, 2, 1)]
+			if (fn != prev) {
+				if (prev != "") close(prev)
+				prev = fn
+			}
+			print > fn
+		}' "$cache" || { rm -rf "$tmp"; return 1; }
+
+	# swap in the new index; readers fall back to the full list during the
+	# brief moment there's none.
+	[[ -d "$dir" ]] && mv "$dir" "$old"
+	if [[ -e "$dir" ]]; then
+		# someone else just beat us to it
+		rm -rf "$tmp"
+	else
+		mv "$tmp" "$dir"
+	fi
+	rm -rf "$old"
+}
+
+#
+# Return the repositories from <cache_fn> that may begin with <prefix> in
+# ${REPOS[@]}. If the cache has been indexed (see _repo_cache_index) only
+# the shard(s) for the typed prefix are read; otherwise, the whole list is
+# returned. The caller is expected to do the exact prefix matching.
+#
+# _repo_cache_lookup <cache_fn> <prefix>
+#
+_repo_cache_lookup()
+{
+	local cache="$1"
+	local prefix="$2"
+
+	if [[ -z $prefix || ! -d "$cache.d" ]]; then
+		__readlines REPOS < "$cache"
+		return
+	fi
+
+	# the shard name, from the first (up to) two characters of the prefix
+	local LC_ALL=C
+	local key c
+	printf -v key '%02x' "'${prefix:0:1}"
+	if [[ ${#prefix} -ge 2 ]]; then
+		printf -v c '%02x' "'${prefix:1:1}"
+		key+=$c
+	fi
+
+	# a single typed character may match multiple shards
+	local shard part
+	REPOS=()
+	for shard in "$cache.d/$key"*; do
+		[[ -f "$shard" ]] || continue
+		__readlines part < "$shard"
+		REPOS+=( "${part[@]}" )
+	done
+}
+
+# number of orgs whose repository lists a shell keeps in memory (see
+# __gg_memo_lookup). set to 0 to always read the cache files.
+GG_MEMO_ORGS=${GG_MEMO_ORGS:-8}
+
+#
+# In-shell memo of repository lists (bash 4.2+). Consecutive TABs in the
+# same org would otherwise re-read its cache every time, so we keep the
+# parsed lists of the $GG_MEMO_ORGS most recently used orgs in the shell:
+#
+#   __gg_memo_slots[<service>.<org>]   the slot holding the org's list
+#   __gg_memo_repos_<slot>             the list itself (sorted)
+#   __gg_memo_view_<slot>              the repositories beginning with...
+#   __gg_memo_vprefix[<slot>]          ...this, from the org's last lookup
+#   __gg_memo_lru                      the orgs, least recently used first
+#
+# A list is used for as long as the cache file hasn't changed since we read
+# it, i.e. is older than a stamp we touch just before reading it
+# (<cache without .cache>.memo.<pid>). (bash has no way to get at a
+# file's mtime without forking, but it can compare two.)
+#
+# The lists are sorted, so the repositories beginning with a prefix are a
+# contiguous slice, which we find by bisection. While typing, each TAB's
+# prefix usually extends the one before, so we look in the last lookup's
+# view, when we can, rather than in the whole list.
+#
+# The associative array is declared with -g, which bash 3.2 (and 4.0/4.1)
+# don't know; they get no memo, and read the cache files as before.
+#
+__gg_memo_assoc=
+__gg_memo_lru=()
+__gg_memo_vprefix=()
+declare -gA __gg_memo_slots 2>/dev/null && __gg_memo_assoc=1
+
+#
+# Return the repositories from <cache_fn> beginning with <prefix> in
+# ${REPOS[@]}, from the memo if it's still valid (or after (re)reading the
+# cache into it). Returns 1 if there's no memo (see above).
+#
+# __gg_memo_lookup <service>.<org> <cache_fn> <prefix>
+#
+__gg_memo_lookup()
+{
+	[[ -n $__gg_memo_assoc ]] && (( GG_MEMO_ORGS > 0 )) || return 1
+
+	local key="$1" cache="$2" prefix="$3"
+	local stamp="${cache%.cache}.memo.$$"
+	local slot=${__gg_memo_slots[$key]} k
+	local -a lru=()
+
+	if [[ -n $slot && $stamp -nt $cache ]]; then
+		# still valid; move it to the back of the LRU list
+		for k in "${__gg_memo_lru[@]}"; do
+			[[ $k == "$key" ]] || lru+=( "$k" )
+		done
+		__gg_memo_lru=( "${lru[@]}" "$key" )
+	else
+		if [[ -z $slot ]]; then
+			if (( ${#__gg_memo_lru[@]} < GG_MEMO_ORGS )); then
+				slot=${#__gg_memo_lru[@]}
+			else
+				# evict the least recently used
+				k=${__gg_memo_lru[0]}
+				slot=${__gg_memo_slots[$k]}
+				unset "__gg_memo_slots[$k]"
+				__gg_memo_lru=( "${__gg_memo_lru[@]:1}" )
+			fi
+			__gg_memo_slots[$key]=$slot
+			__gg_memo_lru+=( "$key" )
+
+			# clean up after shells that have exited
+			local old pid
+			for old in "${cache%.cache}".memo.*; do
+				pid=${old##*.}
+				[[ -f $old && $pid != "$$" ]] && ! kill -0 "$pid" 2>/dev/null && rm -f "$old"
+			done
+		fi
+
+		# (the stamp goes first: if the cache is replaced while we're
+		# reading it, it's newer than the stamp, and gets read again)
+		: > "$stamp" 2>/dev/null || return 1
+		__readlines "__gg_memo_repos_$slot" < "$cache"
+		unset "__gg_memo_vprefix[$slot]"
+	fi
+
+	local arr="__gg_memo_repos_$slot"
+	if [[ -z $prefix ]]; then
+		eval "REPOS=( \"\${$arr[@]}\" )"
+		return 0
+	fi
+	if [[ -n ${__gg_memo_vprefix[slot]} && $prefix == "${__gg_memo_vprefix[slot]}"* ]]; then
+		arr="__gg_memo_view_$slot"
+	fi
+
+	# bisect for the first repository >= prefix (as __gg_print_prefixed
+	# does), and collect those beginning with it
+	local LC_ALL=C
+	local lo=0 hi mid ref
+	eval "hi=\${#$arr[@]}"
+	while (( lo < hi )); do
+		mid=$(( (lo + hi) / 2 ))
+		ref="$arr[$mid]"
+		if [[ ${!ref} < "$prefix" ]]; then lo=$(( mid + 1 )); else hi=$mid; fi
+	done
+
+	REPOS=()
+	for (( ; ; lo++ )); do
+		ref="$arr[$lo]"
+		[[ -n ${!ref} && ${!ref} == "$prefix"* ]] || break
+		REPOS+=( "${!ref}" )
+	done
+
+	eval "__gg_memo_view_$slot=( \"\${REPOS[@]}\" )"
+	__gg_memo_vprefix[slot]=$prefix
+}
+
+#
+# Fuzzy matching (enabled by setting GG_FUZZY). When no repository (or
+# org) begins with what's been typed, we offer those whose names contain
+# it, or are similar to it, from the given org or (if no org has been
+# typed) from all orgs with cached lists.
+#
+# Each cache gets a trigram index, a directory named <cache>.t with up to
+# 256 shards. Every repository is listed in the shard of each (lowercase)
+# three-character sequence of its name, where the shard is picked by a
+# hash of the trigram. Lookups only read the shards of the typed text's
+# trigrams; the (few) false positives from hash collisions are weeded out
+# by the ranking.
+#
+# The index is rebuilt when _refresh_repo_cache replaces a cache, or on
+# the first lookup after GG_FUZZY has been turned on.
+#
+
+# the trigram -> shard hash, shared by the awk scripts below
+__gg_trigram_awk='
+	function trigram_shard(t) {
+		return sprintf("%02x", (ord[substr(t, 1, 1)] * 961 + ord[substr(t, 2, 1)] * 31 + ord[substr(t, 3, 1)]) % 256)
+	}
+	BEGIN { for (i = 1; i < 256; i++) ord[sprintf("%c", i)] = i }
+'
+
+#
+# _repo_cache_trigrams <cache_fn>
+#
+# (re)build the trigram index of <cache_fn>
+#
+_repo_cache_trigrams()
+{
+	local cache="$1"
+	local dir="$cache.t"
+	local tmp="$cache.t.$$.$RANDOM.tmp"
+	local old="$cache.t.$$.$RANDOM.old"
+
+	# emit (shard, repo) pairs, and write them out sorted by shard so we
+	# only need one open file at a time
+	mkdir -p "$tmp"
+	LC_ALL=C awk "$__gg_trigram_awk"'
+		{
+			name = tolower($0)
+			split("", seen)
+			for (i = 1; i + 2 <= length(name); i++) {
+				s = trigram_shard(substr(name, i, 3))
+				if (!(s in seen)) { seen[s] = 1; print s "\t" $0 }
+			}
+		}' "$cache" \
+	| LC_ALL=C sort -t $'\t' -k1,1 -s \
+	| LC_ALL=C awk -F '\t' -v dir="$tmp" '
+		{
+			fn = dir "/" $1
+			if (fn != prev) {
+				if (prev != "") close(prev)
+				prev = fn
+			}
+			print $2 > fn
+		}' || { rm -rf "$tmp"; return 1; }
+
+	# swap in the new index
+	[[ -d "$dir" ]] && mv "$dir" "$old"
+	if [[ -e "$dir" ]]; then
+		rm -rf "$tmp"
+	else
+		mv "$tmp" "$dir"
+	fi
+	rm -rf "$old"
+}
+
+#
+# _fuzzy_lookup <service_slug> <org> <text>
+#
+# return up to 50 repositories (as "<org>/<repo>") matching <text> in
+# ${FUZZY[@]}, best matches first, from <org> or (if empty) all cached
+# orgs. From best to worst, a match is one where the name:
+#
+#   - begins with <text>
+#   - contains <text>, beginning at a word boundary (after - _ or .)
+#   - contains <text> anywhere
+#   - shares at least half of the trigrams of <text>
+#
+# with shorter names first within each group. The comparisons are case
+# insensitive. <text> must be at least three characters long.
+#
+_fuzzy_lookup()
+{
+	local service="$1" org="$2" text="$3"
+	FUZZY=()
+
+	# caches to look in, (re)indexing any whose index is missing or stale
+	local cache caches dirs=()
+	if [[ -n $org ]]; then
+		caches=( "$GG_CACHEDIR/$service.$org.cache" )
+	else
+		caches=( "$GG_CACHEDIR/$service".*.cache )
+	fi
+	for cache in "${caches[@]}"; do
+		[[ -f $cache ]] || continue
+		if [[ ! -d $cache.t || $cache -nt $cache.t ]]; then
+			_repo_cache_trigrams "$cache" || continue
+		fi
+		dirs+=( "$cache.t" )
+	done
+	[[ ${#dirs[@]} == 0 ]] && return
+
+	__readlines FUZZY < <(LC_ALL=C awk -v q="$text" -v prefix="$GG_CACHEDIR/$service." -v max=50 "$__gg_trigram_awk"'
+		function consider(org, name,   n, p, c, t, shared, score) {
+			n = tolower(name)
+			p = index(n, q)
+			if (p == 1) {
+				score = 400
+			} else if (p > 1) {
+				c = substr(n, p - 1, 1)
+				score = (c == "-" || c == "_" || c == ".") ? 300 : 200
+			} else {
+				shared = 0
+				for (t in qt) if (index(n, t)) shared++
+				if (shared * 2 < nq) return
+				score = int(100 * shared / nq)
+			}
+			cand[++ncand] = org "/" name
+			cscore[ncand] = score
+			clen[ncand] = length(name)
+		}
+		function better(a, b) {
+			if (cscore[a] != cscore[b]) return cscore[a] > cscore[b]
+			if (clen[a] != clen[b]) return clen[a] < clen[b]
+			return cand[a] < cand[b]
+		}
+		BEGIN {
+			q = tolower(q)
+			for (i = 1; i + 2 <= length(q); i++) {
+				t = substr(q, i, 3)
+				if (!(t in qt)) { qt[t] = 1; nq++; shards[trigram_shard(t)] = 1 }
+			}
+
+			for (d = 1; d < ARGC; d++) {
+				org = substr(ARGV[d], length(prefix) + 1)
+				sub(/\.cache\.t$/, "", org)
+				for (s in shards) {
+					fn = ARGV[d] "/" s
+					while ((getline name < fn) > 0) {
+						if (!((org, name) in seen)) { seen[org, name] = 1; consider(org, name) }
+					}
+					close(fn)
+				}
+			}
+
+			# pick the best <max>, in order
+			for (k = 1; k <= max && k <= ncand; k++) {
+				best = k
+				for (i = k + 1; i <= ncand; i++) if (better(i, best)) best = i
+				if (best != k) {
+					tmp = cand[k]; cand[k] = cand[best]; cand[best] = tmp
+					tmp = cscore[k]; cscore[k] = cscore[best]; cscore[best] = tmp
+					tmp = clen[k]; clen[k] = clen[best]; clen[best] = tmp
+				}
+				print cand[k]
+			}
+		}' "${dirs[@]}")
+}
+
+# set ${REPOS[@]} to the (newline-separated) repositories in <lines>
+#
+# __gg_lines_to_repos <lines>
+#
+__gg_lines_to_repos()
+{
+	REPOS=()
+	local repo
+	while IFS= read -r repo; do
+		[[ -n $repo ]] && REPOS+=( "$repo" )
+	done <<<"$1"
+}
+
+# set ${REPOS[@]} to the repositories in the partially downloaded list
+# <partial_fn> that begin with <prefix>, returning 1 if there are none.
+# (a last line that's still being written is left out.)
+#
+# __gg_partial_lookup <partial_fn> <prefix>
+#
+__gg_partial_lookup()
+{
+	REPOS=()
+	local repo
+	while IFS= read -r repo; do
+		[[ $repo == "$2"* ]] && REPOS+=( "$repo" )
+	done < "$1"
+	(( ${#REPOS[@]} ))
+}
+
+# get list of repositories from organization $1
+# cache the list in $GG_CACHEDIR/github.com.$1.cache"
+#
+# if <prefix> is given, the returned list may be limited to repositories
+# beginning with it (see _repo_cache_lookup).
+#
+# the first time an org is asked for, we don't wait for its full list if
+# we don't have to: if the service can search for the repositories
+# beginning with <prefix> (_<service>_repo_search), we return what that
+# finds, and otherwise return as soon as the pages downloaded so far
+# (<org>.partial) include a repository beginning with <prefix>. Either way,
+# the full list keeps downloading in the background, and $REPOS_PARTIAL is
+# set to tell the caller there may be more than we've returned.
+#
+# _get_repo_list <service_slug> <org> [prefix]
+#
+# author: mjuric@astro.washington.edu
+#
+_get_repo_list()
+{
+	local service="$1"
+	local org="$2"
+	local CACHE="$GG_CACHEDIR/$service.$org.cache"
+	local LOCK="$GG_CACHEDIR/$service.$org.lock"
+	local waiting= cold=
+	REPOS_PARTIAL=
+
+	# fire off a background cache update if the cache is due for a refresh
+	# (or non-existant), unless one is already running. we take the lock
+	# here rather than in the background, so we know whether to wait for
+	# it below.
+	if __gg_refresh_due "$CACHE"; then
+		[[ -d "$GG_CACHEDIR" ]] || mkdir -p "$GG_CACHEDIR"
+		if ! __gg_lock "$LOCK"; then
+			:
+		elif [[ -f "$CACHE" ]]; then
+			( { __gg_refresh_repo_cache "$service" "$org" "$CACHE"; rm -f "$LOCK"; } </dev/null >/dev/null 2>&1 & )
+		else
+			# the first download, which we'll wait for below: it runs
+			# in a process substitution, telling us on descriptor 216
+			# as each page arrives (__gg_page_done), and closing it
+			# once it's done. (like any background job, it must
+			# survive a ^C, and our not listening any more.)
+			exec 216< <( trap '' INT PIPE; { __gg_progress=1 __gg_refresh_repo_cache "$service" "$org" "$CACHE"; rm -f "$LOCK"; } 216>&1 </dev/null >/dev/null 2>&1 )
+			waiting=1
+		fi
+	fi
+
+	# this is the first time we're asking for the list of repos
+	# in this organization, wait for the result (or for the refresh to fail)
+	if [[ ! -f "$CACHE" ]]; then
+		cold=1
+		__gg_cache_access "$service.$org" miss
+
+		# ask the service for just the repositories we need
+		if [[ -n $3 && $3 =~ ^[A-Za-z0-9._-]+$ && -f "$LOCK" ]] && declare -F "_${service}_repo_search" >/dev/null; then
+			_trace_begin search
+			local found
+			found=$("_${service}_repo_search" "$org" "$3" 2>/dev/null)
+			__gg_lines_to_repos "$found"
+			_trace_end search "repos=${#REPOS[@]}"
+			[[ ${#REPOS[@]} != 0 ]] && { exec 216<&-; REPOS_PARTIAL=1; return 0; }
+		fi
+
+		_trace_begin cold_wait
+		start_spinner
+		local PARTIAL="$GG_CACHEDIR/$service.$org.partial" partial= line rest= opened=
+		REPOS=()
+		while [[ ! -f "$CACHE" && -f "$LOCK" ]]; do
+			if [[ -z $waiting ]]; then
+				# someone else is downloading it; all we can do is look
+				# at what's arrived so far every now and then
+				if [[ -f "$PARTIAL" ]] && __gg_partial_lookup "$PARTIAL" "$3"; then
+					partial=1
+					break
+				fi
+				sleep 0.1
+				continue
+			fi
 
-	# here we construct a list of directories containing git repositories
-	# in addition to the list of _all_ directories. The algorithm:
-	#
-	# 1. list directories with HEAD (bare git dirs) and .git/ (workdirs)
-	# 2. list all directories
-	# 3. escape any characters the shell would be unhappy about
-	# 4. merge the above lists, sort them, and run unique -c which prints
-	#    out the number of times an entry has appeared. the directories
-	#    which are git dirs will have appeared _twice_ (once because they
-	#    were picked up by #1 above, once because of #2.
-	# 5. for each dir that appeared twice, append a ' ' to the end signaling
-	#    the end of completion. otherwise, append a '/'.
-	local cmd
-	read -r -d '' cmd <<-EOF
-		(
-			ls -aF1dL $path*/HEAD | sed -n 's|/HEAD[^/]*$||p';
-			ls -aF1dL $path*/.git | sed -n 's|/.git/$||p';
-			ls -aF1dL $path* | sed -n 's|/$||p'
-		) 2>/dev/null \
-		| sed -e 's/[][(){}<>",:;^&!\$=?\`|\\'"'"'[:space:]]/\\\&/g' \
-		| sort | uniq -c | sed -nE 's| *2 (.*)|\1 |p; s| *1 (.*)|\1/|p'
-	EOF
-	_dbg "cmd=$cmd"
+			# wait for the next page (or for the download to end)
+			read -r line <&216 || { waiting=; continue; }
+
+			# is what's arrived so far enough? we keep the partial list
+			# open, and look only at the lines added since the last page
+			# ($rest holding a last line that was still being written)
+			if [[ -z $opened ]]; then
+				# (it's gone if the download has just finished)
+				{ exec 213< "$PARTIAL"; } 2>/dev/null || continue
+				opened=1
+			fi
+			while IFS= read -r line; do
+				line=$rest$line rest=
+				[[ $line == "$3"* ]] && REPOS+=( "$line" )
+			done <&213
+			rest+=$line
+			if (( ${#REPOS[@]} )); then
+				partial=1
+				break
+			fi
+		done
+		stop_spinner
+		exec 213<&- 216<&-
+		_trace_end cold_wait "partial=$partial"
 
-	# grab all
-	local files
-	files=$(_ssh "$userhost" "$cmd")
+		[[ -n $partial ]] && { REPOS_PARTIAL=1; return 0; }
+		[[ -f "$CACHE" ]] || { REPOS=(); return 1; }
+	fi
 
-	# shellcheck disable=SC2206  # the expansion here is intentional
-	COMPREPLY=( $files )
-	_dbg "===$files==="
+	# return the list of repos (from memory, if we can)
+	_trace_begin cache_read
+	__gg_memo_lookup "$service.$org" "$CACHE" "$3" || _repo_cache_lookup "$CACHE" "$3"
+	_trace_end cache_read "repos=${#REPOS[@]}"
+	[[ -n $cold ]] || __gg_cache_access "$service.$org" hit
 }
 
-# test if we're completing a generic SSH URL, complete it if so, return 1
-# otherwise and the URL prefix to watch for in __PREFIXES
 #
-# args:
-#       $cur
+# Download the list of orgs the user belongs to on <service> (their own
+# user/namespace, plus the orgs, groups or workspaces they're a member of)
+# into <dest_cache_fn>, and schedule the next refresh. To be called with
+# the lock (<dest_cache_fn without .cache>.lock) held. If the download
+# fails, the existing list is kept.
 #
-# opts:
-#      -p  -- only add prefixes to __PREFIXES, don't match URL
+# __gg_refresh_org_list <service_slug> <dest_cache_fn>
 #
-# returns:
-#	COMPREPLY
-#	Adds own prefixes to __PREFIXES
+__gg_refresh_org_list()
+{
+	local service="$1"
+	local CACHE="$2"
+	local META="${CACHE%.cache}.meta"
+	local TMP="$CACHE.$$.$RANDOM.tmp"
+
+	local meta_last_sync= meta_next_refresh= meta_failures=
+	local meta_ratelimit_remaining= meta_ratelimit_reset= __now
+	_meta_read "$META"
+	__gg_now
+
+	_trace_begin fetch
+	"_${service}_org_list" > "$TMP"
+	local rc=$?
+	_trace_end fetch "service=$service" "what=orgs" "rc=$rc"
+	_dbg "__gg_refresh_org_list: $service rc=$rc"
+
+	if [[ $rc != 0 ]]; then
+		rm -f "$TMP"
+		__gg_schedule_refresh "$rc"
+		_meta_write "$META" last_sync next_refresh failures ratelimit_remaining ratelimit_reset
+		return 1
+	fi
+	mv "$TMP" "$CACHE"
+	touch "$CACHE"		# (mv keeps $TMP's time; see _get_org_list)
+
+	meta_last_sync=$__now
+	__gg_schedule_refresh 0
+	_meta_write "$META" last_sync next_refresh failures ratelimit_remaining ratelimit_reset
+}
+
 #
-# author: mjuric@astro.washington.edu
+# (re)build the org index <index_fn>: the names of the directories in
+# <projects_dir> (the orgs already cloned from), merged with the orgs the
+# user belongs to (<index_fn without .index>.cache, if it's been
+# downloaded). The first line records <projects_dir>, so changing
+# $PROJECTS invalidates the index.
 #
-_complete_ssh_url()
+# __gg_org_index <projects_dir> <index_fn>
+#
+__gg_org_index()
 {
-	local prefix_only=
-	[[ "$1" == "-p" ]] && { prefix_only=1; shift; }
+	local projects="$1"
+	local INDEX="$2"
+	local REMOTE="${INDEX%.index}.cache"
+	local TMP="$INDEX.$$.tmp"
 
-	local cur="$1"
-	local recent="$GG_CACHEDIR/ssh.recent"
+	local dir
+	{
+		printf '%s\n' "$projects"
+		{
+			for dir in "$projects"/*/; do
+				dir=${dir%/}; dir=${dir##*/}
+				[[ $dir == *" "* || $dir == .* || ! -d $projects/$dir ]] && continue
+				printf '%s\n' "$dir"
+			done
+			[[ -f $REMOTE ]] && cat "$REMOTE"
+		} | LC_ALL=C sort -u
+	} > "$TMP" && mv "$TMP" "$INDEX"
+}
 
-	# $cur may be [foo@]example.com:[dir]; check if that's the case
-	_dbg "_complete_ssh_url: cur=$cur"
-	if [[ $cur != *:* || $prefix_only == 1 ]]; then
-		local offers
-		__readlines offers < <(cut -d ' ' -f 2 "$recent" 2>/dev/null)
-		offers=( "${offers[@]/%/:}" )
-		#_dbg "offers=[${offers[*]}]"
-		__PREFIXES="$__PREFIXES ${offers[*]}"
-		return 1
+#
+# get the list of orgs to offer when completing <service>'s org names,
+# from an index in $GG_CACHEDIR/<service>@orgs.index (see __gg_org_index).
+# The index is only rebuilt when the projects directory or the list of the
+# user's orgs change (as told by their modification times), so a warm
+# lookup is a single read of a small file, without forking.
+#
+# If we're authenticated to the service, the list of the user's orgs is
+# refreshed in the background every $GG_ORGS_TTL seconds; its results
+# show up in the completions that follow.
+#
+# ('@' can't appear in org names, so these files never clash with the
+# repository caches.)
+#
+# _get_org_list <service_slug> <projects_dir>
+#
+#  returns:
+#    the list of orgs in ${ORGS[@]}
+#
+_get_org_list()
+{
+	local service="$1"
+	local projects="$2"
+	local INDEX="$GG_CACHEDIR/$service@orgs.index"
+	local CACHE="$GG_CACHEDIR/$service@orgs.cache"
+	local LOCK="$GG_CACHEDIR/$service@orgs.lock"
+
+	local GG_AUTH var
+	var="GG_AUTH_$service"; GG_AUTH=${!var}
+
+	if [[ -f $GG_AUTH ]] && hash jq 2>/dev/null && __gg_refresh_due "$CACHE" "$GG_ORGS_TTL"; then
+		[[ -d "$GG_CACHEDIR" ]] || mkdir -p "$GG_CACHEDIR"
+		if __gg_lock "$LOCK"; then
+			( { __gg_refresh_org_list "$service" "$CACHE"; rm -f "$LOCK"; } </dev/null >/dev/null 2>&1 & )
+		fi
 	fi
-	_dbg "_complete_ssh_url: cur=$cur PASSED"
 
-	# autocomplete the path
-	start_spinner
-	_ssh_list_repos "$cur"
-	stop_spinner
+	# is the index still up to date?
+	local line=
+	[[ -f $INDEX ]] && read -r line < "$INDEX"
+	if [[ $line != "$projects" || $projects -nt $INDEX || $CACHE -nt $INDEX ]]; then
+		[[ -d "$GG_CACHEDIR" ]] || mkdir -p "$GG_CACHEDIR"
+		__gg_org_index "$projects" "$INDEX"
+	fi
 
-	# remember last few successful completions to offer to
-	# autocomplete them.
-	if [[ ${#COMPREPLY[@]} != 0 ]]; then
-		#_dbg "recent=[$recent]"
-		mkdir -p "$(dirname "$recent")"
+	ORGS=()
+	{
+		read -r line
+		while IFS= read -r line; do
+			ORGS+=( "$line" )
+		done
+	} < "$INDEX"
+}
 
-		local tmp="$recent.$$.$RANDOM.tmp"
-		cat "$recent" >"$tmp" 2>/dev/null
-		local userhost=${cur%%:*}
-		echo "$(date +%s) $userhost" >> "$tmp"
+# number of orgs refreshed concurrently by gg-prefetch
+GG_PREFETCH_WORKERS=${GG_PREFETCH_WORKERS:-4}
+# number of orgs gg-prefetch lists with a single request, for services that
+# support it (those with a _<service>_repo_lists function; GitHub)
+GG_PREFETCH_BATCH=${GG_PREFETCH_BATCH:-8}
 
-		# keep 5 most recently used unique entries
-		# algorithm: sort desc by hostname, time | keep first of each hosts | sort desc by time | keep first 5
-		sort -k2,2 -k1,1 -r "$tmp" | uniq -f 1 | sort -rn -k1,1 | head -n 5 > "$tmp.2"
-		mv "$tmp.2" "$recent"
+#
+# gg-prefetch [-q] [-j <workers>] [service...]
+#
+# refresh the repository lists of all orgs that have a directory in
+# $PROJECTS/<host>/ (i.e., those offered when completing the org name),
+# for all services or just the given ones, so interactive completion never
+# has to wait for a download. At most <workers> (default:
+# $GG_PREFETCH_WORKERS) orgs are refreshed at a time.
+#
+# Prints one line per org with the outcome (ok, failed, deferred if it's
+# backing off, or busy if someone else is refreshing it) and how long it
+# took (with -q, only the failures), and returns 1 if any refresh failed.
+#
+# Safe to run from cron or a systemd timer: overlapping runs exit right
+# away, refreshes already started by interactive shells aren't duplicated,
+# and orgs whose refreshes are backing off (see __gg_schedule_refresh) are
+# left alone.
+#
+gg-prefetch()
+{
+	local quiet= workers=$GG_PREFETCH_WORKERS
+	local OPTIND opt
+	while getopts "qj:" opt; do
+		case "$opt" in
+		q) quiet=1 ;;
+		j) workers=$OPTARG ;;
+		*) echo "usage: gg-prefetch [-q] [-j <workers>] [service...]" 1>&2; return 1 ;;
+		esac
+	done
+	shift $((OPTIND - 1))
+	[[ $workers =~ ^[1-9][0-9]*$ ]] || { echo "gg-prefetch: invalid number of workers '$workers'" 1>&2; return 1; }
 
-		rm -f "$tmp" "$tmp.2"
+	local -a services=( "$@" )
+	[[ ${#services[@]} == 0 ]] && services=( "${__SERVICES[@]}" )
+
+	mkdir -p "$GG_CACHEDIR"
+	local LOCK="$GG_CACHEDIR/prefetch.lock"
+	__gg_lock "$LOCK" || { [[ -n $quiet ]] || echo "gg-prefetch: already running"; return 0; }
+
+	# the workers record their failures here
+	local failed="$GG_CACHEDIR/prefetch.$$.failed"
+	rm -f "$failed"
+
+	# (run in a subshell, so interactive shells don't print job
+	# control messages for the workers)
+	(
+		local PROJECTS="${PROJECTS:-$HOME/projects}"
+		local service chost auth dir org var
+		local -a pids=() batch=()
+
+		for service in "${services[@]}"; do
+			if [[ " ${__SERVICES[*]} " != *" $service "* ]]; then
+				echo "gg-prefetch: unknown service '$service'" 1>&2
+				echo "$service" >> "$failed"
+				continue
+			fi
+
+			var="GG_CANONICAL_HOST_$service"; chost=${!var}
+			var="GG_AUTH_$service"; auth=${!var}
+			if [[ ! -f "$auth" ]]; then
+				[[ -n $quiet ]] || printf '%-8s %10s  %s\n' skipped "" "$chost (run init-$service-completion to authenticate)"
+				continue
+			fi
+
+			for dir in "$PROJECTS/$chost"/*/; do
+				[[ -d "$dir" ]] || continue
+				org=${dir%/}
+				org=${org##*/}
+				# (the same orgs completion offers)
+				[[ $org == *' '* ]] && continue
+
+				if declare -F "_${service}_repo_lists" >/dev/null; then
+					batch+=( "$org" )
+					(( ${#batch[@]} < GG_PREFETCH_BATCH )) || { __gg_prefetch_spawn __gg_prefetch_batch "$service" "$chost" "${batch[@]}"; batch=(); }
+				else
+					__gg_prefetch_spawn __gg_prefetch_org "$service" "$org" "$chost"
+				fi
+			done
+			(( ${#batch[@]} == 0 )) || { __gg_prefetch_spawn __gg_prefetch_batch "$service" "$chost" "${batch[@]}"; batch=(); }
+		done
+		wait
+	)
+
+	local rc=0
+	[[ -f "$failed" ]] && rc=1
+	rm -f "$failed" "$LOCK"
+	return $rc
+}
+
+# __gg_prefetch_spawn <command...>
+#
+# run <command> in the background once one of gg-prefetch's $workers is
+# free (their pids are in $pids), recording a failure in $failed
+__gg_prefetch_spawn()
+{
+	# bash 3.2 has no `wait -n`, so we wait for the oldest one.
+	while (( ${#pids[@]} >= workers )); do
+		wait "${pids[0]}"
+		pids=( "${pids[@]:1}" )
+	done
+
+	{ "$@" || echo "$*" >> "$failed"; } &
+	pids+=( $! )
+}
+
+# __gg_prefetch_report <status> <milliseconds> <what>
+#
+# print gg-prefetch's outcome line for <what> (with -q, only the failures).
+# <milliseconds> is empty if nothing was downloaded.
+__gg_prefetch_report()
+{
+	[[ -z $quiet || $1 == failed ]] || return 0
+
+	if [[ -n $2 ]]; then
+		printf '%-8s %5d.%03ds  %s\n' "$1" $(( $2 / 1000 )) $(( $2 % 1000 )) "$3"
+	else
+		printf '%-8s %10s  %s\n' "$1" "" "$3"
 	fi
+}
 
-	return 0
+# __gg_prefetch_org <service> <org> <chost>
+#
+# refresh a single org for gg-prefetch, and print the outcome
+__gg_prefetch_org()
+{
+	local service="$1" org="$2" chost="$3"
+	local CACHE="$GG_CACHEDIR/$service.$org.cache"
+	local status=ok rc=0 t0= __now_ms __now
+
+	local meta_next_refresh=
+	_meta_read "${CACHE%.cache}.meta" next_refresh
+	__gg_now
+	if (( __now < ${meta_next_refresh:-0} )); then
+		status=deferred
+	elif ! __gg_lock "${CACHE%.cache}.lock"; then
+		status=busy
+	else
+		__gg_now_ms; t0=$__now_ms
+		__gg_refresh_repo_cache "$service" "$org" "$CACHE" || { status=failed; rc=1; }
+		__gg_now_ms; t0=$(( __now_ms - t0 ))
+		rm -f "${CACHE%.cache}.lock"
+	fi
+
+	__gg_prefetch_report "$status" "$t0" "$chost/$org"
+	return $rc
 }
 
-######################
+# __gg_prefetch_batch <service> <chost> <org>...
+#
+# refresh several orgs for gg-prefetch, downloading their lists with
+# batched requests (see _github_repo_lists), and print the outcome for
+# each. Orgs that are backing off, or are being refreshed by someone else,
+# are left out of the batch.
+__gg_prefetch_batch()
+{
+	local service="$1" chost="$2"
+	shift 2
+
+	local org CACHE since dir i rc=0 t0 __now_ms __now
+	local -a locked=() sinces=() specs=()
+
+	local meta_next_refresh
+	__gg_now
+	for org; do
+		CACHE="$GG_CACHEDIR/$service.$org.cache"
+		meta_next_refresh=
+		_meta_read "${CACHE%.cache}.meta" next_refresh
+		if (( __now < ${meta_next_refresh:-0} )); then
+			__gg_prefetch_report deferred "" "$chost/$org"
+		elif __gg_lock "${CACHE%.cache}.lock"; then
+			__gg_refresh_since "$CACHE"
+			locked+=( "$org" )
+			sinces+=( "$since" )
+			specs+=( "$org${since:+:$since}" )
+		else
+			__gg_prefetch_report busy "" "$chost/$org"
+		fi
+	done
+	(( ${#locked[@]} )) || return 0
+
+	dir=$(mktemp -d)
+	__gg_now_ms; t0=$__now_ms
+	"_${service}_repo_lists" "$dir" "${specs[@]}"
+	__gg_now_ms; t0=$(( __now_ms - t0 ))
+
+	for i in "${!locked[@]}"; do
+		org=${locked[i]}
+		CACHE="$GG_CACHEDIR/$service.$org.cache"
+		if __gg_refresh_repo_cache "$service" "$org" "$CACHE" "$dir/$org" "${sinces[i]}"; then
+			__gg_prefetch_report ok "$t0" "$chost/$org"
+		else
+			__gg_prefetch_report failed "$t0" "$chost/$org"
+			rc=1
+		fi
+		rm -f "${CACHE%.cache}.lock"
+	done
+
+	rm -rf "$dir"
+	return $rc
+}
 
+#########################
+#                       #
+#   Cache management    #
+#                       #
+#########################
 #
-# Return a list of repositories from github.com/<org> as cached in <dest_cache_fn>,
-# automatically refreshing it if necessary. If a refresh is needed, <dest_cache_fn>
-# will be `touch`ed as soon as the download begins (so subsequent calls to this
-# function will _not_ see the cache as stale). This is intentional and allows the
-# cache to be refreshed in the background (see _get_repo_list)
+# Every org ever completed (including the mistyped ones) leaves its list in
+# $GG_CACHEDIR, so we keep the directory in check:
 #
-# _refresh_repo_cache <service_slug> <org> <dest_cache_fn>
+#   * the uses of an org's list are logged to $GG_CACHEDIR/access.log, as
+#     lines `<time> <service>.<org> <hit|miss> <count>` (a miss being a
+#     completion that had to wait for the list to download first). So as
+#     not to write on every TAB, a shell counts them up in memory, and
+#     appends what it's counted at most every $GG_CACHE_ACCESS_INTERVAL
+#     seconds. gc compacts the log into one line per org and kind of use,
+#     as does a refresh once it's over $GG_CACHE_ACCESS_LOG_MAX kilobytes.
+#   * beyond $GG_CACHE_MAX_ORGS orgs or $GG_CACHE_MAX_SIZE kilobytes, the
+#     least recently used orgs' lists are dropped (those never used since
+#     the log was started count as last used when they were downloaded).
+#   * what killed shells and refreshes leave behind is swept up (see
+#     __gg_cache_sweep).
 #
-# author: mjuric@astro.washington.edu
+# This happens in the background, after a refresh, every
+# $GG_CACHE_GC_INTERVAL seconds, or when asked with `gg-cache gc`.
 #
-_refresh_repo_cache()
+
+# the most orgs whose lists are kept in $GG_CACHEDIR, and the most space
+# (in kilobytes) they may take up. 0 for no limit.
+GG_CACHE_MAX_ORGS=${GG_CACHE_MAX_ORGS:-500}
+GG_CACHE_MAX_SIZE=${GG_CACHE_MAX_SIZE:-102400}
+# seconds between automatic garbage collections (0 to only collect with
+# `gg-cache gc`)
+GG_CACHE_GC_INTERVAL=${GG_CACHE_GC_INTERVAL:-86400}
+
+# seconds a shell holds on to the uses it's counted before logging them
+# (0 to log each one right away), and the kilobytes the log may grow to
+# before it's compacted without waiting for a gc
+GG_CACHE_ACCESS_INTERVAL=${GG_CACHE_ACCESS_INTERVAL:-60}
+GG_CACHE_ACCESS_LOG_MAX=${GG_CACHE_ACCESS_LOG_MAX:-256}
+
+# the uses not logged yet: "<service>.<org> <hit|miss>", how many there
+# were and when the last one was; and when we last wrote to the log
+__gg_access_keys=()
+__gg_access_counts=()
+__gg_access_times=()
+__gg_access_logged=0
+
+# __gg_cache_access <service>.<org> <hit|miss>
+#
+# count a use of the org's list, logging the uses counted so far if it's
+# been $GG_CACHE_ACCESS_INTERVAL seconds since we last did (so the first
+# use is logged right away). Neither forks.
+__gg_cache_access()
 {
-	local service="$1"
-	local ORG="$2"
-	local CACHE="$3"
+	local __now i n=${#__gg_access_keys[@]}
+	__gg_now
 
-	# create a temp file on the same filesystem as the destination file
-	mkdir -p "$(dirname "$CACHE")"
-	local TMP="$CACHE.$$.$RANDOM.tmp"
+	for ((i = 0; i < n; i++)); do
+		[[ ${__gg_access_keys[i]} == "$1 $2" ]] && break
+	done
+	__gg_access_keys[i]="$1 $2"
+	(( __gg_access_counts[i] += 1 ))
+	__gg_access_times[i]=$__now
 
-	"_${service}_repo_list" "$ORG" > "$TMP"
+	(( __now - __gg_access_logged >= GG_CACHE_ACCESS_INTERVAL )) || return 0
+	{
+		for ((i = 0; i < ${#__gg_access_keys[@]}; i++)); do
+			printf '%s %s %s\n' "${__gg_access_times[i]}" "${__gg_access_keys[i]}" "${__gg_access_counts[i]}"
+		done >> "$GG_CACHEDIR/access.log"
+	} 2>/dev/null
+	__gg_access_keys=() __gg_access_counts=() __gg_access_times=() __gg_access_logged=$__now
+}
 
-	# atomic update
-	mv "$TMP" "$CACHE"
+# __gg_cache_compact_log [<service>.<org>...]
+#
+# merge the access log into one line per org and kind of use, keeping
+# only the given orgs if any are given. (uses logged while we're at it
+# are lost; they only count towards the stats.)
+__gg_cache_compact_log()
+{
+	local accesslog="$GG_CACHEDIR/access.log"
+	[[ -f $accesslog ]] || return 0
+
+	local tmp="$accesslog.$$.$RANDOM.tmp"
+	awk -v all=$(( $# == 0 )) '
+		FILENAME == "-" { keep[$1] = 1; next }
+		all || $2 in keep {
+			k = $2 " " $3
+			n[k] += ($4 == "") ? 1 : $4
+			if ($1 > t[k]) t[k] = $1
+		}
+		END { for (k in n) print t[k], k, n[k] }
+	' - "$accesslog" < <((( $# )) && printf '%s\n' "$@") | LC_ALL=C sort -k2 > "$tmp" && mv "$tmp" "$accesslog"
 }
 
-# get list of repositories from organization $1
-# cache the list in $GG_CACHEDIR/github.com.$1.cache"
+# __gg_cache_autogc
 #
-# _get_repo_list <service_slug> <org>
+# start a garbage collection in the background, if one's due (a new
+# cache directory starts the clock, rather than getting collected), and
+# compact the access log if it's grown past $GG_CACHE_ACCESS_LOG_MAX.
+__gg_cache_autogc()
+{
+	# (the log grows between gcs, with every shell adding to it)
+	[[ -n $(find "$GG_CACHEDIR/access.log" -size +"${GG_CACHE_ACCESS_LOG_MAX}"k 2>/dev/null) ]] \
+		&& ( __gg_cache_compact_log </dev/null >/dev/null 2>&1 216>&- & )
+
+	(( GG_CACHE_GC_INTERVAL > 0 )) || return 0
+
+	local meta_last_gc= __now
+	_meta_read "$GG_CACHEDIR/gc.meta" last_gc
+	__gg_now
+	if [[ -z $meta_last_gc ]]; then
+		meta_last_gc=$__now
+		_meta_write "$GG_CACHEDIR/gc.meta" last_gc
+	elif (( __now - meta_last_gc >= GG_CACHE_GC_INTERVAL )); then
+		# (not holding on to a pipe someone may be waiting on to close;
+		# see _get_repo_list)
+		( gg-cache gc -q </dev/null >/dev/null 2>&1 216>&- & )
+	fi
+}
+
 #
-# author: mjuric@astro.washington.edu
+# __gg_cache_entries
 #
-_get_repo_list()
+# print a line for each org with anything in $GG_CACHEDIR:
+#
+#    <last_used> <size_kb> <hits> <misses> <service>.<org>
+#
+# where <last_used> is the time of its last use in the access log, or of
+# its last full download if it's not in there.
+#
+__gg_cache_entries()
 {
-	local service="$1"
-	local org="$2"
-	local CACHE="$GG_CACHEDIR/$service.$org.cache"
+	local service re=
+	for service in "${__SERVICES[@]}"; do
+		re+="${re:+|}$service"
+	done
+
+	(
+		cd "$GG_CACHEDIR" 2>/dev/null || exit 0
+		shopt -s nullglob
+		local accesslog=access.log
+		local -a files=( * ) metas=( *.meta )
+		[[ -f $accesslog ]] || accesslog=/dev/null
+		(( ${#files[@]} )) || exit 0
+
+		du -sk -- "${files[@]}" 2>/dev/null | LC_ALL=C awk -v accesslog="$accesslog" \
+			-v re="^($re)\\\\.[^@/]+\\\\.(cache(\\\\.[dt])?|meta|partial|lock|memo\\\\.[0-9]+)\$" '
+			function key(fn) {
+				sub(/\.(cache(\.[dt])?|meta|partial|lock|memo\.[0-9]+)$/, "", fn)
+				return fn
+			}
+			FILENAME == accesslog {
+				n = ($4 == "") ? 1 : $4
+				if ($3 == "hit") hits[$2] += n; else misses[$2] += n
+				if ($1 > used[$2]) used[$2] = $1
+				next
+			}
+			FILENAME == "-" {
+				if ($2 !~ re) next
+				k = key($2)
+				size[k] += $1
+				seen[k] = 1
+				next
+			}
+			/^last_full=/ { full[key(FILENAME)] = substr($0, 11) }
+			END {
+				for (k in seen)
+					printf "%d %d %d %d %s\n", (k in used) ? used[k] : full[k], size[k], hits[k], misses[k], k
+			}
+		' "$accesslog" - "${metas[@]}"
+	)
+}
+
+# __gg_cache_remove <service>.<org>
+#
+# remove everything we keep about the org
+__gg_cache_remove()
+{
+	local base="$GG_CACHEDIR/$1"
+	rm -rf "$base.cache" "$base.cache.d" "$base.cache.t" "$base.meta" "$base.partial" "$base".memo.*
+}
+
+#
+# __gg_cache_sweep
+#
+# remove what's been left behind in $GG_CACHEDIR by processes that have
+# died, and what's no use any more: temporary files (and directories),
+# partial downloads and locks older than $GG_LOCK_TIMEOUT (whoever was
+# writing them would have lost their lock by now), memo stamps, daemon
+# reply pipes and files and prefetch logs of shells that have exited,
+# expired SSH snapshots, and what we know about orgs the service told us
+# don't exist more than $GG_NEGATIVE_TTL seconds ago.
+#
+# Sets $swept to the number of files removed, and prints the orgs.
+#
+__gg_cache_sweep()
+{
+	local mins=$(( (GG_LOCK_TIMEOUT + 59) / 60 )) fn pid
+	swept=0
+
+	while IFS= read -r fn; do
+		rm -rf "$fn" && (( ++swept ))
+	done < <(find "$GG_CACHEDIR" -mindepth 1 -maxdepth 1 \( -name '*.tmp' -o -name '*.tmp.new' -o -name '*.old' \
+		-o -name '*.partial' -o -name '*.lock' -o -name 'git-clone-opts.*' \) -mmin +$mins 2>/dev/null)
+
+	for fn in "$GG_CACHEDIR"/*.memo.* "$GG_CACHEDIR"/daemon.fifo.* "$GG_CACHEDIR"/daemon.reply.* "$GG_CACHEDIR"/prefetch.*.failed; do
+		[[ -e $fn ]] || continue
+		pid=${fn%.failed}
+		pid=${pid##*.}
+		[[ $pid =~ ^[0-9]+$ ]] && ! kill -0 "$pid" 2>/dev/null && rm -f "$fn" && (( ++swept ))
+	done
 
-	# fire off a background cache update if the cache is stale or non-existant
-	if [[ -z $(find "$CACHE" -newermt '-15 seconds' 2>/dev/null) ]]; then
-		( _refresh_repo_cache "$service" "$org" "$CACHE" & )
+	local snapdir="$GG_CACHEDIR/ssh.snapshots"
+	if [[ -d $snapdir ]]; then
+		mins=$(( (GG_SSH_SNAPSHOT_TTL + 59) / 60 ))
+		while IFS= read -r fn; do
+			rm -f "$fn" && (( ++swept ))
+		done < <(find "$snapdir" -type f -mmin +$mins 2>/dev/null)
+		find "$snapdir" -mindepth 1 -type d -empty -delete 2>/dev/null
 	fi
 
-	# this is the first time we're asking for the list of repos
-	# in this organization, wait for the result
-	if [[ ! -f "$CACHE" ]]; then
-		# wait with spinner (pattern from https://github.com/swelljoe/spinner/blob/master/spinner.sh)
-		local -a marks=(⠋ ⠙ ⠹ ⠸ ⠼ ⠴ ⠦ ⠧ ⠇ ⠏)
-		local i=0
-		local spinstart=10
-		while ! test -f "$CACHE"; do
-			if [[ $i -ge $spinstart ]]; then
-				# show the spinner if we've waited for longer than a second
-				[[ $i -eq $spinstart ]] && printf '  '
-				printf '\b\b%s ' "${marks[i % ${#marks[@]}]}"
-			fi
-			sleep 0.1
-			(( i++ ))
-		done
-		[[ $i -gt $spinstart ]] && printf '\b\b  \b\b'
+	local meta meta_miss_at __now
+	__gg_now
+	for meta in "$GG_CACHEDIR"/*.meta; do
+		fn=${meta%.meta}
+		[[ -f $meta && ! -f $fn.cache && ! -f $fn.lock ]] || continue
+		meta_miss_at=
+		_meta_read "$meta" miss_at
+		[[ -n $meta_miss_at ]] && (( __now - meta_miss_at >= GG_NEGATIVE_TTL )) || continue
+		__gg_cache_remove "${fn##*/}"
+		(( ++swept ))
+		[[ -n $quiet ]] || printf '%-9s %s (not found)\n' removed "${fn##*/}"
+	done
+}
+
+#
+# __gg_cache_gc [-q]
+#
+# sweep $GG_CACHEDIR, then evict the least recently used orgs until we're
+# within the limits, and compact the access log. Unless -q is given,
+# prints what it removed.
+#
+__gg_cache_gc()
+{
+	local quiet=
+	[[ $1 == -q ]] && quiet=1
+	[[ -d "$GG_CACHEDIR" ]] || return 0
+
+	local meta_last_gc __now
+	__gg_now
+	meta_last_gc=$__now
+	_meta_write "$GG_CACHEDIR/gc.meta" last_gc
+
+	local swept
+	__gg_cache_sweep
+
+	local -a keys=() sizes=() kept=()
+	local used size hits misses key count=0 total=0 evicted=0 freed=0 i
+	while read -r used size hits misses key; do
+		keys+=( "$key" )
+		sizes+=( "$size" )
+		(( count++, total += size ))
+	done < <(__gg_cache_entries | sort -n)
+
+	# (orgs being refreshed, i.e. locked, are left alone)
+	for ((i = 0; i < ${#keys[@]}; i++)); do
+		key=${keys[i]}
+		if (( (GG_CACHE_MAX_ORGS > 0 && count > GG_CACHE_MAX_ORGS) || (GG_CACHE_MAX_SIZE > 0 && total > GG_CACHE_MAX_SIZE) )) \
+			&& [[ ! -f "$GG_CACHEDIR/$key.lock" ]]; then
+			__gg_cache_remove "$key"
+			(( count--, total -= sizes[i], evicted++, freed += sizes[i] ))
+			[[ -n $quiet ]] || printf '%-9s %s (%dK)\n' evicted "$key" "${sizes[i]}"
+		else
+			kept+=( "$key" )
+		fi
+	done
+
+	# compact the access log, dropping the orgs that are gone
+	if (( ${#kept[@]} )); then
+		__gg_cache_compact_log "${kept[@]}"
+	else
+		[[ -f "$GG_CACHEDIR/access.log" ]] && : > "$GG_CACHEDIR/access.log"
 	fi
 
-	# return the list of repos
-	__readlines REPOS < "$CACHE"
+	[[ -n $quiet ]] || echo "gg-cache: evicted $evicted orgs (${freed}K), removed $swept leftover files; $count orgs (${total}K) left"
+	return 0
+}
+
+#
+# __gg_cache_stats
+#
+# for each org (most recently used first): the space its list takes, the
+# number of completions served from it (hits) and that had to wait for it
+# to download (misses), and when it was last used. Followed by the totals.
+#
+__gg_cache_stats()
+{
+	local __now all
+	__gg_now
+	all=$(du -sk "$GG_CACHEDIR" 2>/dev/null)
+
+	__gg_cache_entries | sort -rn | awk -v now="$__now" -v all="${all%%[[:space:]]*}" \
+		-v max_orgs="$GG_CACHE_MAX_ORGS" -v max_size="$GG_CACHE_MAX_SIZE" '
+		function human(kb) {
+			if (kb >= 1048576) return sprintf("%.1fG", kb / 1048576)
+			if (kb >= 1024) return sprintf("%.1fM", kb / 1024)
+			return kb "K"
+		}
+		function rate(h, m) {
+			return (h + m) ? sprintf("%.1f%%", 100 * h / (h + m)) : "-"
+		}
+		function ago(t,    d) {
+			if (!t) return "-"
+			d = now - t
+			if (d < 3600) return int(d / 60) "m ago"
+			if (d < 86400) return int(d / 3600) "h ago"
+			return int(d / 86400) "d ago"
+		}
+		BEGIN { printf "%-36s %8s %7s %7s %9s %10s\n", "org", "size", "hits", "misses", "hit rate", "last used" }
+		{
+			printf "%-36s %8s %7d %7d %9s %10s\n", $5, human($2), $3, $4, rate($3, $4), ago($1)
+			n++; size += $2; hits += $3; misses += $4
+		}
+		END {
+			printf "\n%d orgs (limit: %s), %s (limit: %s); %d hits, %d misses (hit rate: %s)\n", \
+				n, (max_orgs > 0 ? max_orgs : "none"), human(size), (max_size > 0 ? human(max_size) : "none"), hits, misses, rate(hits, misses)
+			printf "%s in total, including org lists and SSH snapshots\n", human(all + 0)
+		}
+	'
+}
+
+#
+# gg-cache <stats|gc|clear>
+#
+# manage $GG_CACHEDIR:
+#
+#   stats:     show the orgs whose lists are cached, their sizes and hit rates
+#   gc [-q]:   evict the least recently used orgs beyond the limits, and
+#              sweep up leftovers (see above)
+#   clear:     remove everything
+#
+gg-cache()
+{
+	case "$1" in
+	stats)
+		__gg_cache_stats
+		;;
+	gc)
+		shift
+		__gg_cache_gc "$@"
+		;;
+	clear)
+		# (except the daemon's pipes: it keeps running, serving what it
+		# has in memory until the lists are downloaded again)
+		[[ -d "$GG_CACHEDIR" ]] || return 0
+		find "$GG_CACHEDIR" -mindepth 1 -maxdepth 1 ! -name 'daemon.*' -exec rm -rf {} +
+		;;
+	*)
+		echo "usage: gg-cache <stats|gc [-q]|clear>" 1>&2
+		return 1
+		;;
+	esac
 }
 
 #
@@ -1258,8 +4046,6 @@ _get_repo_list()
 #
 # author: mjuric@astro.washington.edu
 #
-_resolve_var() { echo "${!1}"; }
-
 # escape special characters in a string with backslashes
 _esc_string() {
 	# shellcheck disable=SC1003,SC2089
@@ -1274,9 +4060,9 @@ _complete_fragment()
 	local URL="$3"
 	local WORDS
 
-	local chost GG_AUTH
-	chost=$(_resolve_var "GG_CANONICAL_HOST_$service")
-	GG_AUTH=$(_resolve_var "GG_AUTH_$service")
+	local chost GG_AUTH var
+	var="GG_CANONICAL_HOST_$service"; chost=${!var}
+	var="GG_AUTH_$service"; GG_AUTH=${!var}
 
 #	echo service=$service urlbase=$urlbase URL=$URL chost=$chost GG_AUTH=$GG_AUTH
 
@@ -1286,17 +4072,18 @@ _complete_fragment()
 	# are we're completing the org or the repo part?
 	if [[ $URL != */* ]]; then
 		#
-		# completing the org: show a list of already cloned orgs
+		# completing the org: show a list of already cloned orgs, and
+		# those the user is a member of
 		#
 		local PROJECTS="${PROJECTS:-$HOME/projects}"
-		PROJECTS="$PROJECTS/$chost"
 
-		# list only directories that don't contain spaces from "$PROJECTS"
-		# because we use ls -F, they'll have a slash (/) appended
-		# shellcheck disable=SC2012
-		__readlines WORDS < <( ls -1LF "$PROJECTS" 2>/dev/null | sed -e '/[^\/]$/d' -e '/[ ]/d' )
+		local ORGS
+		_trace_begin org_list
+		_get_org_list "$service" "$PROJECTS/$chost"
+		_trace_end org_list "orgs=${#ORGS[@]}"
+		[[ ${#ORGS[@]} != 0 ]] && WORDS=( "${ORGS[@]/%//}" )	# with a slash (/) appended
 
-		if [[ ${#WORDS[@]} == 0 ]]; then
+		if [[ ${#WORDS[@]} == 0 ]] && [[ -z $GG_FUZZY || ${#URL} -lt 3 ]]; then
 			# prevent bash from trying to autocomplete with a filename
 			COMPREPLY=("")
 			return
@@ -1323,13 +4110,15 @@ _complete_fragment()
 			return
 		fi
 
-		local REPOS
-		_get_repo_list "$service" "$ORG"
+		# ask the daemon if it's running, otherwise read the cache directly
+		local REPOS REPOS_PARTIAL=
+		_daemon_query "$service" "$ORG" "${URL#*/}" || _get_repo_list "$service" "$ORG" "${URL#*/}"
 		WORDS=( "${REPOS[@]/#/$ORG/}" )		# prepend the org name
 		WORDS=( "${WORDS[@]/%/ }" )		# append a space (so the suggestion completes the argument)
 	fi
 
 	# only return completions matching the typed prefix
+	_trace_begin prefix_match
 	COMPREPLY=()
 	local _word
 	for _word in "${WORDS[@]}"; do
@@ -1337,12 +4126,46 @@ _complete_fragment()
 			COMPREPLY+=("$_word")
 		fi
 	done
+	_trace_end prefix_match "words=${#WORDS[@]}" "matches=${#COMPREPLY[@]}"
+
+	# in fuzzy mode, if nothing begins with what's been typed, offer the
+	# (ranked) substring and fuzzy matches of repository names instead,
+	# from all orgs if none has been typed
+	local fuzzy_hits=0
+	if [[ -n $GG_FUZZY && ${#COMPREPLY[@]} == 0 && ${#URL} -ge 3 ]]; then
+		local query="${URL#*/}" qorg=
+		[[ $URL == */* ]] && qorg="${URL%%/*}"
+		if [[ ${#query} -ge 3 ]]; then
+			_trace_begin fuzzy
+			local FUZZY
+			_fuzzy_lookup "$service" "$qorg" "$query"
+			for _word in "${FUZZY[@]}"; do
+				COMPREPLY+=("$_word ")
+			done
+			fuzzy_hits=${#FUZZY[@]}
+			_trace_end fuzzy "hits=$fuzzy_hits"
+		fi
+
+		if [[ $fuzzy_hits == 0 && $URL != */* ]]; then
+			# prevent bash from trying to autocomplete with a filename
+			COMPREPLY=("")
+			return
+		fi
+
+		# keep them in order of relevance (bash 4.4+)
+		[[ $fuzzy_hits -gt 0 ]] && compopt -o nosort 2>/dev/null
+	fi
 
 	# user-friendly completions and colon handling
 	local compreply=( "${COMPREPLY[@]}" )		# this is to be shown to the user
 	COMPREPLY=("${COMPREPLY[@]/#/$urlbase}")
+	_trace_begin ltrim
 	__mj_ltrim_completions "$cur"			# these are the actual completions
+	_trace_end ltrim
+
+	_trace_begin fancy
 	_fancy_autocomplete
+	_trace_end fancy "replies=${#COMPREPLY[@]}"
 #	WORDS=( "${COMPREPLY[@]/%/|}" )
 #	echo "${WORDS[@]}" 1>&2
 }
@@ -1370,8 +4193,8 @@ _complete_url()
 	local cur="$2"
 	shift; shift
 
-	local prefixes
-	prefixes=$(_resolve_var "__${service}_PREFIXES")
+	local var="__${service}_PREFIXES"
+	local prefixes=${!var}
 
 	local urlbase=
 	for urlbase in $prefixes "$@"; do
@@ -1472,6 +4295,64 @@ complete -o bashdefault -o default -o nospace -F _git_get git-get 2>/dev/null \
 
 # redefine _git_clone to auto-complete the first positional argument
 _git_clone()
+{
+	_trace_begin complete
+	__gg_git_clone
+	_trace_end complete "replies=${#COMPREPLY[@]}"
+}
+
+#
+# __gg_git_clone_opts: store the `git clone` options (as listed by
+# `git clone --git-completion-helper`) into $__gg_memo_clone_opts.
+#
+# Running git on every TAB costs a fork and an exec, so the list is kept in
+# memory and, for new shells, in $GG_CACHEDIR/git-clone-opts. Both are
+# keyed on the path to git, and the file is discarded once git is newer
+# than it (i.e., has been upgraded).
+#
+__gg_git_clone_opts()
+{
+	local git memo="$GG_CACHEDIR/git-clone-opts"
+
+	# look git up in the hash table, to avoid forking
+	hash git 2>/dev/null || return
+	if (( BASH_VERSINFO[0] >= 4 )); then
+		git=${BASH_CMDS[git]}
+	else
+		git=$(type -P git)
+	fi
+
+	# still valid in memory?
+	[[ $__gg_memo_clone_git == "$git" && ( ! -f $memo || ! $git -nt $memo ) ]] && return
+
+	local path opts
+	if [[ -f $memo && ! $git -nt $memo ]] && { read -r path; read -r -d '' opts; :; } < "$memo" && [[ $path == "$git" ]]; then
+		opts=${opts%$'\n'}
+	else
+		opts=$(git clone --git-completion-helper 2>/dev/null)
+		mkdir -p "$GG_CACHEDIR" 2>/dev/null && printf '%s\n%s\n' "$git" "$opts" > "$memo.$$" && mv -f "$memo.$$" "$memo"
+	fi
+
+	__gg_memo_clone_git=$git
+	__gg_memo_clone_opts=$opts
+}
+
+#
+# __gg_match_words <words> <prefix>: set COMPREPLY to the (whitespace
+# separated) words beginning with <prefix>. Equivalent to
+# `COMPREPLY=( $(compgen -W <words> <prefix>) )`, without the fork.
+#
+__gg_match_words()
+{
+	local w
+	COMPREPLY=()
+	# shellcheck disable=SC2086  # the words don't contain whitespaces, we want wordsplitting here
+	for w in $1; do
+		[[ $w == "$2"* ]] && COMPREPLY+=( "$w" )
+	done
+}
+
+__gg_git_clone()
 {
 	# try standard completions, return if successful
 	_mj_git_clone_orig
@@ -1480,11 +4361,16 @@ _git_clone()
 	# ensure a sane decomposition of the command line,
 	# we have to do this again here as Ubuntu puts @ into $COMP_WORDBREAKS (sigh...)
 	local cur words cword
+	_trace_begin reassemble
 	_mj_get_comp_words_by_ref -n "=:@" cur words cword
+	_trace_end reassemble
 
 	# see if we're completing the second positional argument ('git clone <URL>')
 	local _argidx _posargs
-	__arg_index "$(git clone --git-completion-helper 2>/dev/null)"
+	_trace_begin arg_index
+	__gg_git_clone_opts
+	__arg_index "$__gg_memo_clone_opts"
+	_trace_end arg_index
 	[[ $_argidx -ne 2 ]] && return
 
 	# Try to complete service URLs
@@ -1495,8 +4381,7 @@ _git_clone()
 	done
 
 	# Begin autocompleting towards a fully qualified http[s]://github.com/org/repo and git@github.com:org/repo forms
-	# shellcheck disable=SC2207  # __PREFIXES don't contain whitespaces, we want wordsplitting here
-	COMPREPLY=( $(compgen -W "$__PREFIXES" "$cur") )
+	__gg_match_words "$__PREFIXES" "$cur"
 
 	if [[ ${#COMPREPLY[@]} == 0 ]]; then
 		# Try SSH autocomplete if no other viable autocompletions exist
@@ -1508,10 +4393,9 @@ _git_clone()
 		_complete_ssh_url -p "$cur"
 	fi
 
-	# shellcheck disable=SC2207  # __PREFIXES don't contain whitespaces, we want wordsplitting here
-	COMPREPLY=( $(compgen -W "$__PREFIXES" "$cur") )
+	__gg_match_words "$__PREFIXES" "$cur"
 	_colon_autocomplete
-	_dbg "_git_clone COMPREPLY=${COMPREPLY[*]}"
+	[[ -n $GG_DEBUG ]] && _dbg "_git_clone COMPREPLY=${COMPREPLY[*]}"
 }
 
 # git's autocompletion scripts will automatically invoke _git_get() for 'get' subcommand
@@ -1523,9 +4407,10 @@ _git_get()
 
 	# see if we're completing the apropriate positional argument
 	local _argidx _posargs
-	__arg_index "$(git clone --git-completion-helper 2>/dev/null)"
+	__gg_git_clone_opts
+	__arg_index "$__gg_memo_clone_opts"
 
-	local prog=$(basename "${words[0]}")
+	local prog=${words[0]##*/}
 
 	# 'git-get <URL>'
 	[[ $prog == "git-get" && $_argidx -eq 1 ]] && { _complete_url github "$cur" ""; return; }
@@ -1590,3 +4475,45 @@ _arg_index_unit_test()
 	echo "[✔] __arg_index unit tests succeeded."
 }
 
+######################
+#                    #
+# Command-line usage #
+#                    #
+######################
+
+#
+# When executed rather than sourced, act as a front end to the maintenance
+# commands. E.g.:
+#
+#    bash git-clone-completion.bash daemon start
+#    bash git-clone-completion.bash sync -q      # e.g., from cron
+#    bash git-clone-completion.bash cache gc
+#
+if [[ -n $__gg_executed ]]; then
+	case "$1" in
+	daemon)
+		shift
+		gg-daemon "$@"
+		;;
+	sync|prefetch)
+		shift
+		gg-prefetch "$@"
+		;;
+	trace-report)
+		shift
+		gg-trace-report "$@"
+		;;
+	cache)
+		shift
+		gg-cache "$@"
+		;;
+	*)
+		echo "usage: $(basename "$0") daemon <start|stop|status>" 1>&2
+		echo "       $(basename "$0") sync [-q] [-j <workers>] [service...]" 1>&2
+		echo "       $(basename "$0") trace-report [trace_file]" 1>&2
+		echo "       $(basename "$0") cache <stats|gc [-q]|clear>" 1>&2
+		exit 1
+		;;
+	esac
+	exit
+fi
@@ -9,7 +9,9 @@ import re
 import shlex
 import subprocess
 import tempfile
+import time
 import shutil
+import signal
 
 #####################################
 
@@ -54,13 +56,22 @@ def git_completion(request):
 def homedir(request):
     return 'new'
 
+@pytest.fixture(scope='session')
+def _shells():
+    # test shells, reused across the session's tests (see _ShellPool)
+    pool = _ShellPool()
+    yield pool
+    pool.close()
+
 @pytest.fixture(scope=scope)
-def bash(request, bashpath, homedir, wordbreaks, git_completion):
-    name = homedir
-    with tempfile.TemporaryDirectory() as dir:
-        homedir = shutil.copytree(f'fixtures/{name}', f'{dir}/{name}')
+def bash(request, bashpath, homedir, wordbreaks, git_completion, _shells):
+    lazy = request.node.get_closest_marker("lazy") is not None
+    marker = request.node.get_closest_marker("env")
+    ignore_env = marker.kwargs.get("ignore_changes") if marker else None
 
-        yield from _bash_aux(request, bashpath, homedir, wordbreaks, git_completion)
+    bash = _shells.checkout(bashpath, homedir, wordbreaks, git_completion, lazy)
+    yield bash
+    _shells.checkin(bash, ignore_env)
 
 @pytest.fixture
 def projects(request, bash):
@@ -75,6 +86,48 @@ def projects(request, bash):
     assert dst.startswith('/var/folders') or dst.startswith('/tmp'), f"Skipping temp dir removal out of abundance of caution: {dst}"
     shutil.rmtree(dst)
 
+@pytest.fixture
+def mockapi():
+    # a local mock of the GitHub/GitLab/Bitbucket APIs (see mockapi.py)
+    from mockapi import MockAPI
+    with MockAPI() as api:
+        yield api
+
+_SSH_STANDIN = '''#!/bin/bash
+# stand-in for ssh, running the "remote" shell locally in {remote}
+host=
+while [[ $# -gt 0 ]]; do
+	case "$1" in
+	-[bcDEeFIiJLlmOopQRSWw]) shift 2 ;;
+	-*) shift ;;
+	*) host=$1; shift; break ;;
+	esac
+done
+[[ $host == test-dummy-* ]] || exit 255
+echo "$host" >> "{log}"
+cd "{remote}" || exit 255
+[[ $# -gt 0 ]] && HOME=$PWD exec sh -c "$*"
+HOME=$PWD exec bash
+'''
+
+@pytest.fixture
+def ssh_standin(tmp_path):
+    """
+    A stand-in for ssh that accepts any host named test-dummy-*, and runs
+    the "remote" shell locally in a copy of fixtures/remote-ssh-home. Commands
+    given on the command line are run by sh, which needn't be bash. Returns
+    the directory to prepend to $PATH; each connection is logged (as a line
+    with the host name) to ssh.log next to it.
+    """
+    remote = shutil.copytree(os.path.join(_FIXTURESDIR, 'remote-ssh-home'), str(tmp_path / 'remote'))
+    subprocess.run([ os.path.join(remote, 'init-git.sh') ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    (bindir / 'ssh').write_text(_SSH_STANDIN.format(remote=remote, log=tmp_path / 'ssh.log'))
+    (bindir / 'ssh').chmod(0o755)
+    return str(bindir)
+
 #####################################
 
 #####################################
@@ -82,6 +135,15 @@ def projects(request, bash):
 # Helpers
 #
 
+_AUTH_FILES = { 'github': 'github.auth.netrc', 'gitlab': 'gitlab.auth.curl', 'bitbucket': 'bitbucket.auth.curl' }
+
+def fake_auth(homedir, services=_AUTH_FILES.keys()):
+    """Create (empty) authentication files, so the services are considered set up"""
+    cfgdir = os.path.join(homedir, '.config/git-clone-completion')
+    os.makedirs(cfgdir, exist_ok=True)
+    for service in services:
+        open(os.path.join(cfgdir, _AUTH_FILES[service]), 'w').close()
+
 def assert_bash_run(bash, cmd, expect_output=True, expect_newline=True):
     # Send command
     bash.sendline(cmd)
@@ -112,21 +174,6 @@ def assert_bash_run(bash, cmd, expect_output=True, expect_newline=True):
 
     return output
 
-@contextlib.contextmanager
-def assert_unmodified_env(bash, ignore=""):
-
-    before_env = get_env(bash)
-
-    yield
-
-    # reset the prompt
-    bash.sendintr()
-    bash.expect_exact(_PS1)
-
-    # check env hasn't been modified
-    after_env = get_env(bash)
-    diff_env(before_env, after_env, ignore)
-
 def get_env(bash):
     return (
         assert_bash_run(
@@ -138,6 +185,9 @@ def get_env(bash):
     )
 
 def diff_env(before, after, ignore):
+    assert not _env_changes(before, after, ignore), "Environment should not be modified"
+
+def _env_changes(before, after, ignore):
     diff = [
         x
         for x in difflib.unified_diff(before, after, n=0, lineterm="")
@@ -145,6 +195,12 @@ def diff_env(before, after, ignore):
         if not re.search(r"^(---|\+\+\+|@@ )", x)
         # Ignore variables expected to change:
         and not re.search("^[-+](_|PPID|BASH_REMATCH|OLDPWD)=", x)
+        # Ignore bash's dynamic variables (listed once they've been used,
+        # which in a reused shell may have been before the test started):
+        and not re.search(r"^[-+](S?RANDOM|SECONDS|EPOCH\w+|BASHPID|FUNCNAME)=", x)
+        # Ignore what we memoize and count up across completions (and the
+        # hash table):
+        and not re.search(r"^[-+](__gg_memo_\w+|__gg_access_\w+|BASH_CMDS)=", x)
         # Ignore likely completion functions added by us:
         and not re.search(r"^\+declare -f _.+", x)
         # mjuric: weird solo empty lines on macOS, maybe other OS-es (??)
@@ -160,9 +216,142 @@ def diff_env(before, after, ignore):
                 del diff[i + 1]
             del diff[i]
             break
-    assert not diff, "Environment should not be modified"
+    return diff
+
+#
+# Test shells are costly to start (and to check for environment changes),
+# so they're kept in a pool and reused. Each test checks a shell out of the
+# pool, and back in once it's done:
+#
+#   * the shell's $HOME (a directory that belongs to it) is emptied and
+#     refilled from fixtures/<homedir> on checkout,
+#   * on checkin, the environment is compared with the one the test
+#     started with (failing the test if it's been modified, as before),
+#     anything left running in the background is killed, and the variables
+#     that were changed (in ways the test was allowed to) are restored from
+#     a snapshot taken when the shell was started.
+#
+# A shell whose functions or options were changed, or that got into a state
+# we can't get it out of, is closed rather than reused.
+#
+
+# bash's own variables, which the snapshot doesn't (and mustn't) restore
+_BASH_OWN_VARS = re.compile(r"^(BASH\w*|COMP_\w+|EPOCH\w+|HIST\w+|LINENO|OLDPWD|PPID|PWD|S?RANDOM|SECONDS|SHLVL|_)$")
+
+class _ShellPool:
+    def __init__(self):
+        self._idle = {}
+        self._serial = 0
+
+    def checkout(self, bashpath, homedir, wordbreaks, git_completion, lazy):
+        key = (bashpath, homedir, wordbreaks, git_completion, lazy)
+        idle = self._idle.setdefault(key, [])
+        if idle:
+            bash = idle.pop()
+            _reset_home(bash.homedir, homedir)
+        else:
+            bash = _spawn_bash(bashpath, homedir, wordbreaks, git_completion, lazy)
+            bash.pool_key = key
+        bash.logfile = bash.log = io.StringIO()
+        return bash
+
+    def checkin(self, bash, ignore_env):
+        try:
+            self._sync(bash)
+            env = get_env(bash)
+            diff_env(bash.baseline, env, ignore_env)
+        except:
+            _save_log(bash)
+            self._close(bash)
+            raise
+
+        # what we need to restore
+        names = set()
+        for line in difflib.unified_diff(bash.baseline, env, n=0, lineterm=""):
+            if re.search(r"^(---|\+\+\+|@@ )", line):
+                continue
+            m = re.match(r"^[-+](\w+)=", line)
+            if not m:
+                # (a function, an option, or a line of a multi-line value)
+                self._close(bash)
+                return
+            names.add(m[1])
+        names = sorted(n for n in names if not _BASH_OWN_VARS.match(n))
+
+        _kill_background(bash)
+        restore = os.path.join(bash.tmpdir, 'restore')
+        with open(restore, 'w') as fp:
+            fp.write('cd "$HOME"\n')
+            for name in names:
+                fp.write(f"unset -v {name}\n")
+                if os.path.exists(os.path.join(bash.snapshot, name)):
+                    fp.write(f"source '{bash.snapshot}/{name}'\n")
+        bash.run(f"source '{restore}' 2>/dev/null", expect_output=False)
+
+        # the environment the next test starts with (which can differ from
+        # the snapshot in bash's own variables, e.g. $RANDOM shows up once
+        # it's been used)
+        bash.baseline = get_env(bash)
+        self._idle[bash.pool_key].append(bash)
+
+    def _sync(self, bash):
+        # clear the command line, and wait until the shell's run a command
+        # we know the output of (anything that came before it is dropped)
+        self._serial += 1
+        marker = f"{_BASH_SENTINEL}{self._serial}"
+        bash.send("\x05\x15")
+        bash.sendline(f"echo {marker}")
+        bash.expect_exact(f"\r\n{marker}\r\n{_PS1}")
+
+    def _close(self, bash):
+        _kill_background(bash)
+        bash.close(force=True)
+        shutil.rmtree(bash.tmpdir, ignore_errors=True)
+
+    def close(self):
+        for idle in self._idle.values():
+            for bash in idle:
+                self._close(bash)
+        self._idle.clear()
+
+def _reset_home(path, name):
+    # empty <path>, and copy fixtures/<name> into it
+    for entry in os.listdir(path):
+        entry = os.path.join(path, entry)
+        if os.path.isdir(entry) and not os.path.islink(entry):
+            shutil.rmtree(entry)
+        else:
+            os.remove(entry)
+    shutil.copytree(os.path.join(_FIXTURESDIR, name), path, dirs_exist_ok=True)
+
+def _kill_background(bash):
+    # kill what the shell's left running in the background (downloads,
+    # SSH connections, daemons, ...), i.e. the rest of its session
+    for _ in range(100):
+        out = subprocess.run([ 'pgrep', '-s', str(bash.pid) ], stdout=subprocess.PIPE, encoding='utf-8').stdout
+        pids = [ pid for pid in out.split() if int(pid) != bash.pid ]
+        if pids:
+            # (those killed already may linger as zombies, until reaped)
+            out = subprocess.run([ 'ps', '-o', 'pid=,stat=', '-p', ','.join(pids) ], stdout=subprocess.PIPE, encoding='utf-8').stdout
+            pids = [ int(pid) for pid, stat in (line.split() for line in out.splitlines()) if not stat.startswith('Z') ]
+        if not pids:
+            return
+        for pid in pids:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
+        time.sleep(0.01)
+
+def _save_log(bash):
+    # keep the session's transcript, for debugging
+    from random import randint
+    logfn = "_test-%d-.log" % randint(0, 10_000_000)
+    with open(logfn, "w") as fp:
+        fp.write(bash.log.getvalue())
+
+def _spawn_bash(bashpath, name, wordbreaks, git_completion, lazy):
+    tmpdir = tempfile.mkdtemp(prefix='gg-test-')
+    homedir = shutil.copytree(os.path.join(_FIXTURESDIR, name), f'{tmpdir}/{name}')
 
-def _bash_aux(request, bashpath, homedir, wordbreaks, git_completion):
     #
     # environment modifications needed to facilitate testing
     #
@@ -185,55 +374,66 @@ def _bash_aux(request, bashpath, homedir, wordbreaks, git_completion):
     env['COMP_WORDBREAKS'] = wordbreaks
     env['HOME'] = homedir
 
-    #
-    # environment changes to ignore
-    #
-    ignore_env = None
-    marker = request.node.get_closest_marker("env")
-    if marker:
-        ignore_env = marker.kwargs.get("ignore_changes")
-
     # log output (we'll write this out to file if anything goes wrong)
-    import io
-    from random import randint
     log = io.StringIO()
 
-    # Start and yield bash
-    with pexpect.spawn(bashpath, timeout=10, cwd=homedir, env=env, logfile=log, encoding="utf-8", dimensions=(24, 160)) as bash:
-        try:
-            bash.expect_exact(_PS1)
-
-            # add convenience methods and data
-            bash.run = assert_bash_run.__get__(bash)
-            bash.complete = assert_complete.__get__(bash)
-            bash.bashpath = bashpath
-            bash.homedir = homedir
-            bash.wordbreaks = wordbreaks
-            bash.git_completion = git_completion
-            bash.PS1 = _PS1
-
-            # git completions
-            if git_completion:
-                bash.run(f"source '{git_completion}'", expect_output=False)
-
-            # install the library
+    # Start bash
+    bash = pexpect.spawn(bashpath, timeout=10, cwd=homedir, env=env, logfile=log, encoding="utf-8", dimensions=(24, 160))
+    bash.log = log
+    bash.tmpdir = tmpdir
+    try:
+        # (bash reads input as it's ready for it, so we don't need
+        # pexpect's pause before sending it)
+        bash.delaybeforesend = None
+        bash.expect_exact(_PS1)
+
+        # add convenience methods and data
+        bash.run = assert_bash_run.__get__(bash)
+        bash.complete = assert_complete.__get__(bash)
+        bash.bashpath = bashpath
+        bash.homedir = homedir
+        bash.wordbreaks = wordbreaks
+        bash.git_completion = git_completion
+        bash.PS1 = _PS1
+
+        # git completions
+        if git_completion:
+            bash.run(f"source '{git_completion}'", expect_output=False)
+
+        # install the library (with @pytest.mark.lazy, just the stub that
+        # loads it on the first TAB)
+        if lazy:
+            bash.run(f"GG_LAZY=1 source '{_TESTDIR}/../git-clone-completion.bash'", expect_output=False)
+            out = None
+        else:
             out = bash.run(f"source '{_TESTDIR}/../git-clone-completion.bash'", expect_output=not bash.git_completion)
-            if out:
-                assert out.startswith("\r\nwarning 1: *** no git autocompletion found"), "expected a warning message about no git autocompletion"
-
-            # Load bashrc defs for testing and git-clone-completion
-            bash.run(f"source '{bashrc}'")
-
-            with assert_unmodified_env(bash, ignore=ignore_env):
-                yield bash
-
-        except:
-            logfn = "_test-%d-.log" % randint(0, 10_000_000)
-
-            with open(logfn, "w") as fp:
-                fp.write(log.getvalue())
-
-            raise
+        if out:
+            assert out.startswith("\r\nwarning 1: *** no git autocompletion found"), "expected a warning message about no git autocompletion"
+
+        # Load bashrc defs for testing and git-clone-completion
+        bash.run(f"source '{bashrc}'")
+
+        # the snapshot of every variable (a file each) that checkins
+        # restore from, and the environment to compare with
+        bash.snapshot = os.path.join(tmpdir, 'snapshot')
+        os.mkdir(bash.snapshot)
+        # (variables are listed with declare -p, as compgen -v leaves out
+        # those declared without a value, e.g. `declare -A name`. the
+        # commands are run from a file, as the terminal would wrap them.)
+        script = os.path.join(tmpdir, 'snapshot.sh')
+        with open(script, 'w') as fp:
+            fp.write('for __v in $(declare -p | sed -n "s/^declare -[-a-zA-Z]* \\([a-zA-Z0-9_]*\\).*/\\1/p"); do\n')
+            fp.write(f'\tdeclare -p $__v > "{bash.snapshot}/$__v"\n')
+            fp.write('done 2>/dev/null\nunset __v\n')
+        bash.run(f"source '{script}'", expect_output=False)
+        bash.baseline = get_env(bash)
+    except:
+        _save_log(bash)
+        bash.close(force=True)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+    return bash
 
 ################################
 
@@ -257,6 +457,9 @@ class CompletionResult:
         """
         self.output = output
         self._items = None if items is None else sorted(items)
+        # seconds from pressing TAB until the completion was rendered
+        # (set by assert_complete)
+        self.elapsed = None
 
     def endswith(self, suffix):
         return self.output.endswith(suffix)
@@ -355,6 +558,7 @@ def assert_complete(bash, cmd, skipif=None, xfail=None, cwd=None, env=None, igno
         )
 
     # trigger tab-completion
+    t0 = time.perf_counter()
     bash.send(cmd + "\t")
     bash.expect_exact(cmd)
     # FIXME: I worry there may be a race condition in here. Can bash receive
@@ -373,6 +577,7 @@ def assert_complete(bash, cmd, skipif=None, xfail=None, cwd=None, env=None, igno
             pexpect.TIMEOUT,
         ]
     )
+    elapsed = time.perf_counter() - t0
 
     if got == 0:
         output = _remove_spinner_chars(bash.before)
@@ -388,26 +593,14 @@ def assert_complete(bash, cmd, skipif=None, xfail=None, cwd=None, env=None, igno
         # This shouldn't happen unless there's an issue (or the race condition
         # mentioned above under FIXME)
         assert False, f"Match is different than expected (got={got})"
+    result.elapsed = elapsed
 
-    # FIXME: sent CTRL-C to clear out the line. this sometimes doesn't work (bash
-    # misses the CTRL-C) for reasons I've yet to undersdand. Maybe the completion
-    # (or prompt-generation?) script is still running when it receives CTRL-C? In
-    # any case, re-sending the CTRL-C seems to do the trick, so we keep doing it
-    # until it works 
-    for _ in range(5):
-        bash.sendintr()
-        try:
-            bash.expect_exact(_PS1, timeout=0.1)
-            break
-        except pexpect.TIMEOUT:
-            pass
-#            print(f"LOGFILE={bash._logfn}")
-#            print(f"cmd={cmd} result={result}")
-#            print(bash.read_nonblocking(size=100000))
-#            bash.sendintr()
-#             bash.expect_exact(_PS1, timeout=0.1)
-    else:
-        assert False, f"Failed to clear the command line; something went wrong ☹️"
+    # clear the line (^E^U), and wait for the prompt that follows an empty
+    # command. (the shell's reading input again, since it's echoed the
+    # sentinel, so these are taken in turn, rather than possibly lost as
+    # a ^C could be.)
+    bash.send("\x05\x15\r")
+    bash.expect_exact("\r\n" + _PS1)
 
     if env:
         # Restore environment, and clean up backup
@@ -431,3 +624,28 @@ def assert_complete(bash, cmd, skipif=None, xfail=None, cwd=None, env=None, igno
 
     return result
 
+
+def bash_script(script, homedir, bashpath='/bin/bash', env=None):
+    """
+    Run <script> in a non-interactive bash with git-clone-completion
+    sourced and $HOME set to <homedir>. Returns the standard output.
+    """
+    _env = dict(os.environ, HOME=homedir, GG_SILENT="1")
+    _env.pop('GG_CACHEDIR', None)
+    _env.pop('GG_CFGDIR', None)
+    _env.update(env or {})
+
+    lib = os.path.join(_TESTDIR, '..', 'git-clone-completion.bash')
+    out = subprocess.run([bashpath, '-c', f'source "{lib}" 2>/dev/null\n{script}'],
+        env=_env, cwd=homedir, stdout=subprocess.PIPE, check=True, encoding='utf-8')
+    return out.stdout
+
+def synthetic_repos(n, seed=42):
+    """Return a sorted list of <n> unique, repository-like names"""
+    import random, string
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + string.digits
+    words = set()
+    while len(words) < n:
+        words.add('-'.join(''.join(rng.choice(alphabet) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(1, 3))))
+    return sorted(words)
@@ -0,0 +1,362 @@
+#
+# A minimal, offline mock of the parts of the GitHub, GitLab and Bitbucket
+# APIs used by git-clone-completion.bash. It keeps a list of repositories
+# per (service, org) and counts the requests it receives, so tests can
+# verify both what we fetch and how much it costs.
+#
+# Point the script at it with the environment returned by MockAPI.env().
+#
+# Knobs, for testing how fetching copes with large orgs, slow or failing
+# servers:
+#
+#   add_repos(service, org, 5000)    an org of 5000 (made up) repositories
+#   page_size = 10                   page at most 10 results per response
+#   latency = 0.1                    wait 100ms before each response
+#   fail(500, '/api/v4/', count=1)   fail the next request under a path
+#   fail(500, after=2)               ...or the third one (e.g., a page)
+#   fail_status = 502                fail every request
+#   count('/graphql')                the number of requests (under a path)
+#
+
+import hashlib
+import json
+import re
+import threading
+import time
+
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+def _iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _from_iso(s):
+    return datetime.strptime(s[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+class Repo:
+    def __init__(self, name, updated):
+        self.name = name
+        self.updated = updated
+
+class MockAPI:
+    def __init__(self):
+        # (service, org) -> list of Repo
+        self.orgs = {}
+        # (service, org) -> 'user' or 'group'
+        self.owner_types = {}
+        # the authenticated user, and the orgs (groups, workspaces) they
+        # belong to, per service
+        self.viewer = 'me'
+        self.memberships = {}
+        # list of (method, path) of all received requests, and the most
+        # of them that were being answered at the same time
+        self.requests = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        # seconds to wait before responding to each request
+        self.latency = 0
+        # if set, answer every request with this HTTP status
+        self.fail_status = None
+        # [status, path prefix, count, after] of injected failures (see
+        # fail())
+        self.failures = []
+        # if set, the most results returned per page (irrespective of
+        # what's asked for)
+        self.page_size = None
+        # if set, the number of requests left before we start refusing
+        # them (reported in the rate limit headers), and when that resets
+        self.ratelimit_remaining = None
+        self.ratelimit_reset = 0
+        # if set, the type of the GraphQL error reported along with the
+        # null of a GitHub org that doesn't exist (repositoryOwner doesn't
+        # report one)
+        self.github_missing_error = None
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.mock = self
+        self.url = 'http://127.0.0.1:%d' % self._server.server_address[1]
+
+    def __enter__(self):
+        # (shutdown() waits for the server to next check whether it should
+        # stop, which by default it does every half a second)
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs=dict(poll_interval=0.05), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def env(self):
+        """Environment variables pointing git-clone-completion to this server"""
+        return dict(
+            GG_API_github=self.url,
+            GG_API_gitlab=f'{self.url}/api/v4',
+            GG_API_bitbucket=self.url,
+        )
+
+    def add_repos(self, service, org, names, updated=None, owner='user'):
+        """
+        Add repositories <names> to <org>, or (if <names> is a number) that
+        many named repo0000, repo0001, ... Returns the names.
+        """
+        if isinstance(names, int):
+            names = [ f'repo{i:04d}' for i in range(names) ]
+        updated = time.time() if updated is None else updated
+        with self._lock:
+            self.owner_types[(service, org)] = owner
+            self.orgs.setdefault((service, org), []).extend(Repo(name, updated) for name in names)
+        return names
+
+    def fail(self, status, path='', count=None, after=0):
+        """
+        Answer requests for paths beginning with <path> with HTTP <status>,
+        <count> times (or until cleared with failures.clear()), once
+        <after> of them have been let through.
+        """
+        with self._lock:
+            self.failures.append([ status, path, count, after ])
+
+    def add_memberships(self, service, orgs):
+        with self._lock:
+            self.memberships.setdefault(service, []).extend(orgs)
+
+    def remove_repo(self, service, org, name):
+        with self._lock:
+            self.orgs[(service, org)] = [ r for r in self.orgs[(service, org)] if r.name != name ]
+
+    def count(self, prefix=''):
+        """Number of requests received, optionally only those for paths beginning with <prefix>"""
+        with self._lock:
+            return sum(1 for _, path in self.requests if path.startswith(prefix))
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.max_in_flight = 0
+
+    def _repos(self, service, org, owner=None):
+        with self._lock:
+            if (service, org) not in self.orgs:
+                return None
+            if owner is not None and self.owner_types[(service, org)] != owner:
+                return None
+            return list(self.orgs[(service, org)])
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _page_size(self, asked, default):
+        n = min(int(asked or default), 100)
+        return min(n, self.mock.page_size) if self.mock.page_size else n
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _record(self):
+        path = urlsplit(self.path).path
+        with self.mock._lock:
+            self.mock.requests.append((self.command, path))
+            self.mock._in_flight += 1
+            self.mock.max_in_flight = max(self.mock.max_in_flight, self.mock._in_flight)
+            self._limited = self.mock.ratelimit_remaining == 0
+            if self.mock.ratelimit_remaining:
+                self.mock.ratelimit_remaining -= 1
+
+            # the first matching injected failure, if any
+            self._fail_status = self.mock.fail_status
+            for failure in self.mock.failures:
+                status, prefix, count, after = failure
+                if not path.startswith(prefix) or count == 0:
+                    continue
+                if after:
+                    failure[3] -= 1
+                    break
+                self._fail_status = status
+                if count is not None:
+                    failure[2] -= 1
+                break
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+
+    def _ratelimit_headers(self):
+        if self.mock.ratelimit_remaining is None:
+            return {}
+        # GitLab uses the IETF names, GitHub and Bitbucket the X- ones
+        prefix = '' if self.path.startswith('/api/v4/') else 'X-'
+        return { prefix + 'RateLimit-Remaining': str(self.mock.ratelimit_remaining),
+                 prefix + 'RateLimit-Reset': str(int(self.mock.ratelimit_reset)) }
+
+    def _send(self, status, body=None, headers={}):
+        headers = dict(headers, **self._ratelimit_headers())
+        if self._fail_status is not None:
+            status, body = self._fail_status, { 'message': 'injected failure' }
+        elif self._limited:
+            status, body = 429, { 'message': 'rate limit exceeded' }
+        data = b'' if body is None else json.dumps(body).encode('utf-8')
+
+        # conditional requests
+        etag = 'W/"%s"' % hashlib.md5(data).hexdigest()
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, data = 304, b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.mock._lock:
+            self.mock._in_flight -= 1
+
+    def do_GET(self):
+        self._record()
+        url = urlsplit(self.path)
+        query = { k: v[-1] for k, v in parse_qs(url.query).items() }
+
+        m = re.fullmatch(r'/api/v4/(users|groups)/([^/]+)/projects', url.path)
+        if m:
+            return self._gitlab_projects(url, query, 'user' if m[1] == 'users' else 'group', m[2])
+
+        m = re.fullmatch(r'/2.0/repositories/([^/]+)', url.path)
+        if m:
+            return self._bitbucket_repositories(url, query, m[1])
+
+        if url.path == '/api/v4/user':
+            return self._send(200, { 'username': self.mock.viewer })
+        if url.path == '/api/v4/groups':
+            return self._send(200, [ { 'path': org, 'full_path': org } for org in self.mock.memberships.get('gitlab', []) ])
+        if url.path == '/2.0/user/permissions/workspaces':
+            slugs = [ self.mock.viewer ] + self.mock.memberships.get('bitbucket', [])
+            return self._send(200, { 'pagelen': 100, 'size': len(slugs), 'page': 1,
+                                     'values': [ { 'permission': 'member', 'workspace': { 'slug': slug } } for slug in slugs ] })
+
+        self._send(404, { 'message': '404 Not Found' })
+
+    def do_POST(self):
+        self._record()
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+
+        if urlsplit(self.path).path == '/graphql':
+            return self._github_graphql(body['query'], body.get('variables', {}))
+
+        self._send(404, { 'message': 'Not Found' })
+
+    # GitLab: GET /api/v4/{users,groups}/<org>/projects
+    def _gitlab_projects(self, url, query, owner, org):
+        repos = self.mock._repos('gitlab', org, owner)
+        if repos is None:
+            return self._send(404, { 'message': '404 Not found' })
+
+        if 'last_activity_after' in query:
+            since = _from_iso(query['last_activity_after'])
+            repos = [ r for r in repos if r.updated > since ]
+        if 'search' in query:
+            repos = [ r for r in repos if query['search'].lower() in r.name.lower() ]
+        if query.get('order_by') == 'last_activity_at':
+            repos.sort(key=lambda r: r.updated, reverse=True)
+
+        per_page = self._page_size(query.get('per_page'), 20)
+        page = int(query.get('page', 1))
+        npages = max(1, -(-len(repos) // per_page))
+        items = repos[(page-1)*per_page : page*per_page]
+
+        headers = { 'X-Total-Pages': str(npages), 'X-Total': str(len(repos)), 'X-Page': str(page), 'X-Per-Page': str(per_page) }
+        if page < npages:
+            query['page'] = str(page + 1)
+            headers['Link'] = f'<{self.mock.url}{url.path}?{urlencode(query)}>; rel="next"'
+
+        self._send(200, [ { 'path': r.name, 'name': r.name, 'last_activity_at': _iso(r.updated) } for r in items ], headers)
+
+    # Bitbucket: GET /2.0/repositories/<org>
+    def _bitbucket_repositories(self, url, query, org):
+        repos = self.mock._repos('bitbucket', org)
+        if repos is None:
+            return self._send(404, { 'type': 'error', 'error': { 'message': 'Not found' } })
+
+        m = re.fullmatch(r'updated_on\s*>=?\s*"?([^"]+)"?', query.get('q', ''))
+        if m:
+            since = _from_iso(m[1])
+            repos = [ r for r in repos if r.updated > since ]
+        m = re.fullmatch(r'name\s*~\s*"([^"]*)"', query.get('q', ''))
+        if m:
+            repos = [ r for r in repos if m[1].lower() in r.name.lower() ]
+        if query.get('sort') == '-updated_on':
+            repos.sort(key=lambda r: r.updated, reverse=True)
+
+        pagelen = self._page_size(query.get('pagelen'), 10)
+        page = int(query.get('page', 1))
+        items = repos[(page-1)*pagelen : page*pagelen]
+
+        body = { 'pagelen': pagelen, 'size': len(repos), 'page': page,
+                 'values': [ { 'name': r.name, 'slug': r.name, 'updated_on': _iso(r.updated) } for r in items ] }
+        if page * pagelen < len(repos):
+            query['page'] = str(page + 1)
+            body['next'] = f'{self.mock.url}{url.path}?{urlencode(query)}'
+
+        self._send(200, body)
+
+    # GitHub: POST /graphql
+    def _github_graphql(self, q, variables):
+        # repositoryOwner(login:) { repositories(...) }, one per alias
+        owners = re.findall(r'(\w+): repositoryOwner\(login: "([^"]+)"\) \{ repositories\(([^)]*)\) \{(.*?\bnodes \{[^}]*\})', q)
+        if owners:
+            data, errors = {}, []
+            for alias, org, args, selection in owners:
+                repos = self.mock._repos('github', org)
+                if repos is None:
+                    data[alias] = None
+                    if self.mock.github_missing_error:
+                        errors.append({ 'type': self.mock.github_missing_error, 'path': [ alias ], 'message': f"Could not resolve to a RepositoryOwner with the login of '{org}'." })
+                    continue
+                if 'orderBy: {field: UPDATED_AT, direction: DESC}' in args:
+                    repos.sort(key=lambda r: r.updated, reverse=True)
+
+                first = self._page_size(re.search(r'first: (\d+)', args)[1], 100)
+                m = re.search(r'after: "([^"]*)"', args)
+                start = int(m[1]) if m else 0
+                items = repos[start:start+first]
+                end = start + len(items)
+
+                nodes = []
+                for r in items:
+                    node = { 'name': r.name }
+                    if 'updatedAt' in selection:
+                        node.update(updatedAt=_iso(r.updated), pushedAt=_iso(r.updated))
+                    nodes.append(node)
+                data[alias] = { 'repositories': {
+                    'pageInfo': { 'endCursor': str(end), 'hasNextPage': end < len(repos) },
+                    'nodes': nodes,
+                } }
+            return self._send(200, dict({ 'data': data }, **({ 'errors': errors } if errors else {})))
+
+        # search(query: "user:<org> <text> in:name ...") (capped at 1000
+        # results, as the real one)
+        m = re.search(r'search\(query: "user:(\S+) (\S+) in:name[^"]*"', q)
+        if m:
+            repos = [ r for r in (self.mock._repos('github', m[1]) or []) if m[2].lower() in r.name.lower() ][:1000]
+            return self._send(200, { 'data': { 'search': { 'nodes': [ { 'name': r.name } for r in repos[:100] ] } } })
+
+        if 'viewer' in q:
+            orgs = self.mock.memberships.get('github', [])
+            first = self._page_size(re.search(r'organizations\(first: (\d+)', q)[1], 100)
+            start = int(variables.get('after') or 0)
+            items = orgs[start:start+first]
+            end = start + len(items)
+            return self._send(200, { 'data': { 'viewer': {
+                'login': self.mock.viewer,
+                'organizations': {
+                    'pageInfo': { 'endCursor': str(end), 'hasNextPage': end < len(orgs) },
+                    'nodes': [ { 'login': org } for org in items ],
+                },
+            } } })
+
+        self._send(200, { 'errors': [ { 'message': 'unsupported query' } ] })
@@ -0,0 +1,239 @@
+#
+# Completion latency benchmarks: the time from pressing TAB until the
+# completion is rendered, for each completion path, compared against the
+# baseline stored in benchmarks/baseline.json.
+#
+# These are slow, and only run when GG_BENCH is set:
+#
+#    GG_BENCH=1 pytest -s test_benchmark.py          # compare to the baseline
+#    GG_BENCH=update pytest -s test_benchmark.py     # (re)record the baseline
+#
+# A path fails if its median latency exceeds the baseline by more than a
+# factor of GG_BENCH_THRESHOLD (default: 1.5), plus a few milliseconds of
+# slack. Everything runs offline: the services are played by the mock API
+# and SSH by a stand-in that runs the "remote" shell locally.
+#
+
+from conftest import *
+
+import json
+import statistics
+import types
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get('GG_BENCH'), reason="set GG_BENCH=1 to run the benchmarks"),
+    pytest.mark.env(ignore_changes=r"^([+-](PATH|GG_API_\w+|__ssh_\w*)=.*|\+RANDOM=.*)$"),
+]
+
+_BASELINE = os.path.join(os.path.dirname(__file__), 'benchmarks', 'baseline.json')
+_UPDATE = os.environ.get('GG_BENCH') == 'update'
+_THRESHOLD = float(os.environ.get('GG_BENCH_THRESHOLD', 1.5))
+_SLACK_MS = 5
+_ROUNDS = int(os.environ.get('GG_BENCH_ROUNDS', 20))
+
+# the word breaks don't affect the timings; one variant is enough
+@pytest.fixture
+def wordbreaks():
+    return wordbreak_variants[0]
+
+@pytest.fixture(scope='module')
+def results():
+    results = {}
+    yield results
+
+    print(f"\n{'path':<24} {'p50':>8} {'p90':>8} {'max':>8}   (ms, {_ROUNDS} rounds)")
+    for name, stats in sorted(results.items()):
+        print(f"{name:<24} {stats['p50']:8.1f} {stats['p90']:8.1f} {stats['max']:8.1f}")
+
+    if _UPDATE and results:
+        baseline = _load_baseline()
+        baseline.update(results)
+        os.makedirs(os.path.dirname(_BASELINE), exist_ok=True)
+        with open(_BASELINE, 'w') as fp:
+            json.dump(baseline, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+def _load_baseline():
+    try:
+        with open(_BASELINE) as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return {}
+
+def _percentiles(samples):
+    ms = sorted(1000 * t for t in samples)
+    return dict(
+        p50=round(statistics.median(ms), 2),
+        p90=round(ms[min(len(ms) - 1, int(0.9 * len(ms)))], 2),
+        max=round(ms[-1], 2),
+    )
+
+def _bench(results, name, complete, expected=None, before=None):
+    """
+    Time <complete>() (returning a CompletionResult) over _ROUNDS rounds,
+    calling <before>() ahead of each, and compare to the baseline.
+    """
+    if isinstance(expected, list):
+        expected = sorted(expected)
+
+    samples = []
+    for _ in range(_ROUNDS):
+        if before:
+            before()
+        result = complete()
+        if expected is not None:
+            assert result == expected, f"{name}: unexpected completion {result}"
+        samples.append(result.elapsed)
+
+    stats = results[name] = _percentiles(samples)
+
+    base = _load_baseline().get(name)
+    if base and not _UPDATE:
+        limit = base['p50'] * _THRESHOLD + _SLACK_MS
+        assert stats['p50'] <= limit, f"{name}: median latency {stats['p50']:.1f}ms exceeds {limit:.1f}ms (baseline: {base['p50']:.1f}ms)"
+
+def _cachedir(homedir):
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir, exist_ok=True)
+    return cachedir
+
+def _wait_unlocked(cachedir, org):
+    # wait for a background refresh to finish
+    lock = os.path.join(cachedir, f'github.{org}.lock')
+    for _ in range(100):
+        if not os.path.exists(lock):
+            return
+        time.sleep(0.05)
+
+@pytest.mark.parametrize("lazy", [ False, True ], ids=[ 'eager', 'lazy' ])
+def test_startup(results, lazy):
+    # what sourcing the script adds to a shell's startup (the timings
+    # include starting bash itself, about 2ms). with GG_LAZY=1, only a stub
+    # is sourced, which loads the rest on the first TAB.
+    lib = os.path.join(os.path.dirname(__file__), '..', 'git-clone-completion.bash')
+    cmd = [ 'bash', '--norc', '-c', f'{"GG_LAZY=1 " if lazy else ""}source "{lib}"' ]
+    env = dict(os.environ, GG_SILENT='1')
+    def start():
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return types.SimpleNamespace(elapsed=time.perf_counter() - t0)
+    _bench(results, 'startup-lazy' if lazy else 'startup', start)
+
+def test_service_prefixes(bash, results):
+    _bench(results, 'service-prefixes', lambda: bash.complete("git clone git@git"), [ "git@gitlab.com:", "git@github.com:" ])
+
+def test_org_listing(bash, projects, results):
+    _bench(results, 'org-listing', lambda: bash.complete("git clone git@github.com:"), [ 'foo/', 'bar/', 'baz/' ])
+
+@pytest.mark.parametrize("n", [ 1_000, 10_000, 100_000 ])
+def test_repo_listing(bash, results, n):
+    # a warm cache of <n> repositories; we complete a prefix from the
+    # middle of the list
+    fake_auth(bash.homedir, ['github'])
+    repos = synthetic_repos(n)
+    prefix = repos[n // 2][:-1]
+
+    cachedir = _cachedir(bash.homedir)
+    cache = os.path.join(cachedir, f'github.org{n}.cache')
+    with open(cache, 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in repos))
+    with open(os.path.join(cachedir, f'github.org{n}.meta'), 'w') as fp:
+        fp.write(f'last_full={int(time.time())}\nlast_sync={int(time.time()) + 3600}\n')
+    bash_script(f'_repo_cache_index "{cache}"', bash.homedir)
+
+    expected = [ f'org{n}/{r} ' for r in repos if r.startswith(prefix) ]
+    complete = lambda: bash.complete(f"git clone git@github.com:org{n}/{prefix}")
+    _bench(results, f'repo-listing-{n // 1000}k', complete, expected if len(expected) > 1 else None)
+
+def test_lookup_scaling(tmp_path, results):
+    # TAB latency for repository completion should stay (roughly) flat as
+    # the org grows. we complete a prefix of a repository from the middle
+    # of the list, so the number of matches (and thus the cost of rendering
+    # them) is about the same irrespective of the size of the org.
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    cachedir = _cachedir(homedir)
+
+    for n in [ 100, 1_000, 10_000, 100_000 ]:
+        repos = synthetic_repos(n)
+        prefix = repos[n // 2][:-1]
+        cache = os.path.join(cachedir, f'github.org{n}.cache')
+        with open(cache, 'w') as fp:
+            fp.write(''.join(f'{repo}\n' for repo in repos))
+        with open(os.path.join(cachedir, f'github.org{n}.meta'), 'w') as fp:
+            fp.write(f'last_full={int(time.time())}\nlast_sync={int(time.time()) + 3600}\n')
+        out = bash_script(f'''
+            _repo_cache_index "{cache}"
+            cur="git@github.com:org{n}/{prefix}"
+            for ((i = 0; i < {_ROUNDS}; i++)); do
+                t0=$EPOCHREALTIME
+                _complete_fragment github git@github.com: "org{n}/{prefix}"
+                echo $(( ${{EPOCHREALTIME/./}} - ${{t0/./}} ))
+            done
+        ''', homedir)
+        samples = [ int(t) / 1e6 for t in out.split() ]
+        _bench(results, f'lookup-{n}', lambda: types.SimpleNamespace(elapsed=samples.pop()))
+
+    p50 = lambda n: results[f'lookup-{n}']['p50']
+    assert p50(100_000) < 2 * p50(100) + _SLACK_MS, f"lookup latency grows with org size: {[ p50(n) for n in [ 100, 1_000, 10_000, 100_000 ] ]}"
+
+def test_repo_cold_warm(bash, mockapi, results):
+    # the first completion in an org waits for the download (from the mock
+    # API); subsequent ones are served from the cache
+    fake_auth(bash.homedir, ['github'])
+    mockapi.add_repos('github', 'org', synthetic_repos(500))
+    bash.run(f"GG_API_github={mockapi.url}", expect_output=False)
+
+    cachedir = _cachedir(bash.homedir)
+    def clear():
+        _wait_unlocked(cachedir, 'org')
+        for suffix in [ 'cache', 'meta' ]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(cachedir, f'github.org.{suffix}'))
+
+    complete = lambda: bash.complete("git clone git@github.com:org/a")
+    _bench(results, 'repo-cold', complete, before=clear)
+    _wait_unlocked(cachedir, 'org')
+    _bench(results, 'repo-warm', complete)
+
+def test_repo_cold_wait(bash, mockapi, results):
+    # the first completion in a (small) org without a prefix to search for
+    # waits for the download itself; this measures how long we take to
+    # notice it's done
+    fake_auth(bash.homedir, ['github'])
+    mockapi.add_repos('github', 'small', synthetic_repos(50))
+    bash.run(f"GG_API_github={mockapi.url}", expect_output=False)
+
+    cachedir = _cachedir(bash.homedir)
+    def clear():
+        _wait_unlocked(cachedir, 'small')
+        for suffix in [ 'cache', 'meta' ]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(cachedir, f'github.small.{suffix}'))
+
+    complete = lambda: bash.complete("git clone git@github.com:small/")
+    _bench(results, 'repo-cold-wait', complete, before=clear)
+    _wait_unlocked(cachedir, 'small')
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_fetch(tmp_path, mockapi, results, service):
+    # downloading the full list of a 1000-repository org (10 pages), with
+    # 20ms of latency per request
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    mockapi.add_repos(service, 'org', 1000)
+    mockapi.latency = 0.02
+
+    cache = os.path.join(_cachedir(homedir), f'{service}.org.cache')
+    def fetch():
+        t0 = time.perf_counter()
+        bash_script(f'GG_FULL_REFRESH=0 _refresh_repo_cache {service} org "{cache}"', homedir, env=mockapi.env())
+        return types.SimpleNamespace(elapsed=time.perf_counter() - t0)
+    _bench(results, f'fetch-{service}', fetch)
+
+def test_ssh(bash, ssh_standin, results):
+    bash.run(f'PATH="{ssh_standin}:$PATH"', expect_output=False)
+
+    complete = lambda: bash.complete("git clone test-dummy-localhost:foo/")
+    _bench(results, 'ssh-connect', complete, 'rep ', before=lambda: bash.run("__mj_ssh_stop; gg-ssh-invalidate", expect_output=False))
+    _bench(results, 'ssh-warm', complete, 'rep ')
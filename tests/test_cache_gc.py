@@ -0,0 +1,177 @@
+from conftest import *
+
+def _cachedir(homedir):
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir, exist_ok=True)
+    return cachedir
+
+def _add_org(cachedir, org, repos=[ 'r1', 'r2' ], last_full=None):
+    with open(os.path.join(cachedir, f'github.{org}.cache'), 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in repos))
+    with open(os.path.join(cachedir, f'github.{org}.meta'), 'w') as fp:
+        fp.write(f'last_full={last_full or int(time.time())}\nlast_sync={int(time.time()) + 3600}\n')
+
+def _touch(fn, age=0):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    open(fn, 'a').close()
+    t = time.time() - age
+    os.utime(fn, (t, t))
+
+def _access_log(homedir):
+    with open(os.path.join(_cachedir(homedir), 'access.log')) as fp:
+        return [ line.split()[1:] for line in fp ]
+
+def test_access_log(tmp_path, mockapi):
+    # completions log whether they were served from the cache, and the
+    # stats report them
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.add_repos('github', 'org', [ 'alpha', 'beta' ])
+
+    # (the first completion returns as soon as it's got a match, offering
+    # what it has as suggestions, so we wait for the rest of the download)
+    complete = '_complete_fragment github git@github.com: org/; echo ${COMPREPLY[@]}'
+    wait = 'while [[ -f $GG_CACHEDIR/github.org.lock ]]; do sleep 0.05; done'
+    env = dict(mockapi.env(), GG_CACHE_ACCESS_INTERVAL='0')
+    out = bash_script(f'{complete}; {wait}; {complete}; {complete}', homedir, env=env)
+    assert out.split('\n')[:3] == [ 'org/alpha org/beta \u00a0' ] + [ 'git@github.com:org/alpha git@github.com:org/beta' ] * 2
+
+    assert _access_log(homedir) == [ [ 'github.org', 'miss', '1' ], [ 'github.org', 'hit', '1' ], [ 'github.org', 'hit', '1' ] ]
+
+    out = bash_script('gg-cache stats', homedir).splitlines()
+    org, size, hits, misses, rate = out[1].split()[:5]
+    assert (org, hits, misses, rate) == ('github.org', '2', '1', '66.7%')
+    assert '1 orgs' in out[-2] and '2 hits, 1 misses' in out[-2]
+
+def test_access_log_batched(tmp_path):
+    # a shell logs the first use right away, then counts them up and logs
+    # them once GG_CACHE_ACCESS_INTERVAL has passed
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    _add_org(_cachedir(homedir), 'org')
+    _add_org(_cachedir(homedir), 'other')
+
+    complete = '_complete_fragment github git@github.com: {}/'
+    script = '; '.join([ complete.format('org') ] * 4 + [ complete.format('other') ])
+    bash_script(script, homedir)
+    assert _access_log(homedir) == [ [ 'github.org', 'hit', '1' ] ]
+
+    # (pretending the interval's passed)
+    bash_script(f'{script}; __gg_access_logged=0; {complete.format("other")}', homedir)
+    assert _access_log(homedir) == [ [ 'github.org', 'hit', '1' ], [ 'github.org', 'hit', '1' ], [ 'github.org', 'hit', '3' ], [ 'github.other', 'hit', '2' ] ]
+
+def test_access_log_compacted(tmp_path, mockapi):
+    # a refresh compacts the access log once it's too large, even with
+    # automatic gcs turned off
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.add_repos('github', 'org', [ 'alpha' ])
+    cachedir = _cachedir(homedir)
+    now = int(time.time())
+    with open(os.path.join(cachedir, 'access.log'), 'w') as fp:
+        fp.write(''.join(f'{now - 100 + i} github.org hit 1\n' for i in range(100)))
+        fp.write(''.join(f'{now - 100 + i} github.gone miss 1\n' for i in range(10)))
+
+    env = dict(mockapi.env(), GG_CACHE_GC_INTERVAL='0', GG_CACHE_ACCESS_LOG_MAX='1')
+    bash_script(f'_refresh_repo_cache github org "{cachedir}/github.org.cache"', homedir, env=env)
+    for _ in range(100):
+        if len(_access_log(homedir)) == 2:
+            break
+        time.sleep(0.05)
+    with open(os.path.join(cachedir, 'access.log')) as fp:
+        assert fp.read().split('\n') == [ f'{now - 91} github.gone miss 10', f'{now - 1} github.org hit 100', '' ]
+
+def test_gc_lru(tmp_path):
+    # the least recently used orgs are evicted, down to the limits
+    homedir = str(tmp_path)
+    cachedir = _cachedir(homedir)
+    now = int(time.time())
+    for org in [ 'a', 'b', 'c', 'd' ]:
+        _add_org(cachedir, org)
+    _add_org(cachedir, 'old', last_full=now - 86400)       # never used
+    with open(os.path.join(cachedir, 'access.log'), 'w') as fp:
+        fp.write(f'{now - 30} github.a hit\n{now - 10} github.b hit\n{now - 20} github.c miss\n{now - 5} github.d hit 3\n{now} github.gone hit\n')
+    _touch(os.path.join(cachedir, 'github.a.lock'))        # being refreshed
+
+    out = bash_script('GG_CACHE_MAX_ORGS=3 gg-cache gc', homedir).splitlines()
+    assert [ line.split()[:2] for line in out[:-1] ] == [ [ 'evicted', 'github.old' ], [ 'evicted', 'github.c' ] ]
+    assert re.search(r'; 3 orgs \(\d+K\) left$', out[-1])
+    assert sorted(fn for fn in os.listdir(cachedir) if fn.endswith('.cache')) == [ 'github.a.cache', 'github.b.cache', 'github.d.cache' ]
+    assert not os.path.exists(os.path.join(cachedir, 'github.c.meta'))
+
+    # the access log is compacted, forgetting the evicted orgs
+    with open(os.path.join(cachedir, 'access.log')) as fp:
+        assert fp.read().split('\n') == [ f'{now - 30} github.a hit 1', f'{now - 10} github.b hit 1', f'{now - 5} github.d hit 3', '' ]
+
+    # ... and by size (each of these takes a 4K block, at least)
+    bash_script('GG_CACHE_MAX_SIZE=1 gg-cache gc -q', homedir)
+    assert [ fn for fn in os.listdir(cachedir) if fn.endswith('.cache') ] == [ 'github.a.cache' ]
+
+def test_gc_sweep(tmp_path):
+    # leftovers of killed shells and refreshes are swept up, once they're
+    # older than GG_LOCK_TIMEOUT
+    homedir = str(tmp_path)
+    cachedir = _cachedir(homedir)
+    now = int(time.time())
+    _add_org(cachedir, 'org')
+
+    old = [ 'github.org.cache.123.456.tmp', 'github.org.cache.123.456.tmp.new', 'github.x.partial', 'github.x.lock',
+            'github.org.memo.999999999', 'daemon.fifo.999999999', 'daemon.reply.999999999', 'ssh.snapshots/host/_foo' ]
+    new = [ 'github.org.cache.124.456.tmp', 'github.y.lock', f'github.org.memo.{os.getpid()}' ]
+    for fn in old:
+        _touch(os.path.join(cachedir, fn), 3600)
+    for fn in new:
+        _touch(os.path.join(cachedir, fn))
+    os.makedirs(os.path.join(cachedir, 'github.org.cache.d.123.456.old'))
+    os.utime(os.path.join(cachedir, 'github.org.cache.d.123.456.old'), (now - 3600, now - 3600))
+
+    # orgs that don't exist are forgotten after GG_NEGATIVE_TTL
+    for org, age in [ ('typo', 3600), ('recent', 10) ]:
+        with open(os.path.join(cachedir, f'github.{org}.meta'), 'w') as fp:
+            fp.write(f'miss_at={now - age}\n')
+
+    out = bash_script('gg-cache gc', homedir).splitlines()
+    assert out[0] == 'removed   github.typo (not found)'
+    assert out[1].startswith('gg-cache: evicted 0 orgs (0K), removed 10 leftover files; 3 orgs (')
+    left = set(os.listdir(cachedir))
+    assert not left & set(old + [ 'github.org.cache.d.123.456.old', 'github.typo.meta' ])
+    assert set(new + [ 'github.org.cache', 'github.recent.meta' ]) <= left
+    assert os.listdir(os.path.join(cachedir, 'ssh.snapshots')) == []
+
+def test_autogc(tmp_path, mockapi):
+    # refreshes start a gc in the background once GG_CACHE_GC_INTERVAL has
+    # passed since the last one (a new cache directory starts the clock)
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.add_repos('github', 'org', [ 'alpha' ])
+    cachedir = _cachedir(homedir)
+    _add_org(cachedir, 'old', last_full=int(time.time()) - 86400)
+
+    refresh = f'_refresh_repo_cache github org "{cachedir}/github.org.cache"'
+    env = dict(mockapi.env(), GG_CACHE_MAX_ORGS='1')
+    bash_script(refresh, homedir, env=env)
+    with open(os.path.join(cachedir, 'gc.meta')) as fp:
+        last_gc = int(fp.read().split('=')[1])
+    assert os.path.exists(os.path.join(cachedir, 'github.old.cache'))
+
+    with open(os.path.join(cachedir, 'gc.meta'), 'w') as fp:
+        fp.write(f'last_gc={last_gc - 86400}\n')
+    bash_script(refresh, homedir, env=env)
+    for _ in range(100):
+        if not os.path.exists(os.path.join(cachedir, 'github.old.cache')):
+            break
+        time.sleep(0.05)
+    assert os.listdir(cachedir).count('github.org.cache') == 1
+    assert not os.path.exists(os.path.join(cachedir, 'github.old.cache'))
+
+def test_clear(tmp_path):
+    # everything goes, except the daemon's pipes
+    homedir = str(tmp_path)
+    cachedir = _cachedir(homedir)
+    _add_org(cachedir, 'org')
+    for fn in [ 'access.log', 'github@orgs.cache', 'ssh.snapshots/host/_foo', 'daemon.pid' ]:
+        _touch(os.path.join(cachedir, fn))
+
+    out = bash_script('gg-cache clear; gg-cache bogus 2>&1; echo "rc=$?"', homedir).splitlines()
+    assert out == [ 'usage: gg-cache <stats|gc [-q]|clear>', 'rc=1' ]
+    assert os.listdir(cachedir) == [ 'daemon.pid' ]
@@ -0,0 +1,94 @@
+from conftest import *
+
+def _make_cache(homedir, org, repos):
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir, exist_ok=True)
+    cache = os.path.join(cachedir, f'github.{org}.cache')
+    with open(cache, 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in repos))
+    bash_script(f'_repo_cache_index "{cache}"', homedir)
+    return cache
+
+def test_lookup(tmp_path):
+    homedir = str(tmp_path)
+    repos = synthetic_repos(5000)
+    cache = _make_cache(homedir, 'big', repos)
+    assert os.path.isdir(cache + '.d'), "a large cache should have been indexed"
+
+    # the shards should return exactly the repos that may match the prefix
+    for prefix in [ '', 'a', 'ab', 'ab-', 'zz', '9' ]:
+        out = bash_script(f'_repo_cache_lookup "{cache}" "{prefix}"; printf "%s\\n" "${{REPOS[@]}}"', homedir)
+        got = sorted(r for r in out.split('\n') if r and r.startswith(prefix))
+        assert got == [ r for r in repos if r.startswith(prefix) ], f"wrong lookup for prefix '{prefix}'"
+
+    # small caches aren't indexed
+    cache = _make_cache(homedir, 'small', repos[:10])
+    assert not os.path.exists(cache + '.d')
+
+@pytest.mark.parametrize("bashpath", bash_versions)
+def test_memo(tmp_path, bashpath):
+    # repeated lookups in an org are served from memory (on bash 3.2, which
+    # has no memo, from the cache as before), until its cache changes
+    homedir = str(tmp_path)
+    repos = synthetic_repos(5000)
+    cache = _make_cache(homedir, 'big', repos)
+    _make_cache(homedir, 'small', repos[:10])
+    _make_cache(homedir, 'other', repos[10:20])
+    changed = sorted(repos[1:] + [ 'ab-new' ])
+
+    # each lookup prints the number of times a cache has been read so far,
+    # the prefix, and the repositories
+    out = bash_script(f'''
+        reads=0
+        __readlines() {{ [[ $1 == __gg_memo_* ]] && (( reads++ )); mapfile -t "$1"; }}
+        lookup() {{
+            local cache="$HOME/.cache/git-clone-completion/github.$1.cache"
+            __gg_memo_lookup "github.$1" "$cache" "$2" || _repo_cache_lookup "$cache" "$2"
+            printf "%s\\t%s" "$reads" "$2"; (( ${{#REPOS[@]}} )) && printf "\\t%s" "${{REPOS[@]}}"; echo
+        }}
+        for prefix in a ab ab- ab '' 9 zz a; do lookup big "$prefix"; done
+        printf "%s\\n" {' '.join(changed)} > "{cache}"
+        touch -d "@$(( $(date +%s) + 2 ))" "{cache}"
+        lookup big ab
+        lookup small ''; lookup other ''; lookup big ab; lookup small ''
+        echo "${{__gg_memo_lru[*]}}"
+    ''', homedir, bashpath=bashpath, env=dict(GG_MEMO_ORGS='2'))
+    *lines, lru = out.split('\n')[:-1]
+    memo = lru != ''
+
+    reads = []
+    for i, line in enumerate(lines):
+        n, prefix, *got = line.split('\t')
+        org = [ 'big' ] * 9 + [ 'small', 'other', 'big', 'small' ]
+        source = dict(big=repos if i < 8 else changed, small=repos[:10], other=repos[10:20])[org[i]]
+        expected = [ r for r in source if r.startswith(prefix) ]
+        if not memo:
+            # (the index returns a superset, in whatever order)
+            got = sorted(r for r in got if r.startswith(prefix))
+        assert got == expected, f"wrong lookup for prefix '{prefix}'"
+        reads.append(int(n))
+
+    if memo:
+        # read once, again after the change; with room for just two orgs,
+        # the big one's evicted by the other, and then the small one by the big
+        assert reads == [ 1 ] * 8 + [ 2, 3, 4, 5, 6 ]
+        assert lru == 'github.big github.small'
+        assert 'github.big.memo.' in ' '.join(os.listdir(os.path.dirname(cache)))
+
+def test_memo_refresh(tmp_path, mockapi):
+    # a refresh's new list replaces the memo, even if the memo's stamp was
+    # touched while the list was being sorted
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    cache = _make_cache(homedir, 'org', [ 'a1' ])
+    mockapi.add_repos('github', 'org', [ 'a1', 'a2' ])
+
+    out = bash_script(f'''
+        lookup() {{ __gg_memo_lookup github.org "{cache}" a || _repo_cache_lookup "{cache}" a; echo "${{REPOS[*]}}"; }}
+        lookup
+        sort() {{ command sort "$@"; local rc=$?; sleep 0.05; touch "${{GG_CACHEDIR}}/github.org.memo.$$"; return $rc; }}
+        _refresh_repo_cache github org "{cache}"
+        unset -f sort
+        lookup
+    ''', homedir, env=mockapi.env())
+    assert out.split('\n') == [ 'a1', 'a1 a2', '' ]
@@ -0,0 +1,81 @@
+from conftest import *
+
+def _write_cache(bash, service, org, repos):
+    cachedir = os.path.join(bash.homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir, exist_ok=True)
+    with open(os.path.join(cachedir, f'{service}.{org}.cache'), 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in repos))
+
+@pytest.mark.env(ignore_changes=r"^[+-]__gg_daemon_\w*=.*$")
+class TestDaemon:
+    def test_daemon(self, bash):
+        fake_auth(bash.homedir, ['github'])
+        _write_cache(bash, 'github', 'foo', [ 'bar', 'baz', 'foo' ])
+
+        bash.run("gg-daemon start", expect_output=False)
+        try:
+            assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+
+            # the daemon keeps the list in memory, so changes to the
+            # (fresh) cache file shouldn't be visible
+            _write_cache(bash, 'github', 'foo', [ 'bar', 'baz', 'bzz', 'foo' ])
+            assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+
+            # orgs the daemon has never seen fall back to the file-based path
+            _write_cache(bash, 'github', 'qux', [ 'quux' ])
+            assert bash.complete("git clone git@github.com:qux/q") == 'uux '
+        finally:
+            bash.run("gg-daemon stop", expect_output=False)
+
+        # with the daemon gone, we read the cache file again
+        assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz', 'foo/bzz' ]
+
+    @pytest.mark.env(ignore_changes=r"^[+-](__gg_daemon_\w*|GG_API_github)=.*$")
+    def test_cold_org(self, bash, mockapi):
+        # a first download in between doesn't cost us the reply pipe
+        fake_auth(bash.homedir, ['github'])
+        _write_cache(bash, 'github', 'foo', [ 'bar', 'baz', 'foo' ])
+        mockapi.add_repos('github', 'new', [ 'one', 'two' ])
+        bash.run(f"GG_API_github={mockapi.url}", expect_output=False)
+
+        bash.run("gg-daemon start", expect_output=False)
+        try:
+            assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+            assert bash.complete("git clone git@github.com:new/") == [ 'new/one', 'new/two' ]
+
+            # (served from the daemon's memory, not the changed file)
+            _write_cache(bash, 'github', 'foo', [ 'bar', 'baz', 'bzz', 'foo' ])
+            assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+        finally:
+            bash.run("gg-daemon stop", expect_output=False)
+
+    def test_stalled_client(self, bash):
+        # a client that's stopped listening to a long answer doesn't hold up
+        # the daemon (and everyone else's completions)
+        fake_auth(bash.homedir, ['github'])
+        _write_cache(bash, 'github', 'foo', [ f'repo{i:05d}' for i in range(20000) ])
+        cachedir = os.path.join(bash.homedir, '.cache/git-clone-completion')
+        with open(os.path.join(cachedir, 'github.foo.meta'), 'w') as fp:
+            fp.write(f'last_sync={int(time.time()) + 3600}\n')
+
+        bash.run("gg-daemon start", expect_output=False)
+        stalled = subprocess.Popen([ 'sleep', '60' ])
+        try:
+            assert bash.complete("git clone git@github.com:foo/repo1999") == [ f'foo/repo1999{i}' for i in range(10) ]
+
+            # (a live process that asks for all of it, and never reads)
+            reply = os.path.join(cachedir, f'daemon.fifo.{stalled.pid}')
+            os.mkfifo(reply)
+            fd = os.open(os.path.join(cachedir, 'daemon.fifo'), os.O_WRONLY | os.O_NONBLOCK)
+            os.write(fd, f'{stalled.pid}.1\t{reply}\tgithub\tfoo\t\n'.encode())
+            os.close(fd)
+
+            # the daemon still answers from memory, rather than our falling
+            # back to the (changed) file after a timeout
+            _write_cache(bash, 'github', 'foo', [ 'repo19990', 'repo19999x' ])
+            assert bash.complete("git clone git@github.com:foo/repo1999") == [ f'foo/repo1999{i}' for i in range(10) ]
+            assert bash.complete("git clone git@github.com:foo/repo1999") == [ f'foo/repo1999{i}' for i in range(10) ]
+        finally:
+            stalled.kill()
+            stalled.wait()
+            bash.run("gg-daemon stop", expect_output=False)
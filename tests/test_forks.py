@@ -0,0 +1,97 @@
+#
+# The completion functions run on every TAB, where each fork (a command
+# substitution, a pipe, an external command) adds a millisecond or more.
+# Verify that the common paths don't fork at all, by auditing an xtrace of
+# a (second, memoized) completion: every command must be a function,
+# builtin or keyword, and run in the shell's own process.
+#
+
+from conftest import *
+
+_AUDIT = r'''
+__audit()
+{
+	COMP_WORDBREAKS=$' \t\n'
+	COMP_WORDS=(git clone "$1"); COMP_CWORD=2
+
+	# the first completion may memoize things; audit the second one
+	COMPREPLY=(); _git_clone; COMPREPLY=()
+
+	exec 250>"$HOME/xtrace"
+	BASH_XTRACEFD=250 PS4='+|$BASHPID|'
+	set -x; _git_clone; set +x
+	exec 250>&-
+
+	echo "pid $BASHPID"
+	compgen -A function -b -k | sed 's/^/nofork /'
+	printf 'reply %s\n' "${COMPREPLY[@]}"
+}
+'''
+
+def _audit(homedir, word):
+    """
+    Complete `git clone <word>`, returning the completions and a list of
+    the traced commands that forked.
+    """
+    # (with nothing listening for the background refreshes)
+    out = bash_script(_AUDIT + f'__audit "{word}"', homedir, env=dict(GG_API_github='http://127.0.0.1:9'))
+
+    nofork, replies, pid = { '((' }, [], None
+    for line in out.splitlines():
+        kind, _, value = line.partition(' ')
+        if kind == 'pid':
+            pid = value
+        elif kind == 'nofork':
+            nofork.add(value)
+        elif kind == 'reply':
+            replies.append(value)
+
+    forks = []
+    with open(os.path.join(homedir, 'xtrace')) as fp:
+        for line in fp:
+            m = re.match(r"^\++\|(\d+)\|(.*)$", line.rstrip('\n'))
+            if not m:
+                continue    # continuation of a multi-line command
+            cmd = m[2]
+            if m[1] != pid:
+                forks.append(f'subshell: {cmd}')
+            elif re.match(r"^\w+(\[[^]]*\])?\+?=", cmd):
+                continue    # an assignment
+            elif cmd.split(' ', 1)[0].strip("'") not in nofork:
+                forks.append(cmd)
+    return replies, forks
+
+@pytest.fixture
+def home(tmp_path):
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    for org in [ 'foo', 'bar' ]:
+        os.makedirs(os.path.join(homedir, 'projects/github.com', org))
+    return homedir
+
+def test_service_prefixes(home):
+    replies, forks = _audit(home, 'git@git')
+    assert replies[:-1] == [ 'git@gitlab.com:', 'git@github.com:' ]
+    assert forks == []
+
+def test_org_listing(home):
+    replies, forks = _audit(home, 'git@github.com:')
+    assert replies[:-1] == [ 'bar/', 'foo/' ]
+    assert forks == []
+
+@pytest.mark.parametrize("n", [ 3, 5000 ])
+def test_warm_repo_listing(home, n):
+    # a fresh cache, both small and large (indexed)
+    repos = [ 'bar', 'baz', 'foo' ] + synthetic_repos(n - 3)
+    cachedir = os.path.join(home, '.cache/git-clone-completion')
+    os.makedirs(cachedir)
+    cache = os.path.join(cachedir, 'github.foo.cache')
+    with open(cache, 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in sorted(set(repos))))
+    with open(os.path.join(cachedir, 'github.foo.meta'), 'w') as fp:
+        fp.write(f'last_full={int(time.time())}\nlast_sync={int(time.time())}\n')
+    bash_script(f'_repo_cache_index "{cache}"', home)
+
+    replies, forks = _audit(home, 'git@github.com:foo/ba')
+    assert 'foo/bar ' in replies
+    assert forks == []
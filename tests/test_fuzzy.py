@@ -0,0 +1,78 @@
+from conftest import *
+
+_REPOS = {
+    'a': [ 'data-ingest-worker', 'foo', 'ingest', 'ingress-gest', 'svc-dataingest' ],
+    'b': [ 'Ingestion', 'ingest-tools', 'zzz' ],
+}
+
+def _write_caches(homedir):
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir, exist_ok=True)
+    for org, repos in _REPOS.items():
+        with open(os.path.join(cachedir, f'github.{org}.cache'), 'w') as fp:
+            fp.write(''.join(f'{repo}\n' for repo in repos))
+        with open(os.path.join(cachedir, f'github.{org}.meta'), 'w') as fp:
+            fp.write(f'last_full={int(time.time())}\nlast_sync={int(time.time()) + 3600}\n')
+    return cachedir
+
+def _lookup(homedir, org, text):
+    out = bash_script(f'_fuzzy_lookup github "{org}" "{text}"; printf "%s\\n" "${{FUZZY[@]}}"', homedir)
+    return [ line for line in out.split('\n') if line ]
+
+def test_lookup(tmp_path):
+    homedir = str(tmp_path)
+    cachedir = _write_caches(homedir)
+
+    # ranked: prefix, word boundary, substring, then similar names; within
+    # each, shorter names first
+    assert _lookup(homedir, '', 'ingest') == [
+        'a/ingest', 'b/Ingestion', 'b/ingest-tools',
+        'a/data-ingest-worker',
+        'a/svc-dataingest',
+        'a/ingress-gest',
+    ]
+    assert _lookup(homedir, 'a', 'gest') == [ 'a/ingress-gest', 'a/ingest', 'a/svc-dataingest', 'a/data-ingest-worker' ]
+    assert _lookup(homedir, 'b', 'xyz') == []
+
+    # the first lookup indexed the caches, and the index is used from then on
+    assert os.path.isdir(os.path.join(cachedir, 'github.a.cache.t'))
+    with open(os.path.join(cachedir, 'github.b.cache'), 'a') as fp:
+        fp.write('ingest-more\n')
+    os.utime(os.path.join(cachedir, 'github.b.cache'), (0, 0))
+    assert 'b/ingest-more' not in _lookup(homedir, 'b', 'ingest')
+
+def test_index_on_refresh(tmp_path, mockapi):
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    cache = os.path.join(homedir, '.cache/git-clone-completion/github.org.cache')
+    refresh = f'GG_FULL_REFRESH=0 _refresh_repo_cache github org "{cache}"'
+
+    mockapi.add_repos('github', 'org', [ 'alpha', 'beta' ])
+    bash_script(refresh, homedir, env=mockapi.env())
+    assert not os.path.exists(cache + '.t'), "the index should only be built in fuzzy mode"
+
+    bash_script(refresh, homedir, env=dict(mockapi.env(), GG_FUZZY='1'))
+    assert _lookup(homedir, 'org', 'lph') == [ 'org/alpha' ]
+
+    # refreshes update the index
+    mockapi.add_repos('github', 'org', [ 'gamma-alpha' ])
+    bash_script(refresh, homedir, env=dict(mockapi.env(), GG_FUZZY='1'))
+    assert _lookup(homedir, 'org', 'lph') == [ 'org/alpha', 'org/gamma-alpha' ]
+
+@pytest.mark.env(ignore_changes=r"^([+-]GG_FUZZY=.*|\+RANDOM=.*)$")
+class TestFuzzy:
+    def test_complete(self, bash):
+        fake_auth(bash.homedir, ['github'])
+        _write_caches(bash.homedir)
+        bash.run("GG_FUZZY=1", expect_output=False)
+
+        # without an org, from all orgs (shown in order of relevance)
+        assert bash.complete("git clone git@github.com:ingest") == [
+            'a/ingest', 'b/Ingestion', 'b/ingest-tools', 'a/data-ingest-worker', 'a/svc-dataingest', 'a/ingress-gest' ]
+
+        # within an org
+        assert bash.complete("git clone git@github.com:a/gest") == [ 'a/ingress-gest', 'a/ingest', 'a/svc-dataingest', 'a/data-ingest-worker' ]
+
+        # ...but only if nothing begins with what's been typed
+        assert bash.complete("git clone git@github.com:a/ing") == [ 'a/ingest', 'a/ingress-gest' ]
+        assert bash.complete("git clone git@github.com:b/ingest-") == 'tools '
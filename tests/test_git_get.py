@@ -0,0 +1,142 @@
+from conftest import *
+
+_GIT_GET = os.path.join(os.path.dirname(__file__), '..', 'git-get')
+
+@pytest.fixture
+def remotes(tmp_path):
+    """
+    Bare repositories under <tmp_path>/remotes/<org>/<repo>, standing in for
+    git@github.com:<org>/<repo> (via url.<base>.insteadOf in the test
+    $HOME's .gitconfig). Call with (org, [repos]) to create some.
+    """
+    homedir = str(tmp_path)
+    base = os.path.join(homedir, 'remotes')
+    with open(os.path.join(homedir, '.gitconfig'), 'w') as fp:
+        fp.write(f'[url "file://{base}/"]\n\tinsteadOf = git@github.com:\n')
+
+    def create(org, repos):
+        for repo in repos:
+            subprocess.run([ 'git', 'init', '-q', '--bare', os.path.join(base, org, repo) ], check=True)
+    return create
+
+_IDENTITY = dict(GIT_AUTHOR_NAME='A U Thor', GIT_AUTHOR_EMAIL='author@example.com',
+                 GIT_COMMITTER_NAME='A U Thor', GIT_COMMITTER_EMAIL='author@example.com')
+
+def _commit(homedir, org, repo, fn):
+    # push a commit adding <fn> to the remote <org>/<repo>
+    work = os.path.join(homedir, 'work')
+    env = dict(os.environ, HOME=homedir, GIT_CONFIG_NOSYSTEM='1', **_IDENTITY)
+    run = lambda *args, **kw: subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kw)
+    run('git', 'clone', os.path.join(homedir, 'remotes', org, repo), work)
+    with open(os.path.join(work, fn), 'w') as fp:
+        fp.write(fn)
+    run('git', 'add', fn, cwd=work)
+    run('git', 'commit', '-m', fn, cwd=work)
+    run('git', 'push', 'origin', 'HEAD', cwd=work)
+    shutil.rmtree(work)
+
+def _git_get(homedir, *args, cwd=None, env=None):
+    _env = dict(os.environ, HOME=homedir, GIT_CONFIG_NOSYSTEM='1')
+    for var in [ 'PROJECTS', 'ORG', 'GG_CACHEDIR', 'XDG_CACHE_HOME', 'MIRRORS' ]:
+        _env.pop(var, None)
+    env = dict(_env, **(env or {}))
+    return subprocess.run([ 'bash', _GIT_GET, *args ], env=env, cwd=cwd or homedir,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, encoding='utf-8')
+
+def _summary(out):
+    # the outcome lines, sans the location of $PROJECTS
+    return [ line for line in out.splitlines() if line.split(' ')[0] in ('cloned', 'exists', 'failed') ]
+
+def test_single(tmp_path, remotes):
+    homedir = str(tmp_path)
+    remotes('lsst', [ 'afw' ])
+
+    p = _git_get(homedir, 'lsst/afw')
+    assert p.returncode == 0
+    assert os.path.isdir(os.path.join(homedir, 'projects/github.com/lsst/afw/.git'))
+
+    p = _git_get(homedir, 'git@github.com:lsst/afw.git')
+    assert p.stdout.strip() == f'already exists in {homedir}/projects/github.com/lsst/afw'
+
+def test_many(tmp_path, remotes):
+    homedir = str(tmp_path)
+    remotes('lsst', [ 'afw', 'daf_butler', 'pipe_base' ])
+    remotes('mjuric', [ 'lsd' ])
+    _git_get(homedir, 'lsst/pipe_base')
+
+    p = _git_get(homedir, '-j', '2', 'lsst/afw', 'lsst/pipe_base', 'mjuric/lsd', 'lsst/missing', 'lsst/daf_butler', 'lsst/afw')
+    assert p.returncode == 1
+    projects = os.path.join(homedir, 'projects/github.com')
+    assert _summary(p.stdout) == [
+        f'cloned   {projects}/lsst/afw',
+        f'exists   {projects}/lsst/pipe_base',
+        f'cloned   {projects}/mjuric/lsd',
+        f'failed   git@github.com:lsst/missing',
+        f'cloned   {projects}/lsst/daf_butler',
+        f'exists   {projects}/lsst/afw',
+    ]
+    assert '3 cloned, 2 already present, 1 failed.' in p.stdout
+    for repo in [ 'lsst/afw', 'lsst/daf_butler', 'mjuric/lsd' ]:
+        assert os.path.isdir(os.path.join(projects, repo, '.git'))
+    assert not os.path.exists(os.path.join(projects, 'lsst/missing'))
+
+def test_org(tmp_path, remotes):
+    homedir = str(tmp_path)
+    repos = [ f'repo{i}' for i in range(10) ]
+    remotes('lsst', repos)
+
+    # the org's repositories come from the completion's cache...
+    p = _git_get(homedir, 'lsst/*')
+    assert p.returncode != 0
+    assert 'no list of the repositories in github.com:lsst' in p.stdout
+
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir)
+    with open(os.path.join(cachedir, 'github.lsst.cache'), 'w') as fp:
+        fp.write(''.join(f'{repo}\n' for repo in repos))
+
+    p = _git_get(homedir, 'lsst/*')
+    assert p.returncode == 0
+    assert '10 cloned, 0 already present, 0 failed.' in p.stdout
+    assert sorted(os.listdir(os.path.join(homedir, 'projects/github.com/lsst'))) == repos
+
+    # ...and those already cloned are skipped
+    p = _git_get(homedir, 'git@github.com:lsst/*')
+    assert '0 cloned, 10 already present, 0 failed.' in p.stdout
+
+def test_mirrors(tmp_path, remotes):
+    homedir = str(tmp_path)
+    remotes('lsst', [ 'afw' ])
+    _commit(homedir, 'lsst', 'afw', 'one')
+    clone = os.path.join(homedir, 'projects/github.com/lsst/afw')
+    mirror = os.path.join(homedir, 'projects/.mirrors/github.com/lsst/afw.git')
+
+    # cloning leaves a mirror behind, which the clone doesn't depend on
+    p = _git_get(homedir, 'lsst/afw', env=dict(MIRRORS='1'))
+    assert p.returncode == 0, p.stdout
+    assert os.path.isfile(os.path.join(mirror, 'HEAD'))
+    assert not os.path.exists(os.path.join(clone, '.git/objects/info/alternates'))
+    assert subprocess.check_output([ 'git', 'remote', 'get-url', 'origin' ], cwd=clone, encoding='utf-8').strip() == 'git@github.com:lsst/afw'
+
+    # re-cloning brings the mirror up to date
+    _commit(homedir, 'lsst', 'afw', 'two')
+    shutil.rmtree(clone)
+    p = _git_get(homedir, 'lsst/afw', env=dict(MIRRORS='1'))
+    assert p.returncode == 0, p.stdout
+    assert sorted(os.listdir(clone)) == [ '.git', 'one', 'two' ]
+    log = lambda: subprocess.check_output([ 'git', 'log', '--format=%s', 'HEAD' ], cwd=mirror, encoding='utf-8').split()
+    assert log() == [ 'two', 'one' ]
+
+    # maintenance
+    _commit(homedir, 'lsst', 'afw', 'three')
+    p = _git_get(homedir, '--mirrors', 'fetch')
+    assert p.returncode == 0
+    assert p.stdout.split() == [ 'updated', mirror ]
+    assert log() == [ 'three', 'two', 'one' ]
+
+    p = _git_get(homedir, '--mirrors', 'prune')
+    assert p.returncode == 0
+    assert p.stdout.split() == [ 'pruned', mirror ]
+
+    p = _git_get(homedir, '--mirrors')
+    assert p.stdout.split()[-1] == mirror
@@ -0,0 +1,33 @@
+from conftest import *
+
+# the first TAB loads the rest of the script, defining everything it does
+pytestmark = [ pytest.mark.lazy, pytest.mark.env(ignore_changes=r".*") ]
+
+_GIT_COMPLETION = '/usr/share/bash-completion/completions/git'
+
+def _loaded(bash):
+    return bash.run("declare -F _get_repo_list >/dev/null && echo loaded || echo stub").strip()
+
+def test_stub(bash):
+    # sourcing only registers the hooks...
+    assert _loaded(bash) == 'stub'
+    assert bash.run("complete -p git").strip().endswith('-F __gg_lazy_complete git')
+
+    # ...the first TAB loads the rest, and completes as usual
+    assert bash.complete("git clone git@git") == [ "git@github.com:", "git@gitlab.com:" ]
+    assert _loaded(bash) == 'loaded'
+    assert bash.run("complete -p git").strip().endswith('-F _git git')
+    assert bash.complete("git clone git@gitl") == "ab.com:"
+
+def test_git_get(bash, projects):
+    assert bash.complete("git-get git@github.com:") == [ 'bar/', 'baz/', 'foo/' ]
+    assert bash.run("complete -p git-get").strip().endswith('-F _git_get git-get')
+    assert bash.complete("git get git@github.com:b") == [ 'bar/', 'baz/' ]
+
+@pytest.mark.skipif(not os.path.exists(_GIT_COMPLETION), reason="git's completion isn't installed")
+def test_git_completion(bash):
+    # with git's own completion, git is handed back to it once we're loaded
+    bash.run(f"source '{_GIT_COMPLETION}'; GG_LAZY=1 source '{os.path.dirname(__file__)}/../git-clone-completion.bash'", expect_output=False)
+    assert bash.complete("git clone git@gith") == "ub.com:"
+    assert bash.run("complete -p git").strip().endswith('-F __git_wrap__git_main git')
+    assert bash.complete("git clone --recurse-sub") == "modules "
@@ -0,0 +1,97 @@
+from conftest import *
+
+def _orgs(homedir, service='github', env=None):
+    out = bash_script(f'_get_org_list {service} "${{PROJECTS:-$HOME/projects}}/{service}.com"; printf "%s\\n" "${{ORGS[@]}}"', homedir, env=env)
+    return [ line for line in out.split('\n') if line ]
+
+def _wait_unlocked(homedir, service):
+    lock = os.path.join(homedir, f'.cache/git-clone-completion/{service}@orgs.lock')
+    for _ in range(100):
+        if not os.path.exists(lock):
+            return
+        time.sleep(0.05)
+
+def test_local_index(tmp_path):
+    homedir = str(tmp_path)
+    projects = os.path.join(homedir, 'projects/github.com')
+    for org in [ 'foo', 'bar', '.hidden', 'with space' ]:
+        os.makedirs(os.path.join(projects, org))
+    assert _orgs(homedir) == [ 'bar', 'foo' ]
+
+    # the index is only rebuilt when the directory changes
+    index = os.path.join(homedir, '.cache/git-clone-completion/github@orgs.index')
+    with open(index, 'a') as fp:
+        fp.write('stale\n')
+    assert _orgs(homedir) == [ 'bar', 'foo', 'stale' ]
+
+    os.makedirs(os.path.join(projects, 'baz'))
+    os.utime(index, (0, 0))
+    assert _orgs(homedir) == [ 'bar', 'baz', 'foo' ]
+
+    # ...or $PROJECTS does
+    os.makedirs(os.path.join(homedir, 'elsewhere/github.com/qux'))
+    assert _orgs(homedir, env=dict(PROJECTS=os.path.join(homedir, 'elsewhere'))) == [ 'qux' ]
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_memberships(tmp_path, mockapi, service):
+    homedir = str(tmp_path)
+    os.makedirs(os.path.join(homedir, f'projects/{service}.com/local'))
+    mockapi.add_memberships(service, [ 'acme', 'local' ])
+
+    # without credentials, only the local directories are offered
+    assert _orgs(homedir, service, env=mockapi.env()) == [ 'local' ]
+    assert mockapi.count() == 0
+
+    # with them, the user's orgs are fetched in the background, and merged
+    # into the index once they arrive
+    fake_auth(homedir, [service])
+    _orgs(homedir, service, env=mockapi.env())
+    _wait_unlocked(homedir, service)
+    assert _orgs(homedir, service, env=mockapi.env()) == [ 'acme', 'local', 'me' ]
+
+    # ...and aren't asked for again until they're $GG_ORGS_TTL old
+    n = mockapi.count()
+    _orgs(homedir, service, env=mockapi.env())
+    _wait_unlocked(homedir, service)
+    assert mockapi.count() == n
+
+def test_many_memberships(tmp_path, mockapi):
+    # GitHub lists the orgs 100 at a time; we get all the pages
+    homedir = str(tmp_path)
+    os.makedirs(os.path.join(homedir, 'projects/github.com'))
+    fake_auth(homedir, ['github'])
+    orgs = [ f'org{i:03d}' for i in range(250) ]
+    mockapi.add_memberships('github', orgs)
+
+    _orgs(homedir, env=mockapi.env())
+    _wait_unlocked(homedir, 'github')
+    assert _orgs(homedir, env=mockapi.env()) == sorted(orgs + [ 'me' ])
+    assert mockapi.count('/graphql') == 3
+
+def test_failed_fetch(tmp_path, mockapi):
+    homedir = str(tmp_path)
+    os.makedirs(os.path.join(homedir, 'projects/github.com/local'))
+    fake_auth(homedir, ['github'])
+    mockapi.fail_status = 500
+
+    # the local directories are still offered, and the refresh backs off
+    _orgs(homedir, env=mockapi.env())
+    _wait_unlocked(homedir, 'github')
+    n = mockapi.count()
+    assert _orgs(homedir, env=mockapi.env()) == [ 'local' ]
+    assert mockapi.count() == n
+
+@pytest.mark.env(ignore_changes=r"^([+-]GG_API_github=.*|\+RANDOM=.*)$")
+class TestOrgCompletion:
+    def test_complete(self, bash, projects, mockapi):
+        fake_auth(bash.homedir, ['github'])
+        mockapi.add_memberships('github', [ 'acme' ])
+        bash.run(f"GG_API_github={mockapi.url}", expect_output=False)
+
+        # the first completion comes from the local directories...
+        assert bash.complete("git clone git@github.com:") == [ 'bar/', 'baz/', 'foo/' ]
+        _wait_unlocked(bash.homedir, 'github')
+
+        # ...later ones include the user's orgs
+        assert bash.complete("git clone git@github.com:") == [ 'acme/', 'bar/', 'baz/', 'foo/', 'me/' ]
+        assert bash.complete("git clone git@github.com:ac") == 'me/'
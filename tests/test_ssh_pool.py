@@ -0,0 +1,31 @@
+from conftest import *
+
+def _connections(ssh_standin):
+    with open(os.path.join(os.path.dirname(ssh_standin), 'ssh.log')) as fp:
+        return fp.read().split()
+
+# the directory snapshots (and their background prefetches) would get in the
+# way of counting connections; the tests turn them off
+@pytest.mark.env(ignore_changes=r"^([+-](PATH|GG_SSH_\w+|__ssh_\w*)=.*|\+RANDOM=.*)$")
+class TestSSHPool:
+    def test_switch_hosts(self, bash, ssh_standin):
+        bash.run(f'PATH="{ssh_standin}:$PATH"; GG_SSH_SNAPSHOT_TTL=0', expect_output=False)
+        try:
+            # alternating between hosts reuses their connections
+            for _ in range(3):
+                for host in [ 'test-dummy-a', 'test-dummy-b' ]:
+                    assert bash.complete(f"git clone {host}:foo/") == 'rep '
+            assert _connections(ssh_standin) == [ 'test-dummy-a', 'test-dummy-b' ]
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
+
+    def test_lru_eviction(self, bash, ssh_standin):
+        bash.run(f'PATH="{ssh_standin}:$PATH"; GG_SSH_SNAPSHOT_TTL=0 GG_SSH_POOL_SIZE=2', expect_output=False)
+        try:
+            # b is the least recently used when c comes along, so it's the
+            # one that gets evicted
+            for host in 'abacab':
+                assert bash.complete(f"git clone test-dummy-{host}:foo/") == 'rep '
+            assert _connections(ssh_standin) == [ f'test-dummy-{host}' for host in 'abcb' ]
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
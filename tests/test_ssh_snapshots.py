@@ -0,0 +1,86 @@
+from conftest import *
+
+def _wait_prefetched(bash, host):
+    lock = os.path.join(bash.homedir, f'.cache/git-clone-completion/ssh.snapshots/{host}.lock')
+    for _ in range(100):
+        if not os.path.exists(lock):
+            return
+        time.sleep(0.05)
+
+@pytest.mark.env(ignore_changes=r"^([+-](PATH|GG_SSH_\w+|__ssh_\w*)=.*|\+RANDOM=.*)$")
+class TestSSHSnapshots:
+    def test_snapshots(self, bash, ssh_standin):
+        bash.run(f'PATH="{ssh_standin}:$PATH"', expect_output=False)
+        try:
+            assert bash.complete("git clone test-dummy-a:") == [ 'foo/', 'weird/' ]
+            _wait_prefetched(bash, 'test-dummy-a')
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
+
+        # with ssh gone, the visited directory and the ones one level down
+        # (prefetched in the background) are still completed
+        os.remove(os.path.join(ssh_standin, 'ssh'))
+        assert bash.complete("git clone test-dummy-a:f") == 'oo/'
+        assert bash.complete("git clone test-dummy-a:foo/") == 'rep '
+        assert bash.complete("git clone test-dummy-a:weird/") == sorted([ r'weird/a\ b\ c/', r'weird/x\ \&\ \[\]\ \:\ \$\ xx\ \?/', r'weird/bar/', r'weird/x\ \=\ y/' ])
+        assert bash.complete("git clone test-dummy-a:weird/x\\ \\") == sorted([ r'weird/x\ \&\ \[\]\ \:\ \$\ xx\ \?/', r'weird/x\ \=\ y/' ])
+
+        # ...but not below that, nor after they've been invalidated
+        assert bash.complete("git clone test-dummy-a:weird/bar/") == []
+        bash.run("gg-ssh-invalidate test-dummy-a:foo", expect_output=False)
+        assert bash.complete("git clone test-dummy-a:foo/") == []
+        assert bash.complete("git clone test-dummy-a:weird/") != []
+
+    def test_expiration(self, bash, ssh_standin):
+        bash.run(f'PATH="{ssh_standin}:$PATH"; GG_SSH_SNAPSHOT_TTL=2', expect_output=False)
+        try:
+            assert bash.complete("git clone test-dummy-a:foo/") == 'rep '
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
+        os.remove(os.path.join(ssh_standin, 'ssh'))
+
+        # fresh snapshots are used, expired ones make us ask the host again
+        assert bash.complete("git clone test-dummy-a:foo/") == 'rep '
+        time.sleep(2.1)
+        assert bash.complete("git clone test-dummy-a:foo/") == []
+
+    def test_expired_deletions(self, bash, ssh_standin):
+        # an expired snapshot is replaced, not added to, so directories that
+        # are gone from the host are no longer offered
+        remote = os.path.join(os.path.dirname(ssh_standin), 'remote')
+        for d in [ 'A', 'B' ]:
+            os.makedirs(os.path.join(remote, 'exp', d))
+
+        bash.run(f'PATH="{ssh_standin}:$PATH"; GG_SSH_SNAPSHOT_TTL=1', expect_output=False)
+        try:
+            assert bash.complete("git clone test-dummy-a:exp/") == [ 'exp/A/', 'exp/B/' ]
+            _wait_prefetched(bash, 'test-dummy-a')
+
+            os.rmdir(os.path.join(remote, 'exp', 'B'))
+            os.makedirs(os.path.join(remote, 'exp', 'C'))
+            time.sleep(1.1)
+            assert bash.complete("git clone test-dummy-a:exp/") == [ 'exp/A/', 'exp/C/' ]
+            assert bash.complete("git clone test-dummy-a:exp/") == [ 'exp/A/', 'exp/C/' ]
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
+
+    def test_prefetch_quoting(self, bash, ssh_standin):
+        # the prefetch quotes the names for a POSIX remote shell, whatever
+        # characters they contain
+        remote = os.path.join(os.path.dirname(ssh_standin), 'remote')
+        names = [ "it's", "a\tb", 'x $y "z" \\w' ]
+        for name in names:
+            os.makedirs(os.path.join(remote, 'q', name, 'sub'))
+
+        bash.run(f'PATH="{ssh_standin}:$PATH"', expect_output=False)
+        try:
+            assert len(bash.complete("git clone test-dummy-a:q/")) == 3
+            _wait_prefetched(bash, 'test-dummy-a')
+        finally:
+            bash.run("__mj_ssh_stop", expect_output=False)
+
+        snapdir = os.path.join(bash.homedir, '.cache/git-clone-completion/ssh.snapshots/test-dummy-a')
+        for name in names:
+            key = f'q/{name}/'.replace('%', '%25').replace('/', '%2F')
+            with open(os.path.join(snapdir, f'_{key}')) as fp:
+                assert fp.read().split('\n')[1:] == [ 'd sub', '' ]
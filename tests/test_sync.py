@@ -0,0 +1,424 @@
+from conftest import *
+
+def _refresh(homedir, mockapi, service, org):
+    cache = os.path.join(homedir, f'.cache/git-clone-completion/{service}.{org}.cache')
+    bash_script(f'_refresh_repo_cache {service} {org} "{cache}"', homedir, env=mockapi.env())
+    with open(cache) as fp:
+        return fp.read().split()
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_incremental_refresh(tmp_path, mockapi, service):
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+
+    # an org spanning multiple pages
+    repos = [ f'repo{i:03d}' for i in range(250) ]
+    mockapi.add_repos(service, 'big', repos, updated=time.time() - 86400)
+
+    # the first refresh downloads everything
+    assert _refresh(homedir, mockapi, service, 'big') == repos
+    assert mockapi.count() == 3
+
+    # if nothing changed, a refresh should cost a single request
+    mockapi.reset_counts()
+    assert _refresh(homedir, mockapi, service, 'big') == repos
+    assert mockapi.count() == 1
+
+    # ...and still be cheap after that (the request is conditional)
+    mockapi.reset_counts()
+    assert _refresh(homedir, mockapi, service, 'big') == repos
+    assert mockapi.count() == 1
+
+    # new repositories get merged in
+    mockapi.reset_counts()
+    mockapi.add_repos(service, 'big', [ 'new-repo' ])
+    assert _refresh(homedir, mockapi, service, 'big') == sorted(repos + [ 'new-repo' ])
+    assert mockapi.count() == 1
+
+def test_full_refresh(tmp_path, mockapi):
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['gitlab'])
+
+    mockapi.add_repos('gitlab', 'org', [ 'a', 'b', 'c' ], updated=time.time() - 86400)
+    assert _refresh(homedir, mockapi, 'gitlab', 'org') == [ 'a', 'b', 'c' ]
+
+    # deletions are only noticed by full refreshes
+    mockapi.remove_repo('gitlab', 'org', 'b')
+    assert _refresh(homedir, mockapi, 'gitlab', 'org') == [ 'a', 'b', 'c' ]
+
+    cache = os.path.join(homedir, '.cache/git-clone-completion/gitlab.org.cache')
+    bash_script(f'GG_FULL_REFRESH=0 _refresh_repo_cache gitlab org "{cache}"', homedir, env=mockapi.env())
+    with open(cache) as fp:
+        assert fp.read().split() == [ 'a', 'c' ]
+
+@pytest.mark.parametrize("service", [ 'gitlab', 'bitbucket' ])
+def test_concurrent_pages(tmp_path, mockapi, service):
+    # with the number of pages known up front, pages 2..N should be
+    # downloaded concurrently
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+
+    repos = [ f'repo{i:04d}' for i in range(1000) ]
+    mockapi.add_repos(service, 'big', repos)
+    mockapi.latency = 0.1
+
+    peaks = {}
+    for workers in [ 1, 4 ]:
+        cache = os.path.join(homedir, f'{service}.big{workers}.txt')
+        mockapi.reset_counts()
+        bash_script(f'''
+            GG_FETCH_WORKERS={workers}
+            _{service}_repo_list big | LC_ALL=C sort > "{cache}"
+        ''', homedir, env=mockapi.env())
+        peaks[workers] = mockapi.max_in_flight
+
+        with open(cache) as fp:
+            assert fp.read().split() == repos, f"wrong list with {workers} workers"
+
+    assert peaks[1] == 1 and peaks[4] > 1, f"requests in flight at once: {peaks}"
+
+def test_github_large_org(tmp_path, mockapi):
+    # listing an org's repositories isn't capped at 1000 results, as the
+    # search API is
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+
+    repos = [ f'repo{i:04d}' for i in range(2500) ]
+    mockapi.add_repos('github', 'big', repos)
+    assert _refresh(homedir, mockapi, 'github', 'big') == repos
+    assert mockapi.count() == 25
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_many_pages(tmp_path, mockapi, service):
+    # every page of a long listing is fetched, with a request each
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    repos = mockapi.add_repos(service, 'org', 250)
+    mockapi.page_size = 7
+
+    assert _refresh(homedir, mockapi, service, 'org') == repos
+    assert mockapi.count() == 36
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_failed_page(tmp_path, mockapi, service):
+    # if any page fails, the refresh does, and the old list is kept
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    repos = mockapi.add_repos(service, 'org', 50)
+    mockapi.page_size = 10
+    assert _refresh(homedir, mockapi, service, 'org') == repos
+
+    mockapi.add_repos(service, 'org', [ 'new' ])
+    mockapi.fail(502, after=2, count=1)
+    cache = os.path.join(homedir, f'.cache/git-clone-completion/{service}.org.cache')
+    out = bash_script(f'GG_FULL_REFRESH=0 _refresh_repo_cache {service} org "{cache}" || echo failed', homedir, env=mockapi.env())
+    assert out == 'failed\n'
+    with open(cache) as fp:
+        assert fp.read().split() == repos
+    assert _meta(homedir, service, 'org')['failures'] == '1'
+
+    # (the next one goes through)
+    assert _refresh(homedir, mockapi, service, 'org') == sorted(repos + [ 'new' ])
+
+def test_github_batch(tmp_path, mockapi):
+    # several orgs are listed with a single request per page
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.add_repos('github', 'alice', [ f'a{i:03d}' for i in range(150) ])
+    mockapi.add_repos('github', 'bob', [ 'b1' ])
+
+    out = bash_script('''
+        d=$(mktemp -d)
+        _github_repo_lists "$d" alice bob nobody && echo ok
+        wc -l < "$d/alice"; cat "$d/bob"; [[ -f $d/nobody ]] || echo "no-nobody"
+    ''', homedir, env=mockapi.env())
+    assert out.split() == [ 'ok', '150', 'b1', 'no-nobody' ]
+    assert mockapi.count() == 2
+
+    # gg-prefetch refreshes GitHub orgs in batches
+    for org in [ 'alice', 'bob', 'nobody' ]:
+        os.makedirs(os.path.join(homedir, 'projects/github.com', org))
+    mockapi.reset_counts()
+    out = bash_script('gg-prefetch github; echo "rc=$?"', homedir, env=mockapi.env()).splitlines()
+    assert out[-1] == 'rc=1'
+    lines = sorted(line.split()[0] + ' ' + line.split()[-1] for line in out[:-1])
+    assert lines == [ 'failed github.com/nobody', 'ok github.com/alice', 'ok github.com/bob' ]
+    assert mockapi.count() == 2
+
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    with open(os.path.join(cachedir, 'github.alice.cache')) as fp:
+        assert len(fp.read().split()) == 150
+    assert not [ fn for fn in os.listdir(cachedir) if fn.endswith('.lock') ]
+
+def _wait_unlocked(homedir, service, org):
+    lock = os.path.join(homedir, f'.cache/git-clone-completion/{service}.{org}.lock')
+    for _ in range(200):
+        if not os.path.exists(lock):
+            return
+        time.sleep(0.05)
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_cold_search(tmp_path, mockapi, service):
+    # the first completion in an org doesn't wait for the full list if the
+    # service can search for the typed prefix
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    repos = [ f'repo{i:04d}' for i in range(1000) ]
+    mockapi.add_repos(service, 'big', repos)
+    mockapi.latency = 0.2
+
+    # (the answer comes back while the list, 10 pages one after the other,
+    # is still downloading)
+    script = 'GG_FETCH_WORKERS=1 _get_repo_list {service} big {prefix}; printf "%s\\n" "${{REPOS[@]}}"'
+    out = bash_script(script.format(service=service, prefix='repo099'), homedir, env=mockapi.env())
+    assert sorted(out.split()) == [ f'repo099{i}' for i in range(10) ]
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    assert os.path.exists(os.path.join(cachedir, f'{service}.big.lock'))
+    assert not os.path.exists(os.path.join(cachedir, f'{service}.big.cache'))
+
+    # ...which keeps downloading in the background
+    _wait_unlocked(homedir, service, 'big')
+    out = bash_script(script.format(service=service, prefix=''), homedir, env=mockapi.env())
+    assert out.split() == repos
+    assert not os.path.exists(os.path.join(homedir, f'.cache/git-clone-completion/{service}.big.partial'))
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_cold_partial(tmp_path, mockapi, service):
+    # without anything to search for, the first completion returns as soon
+    # as the first page(s) are in
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    repos = [ f'repo{i:04d}' for i in range(1000) ]
+    mockapi.add_repos(service, 'big', repos)
+    mockapi.latency = 0.2
+
+    out = bash_script(f'GG_FETCH_WORKERS=1 _get_repo_list {service} big; printf "%s\\n" "${{REPOS[@]}}"', homedir, env=mockapi.env())
+    assert 0 < len(out.split()) < 1000
+    assert set(out.split()) <= set(repos)
+    _wait_unlocked(homedir, service, 'big')
+
+@pytest.mark.parametrize("search", [ True, False ])
+def test_cold_unique(tmp_path, mockapi, search):
+    # a single match among what's been found or arrived so far is offered
+    # as a suggestion rather than completed, as the full list may have more
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.add_repos('github', 'big', [ f'repo{i:04d}' for i in range(1000) ])
+    mockapi.latency = 0.2
+
+    prefix = 'repo0999' if search else 'repo0000'
+    script = '' if search else 'unset -f _github_repo_search; '
+    script += f'GG_FETCH_WORKERS=1 _complete_fragment github git@github.com: big/{prefix}; printf "%s\\n" "${{COMPREPLY[@]}}"'
+    assert bash_script(script, homedir, env=mockapi.env()).split('\n') == [ f'big/{prefix} ', '\u00a0', '' ]
+
+    # ...while the full list completes it
+    _wait_unlocked(homedir, 'github', 'big')
+    assert bash_script(script, homedir, env=mockapi.env()).split('\n') == [ f'git@github.com:big/{prefix} ', '' ]
+
+def _meta(homedir, service, org):
+    with open(os.path.join(homedir, f'.cache/git-clone-completion/{service}.{org}.meta')) as fp:
+        return dict(line.rstrip('\n').split('=', 1) for line in fp)
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_failed_refresh(tmp_path, mockapi, service):
+    # a failed refresh keeps the old list, and backs off exponentially
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+
+    mockapi.add_repos(service, 'org', [ 'a', 'b', 'c' ])
+    assert _refresh(homedir, mockapi, service, 'org') == [ 'a', 'b', 'c' ]
+    assert _meta(homedir, service, 'org')['failures'] == '0'
+
+    mockapi.fail_status = 500
+    cache = os.path.join(homedir, f'.cache/git-clone-completion/{service}.org.cache')
+    for failures in [ 1, 2 ]:
+        now = time.time()
+        out = bash_script(f'GG_FULL_REFRESH=0 GG_CACHE_TTL=10 _refresh_repo_cache {service} org "{cache}" || echo failed', homedir, env=mockapi.env())
+        assert out == 'failed\n'
+        with open(cache) as fp:
+            assert fp.read().split() == [ 'a', 'b', 'c' ]
+
+        meta = _meta(homedir, service, 'org')
+        assert meta['failures'] == str(failures)
+        assert int(meta['next_refresh']) - now == pytest.approx(10 * 2**failures, abs=2)
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_ratelimit(tmp_path, mockapi, service):
+    # when running low on requests, wait for the rate limit to reset
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+    mockapi.add_repos(service, 'org', [ 'a', 'b', 'c' ])
+
+    mockapi.ratelimit_remaining = 10
+    mockapi.ratelimit_reset = time.time() + 600
+    assert _refresh(homedir, mockapi, service, 'org') == [ 'a', 'b', 'c' ]
+
+    meta = _meta(homedir, service, 'org')
+    assert meta['ratelimit_remaining'] == '9'
+    assert int(meta['next_refresh']) >= int(mockapi.ratelimit_reset)
+
+def test_single_flight(tmp_path, mockapi):
+    # concurrent completions share a single refresh, and stale lists are
+    # served while they're being refreshed
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['gitlab'])
+    mockapi.add_repos('gitlab', 'org', [ 'a', 'b', 'c' ])
+    mockapi.latency = 0.5
+
+    import concurrent.futures
+    script = '_get_repo_list gitlab org; printf "%s\\n" "${REPOS[@]}"'
+    with concurrent.futures.ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda _: bash_script(script, homedir, env=mockapi.env()), range(5)))
+    assert results == [ 'a\nb\nc\n' ] * 5
+    assert mockapi.count() == 1
+
+    # the list is fresh for GG_CACHE_TTL seconds
+    mockapi.reset_counts()
+    assert bash_script(script, homedir, env=mockapi.env()) == 'a\nb\nc\n'
+    assert mockapi.count() == 0
+
+    # once stale, we get the old list right away while it's refreshed
+    mockapi.add_repos('gitlab', 'org', [ 'd' ])
+    t0 = time.time()
+    assert bash_script(f'GG_CACHE_TTL=0; {script}', homedir, env=mockapi.env()) == 'a\nb\nc\n'
+    assert time.time() - t0 < mockapi.latency
+
+    cache = os.path.join(homedir, '.cache/git-clone-completion/gitlab.org.cache')
+    for _ in range(50):
+        if not os.path.exists(cache[:-len('.cache')] + '.lock'):
+            break
+        time.sleep(0.1)
+    with open(cache) as fp:
+        assert fp.read().split() == [ 'a', 'b', 'c', 'd' ]
+
+def test_failed_first_refresh(tmp_path, mockapi):
+    # the first completion doesn't hang if the list can't be downloaded
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['gitlab'])
+    mockapi.fail_status = 500
+
+    out = bash_script('_get_repo_list gitlab org || echo "failed (${#REPOS[@]})"', homedir, env=mockapi.env())
+    assert out == 'failed (0)\n'
+    assert _meta(homedir, 'gitlab', 'org')['failures'] == '1'
+
+@pytest.mark.parametrize("service", [ 'github', 'gitlab', 'bitbucket' ])
+def test_missing_org(tmp_path, mockapi, service):
+    # an org that doesn't exist isn't asked for again for GG_NEGATIVE_TTL
+    # seconds
+    homedir = str(tmp_path)
+    fake_auth(homedir, [service])
+
+    script = f'_get_repo_list {service} nobody || echo "failed (${{#REPOS[@]}})"'
+    now = time.time()
+    assert bash_script(script, homedir, env=dict(mockapi.env(), GG_NEGATIVE_TTL='100')) == 'failed (0)\n'
+    meta = _meta(homedir, service, 'nobody')
+    assert int(meta['miss_at']) == pytest.approx(now, abs=2)
+    assert int(meta['next_refresh']) - now == pytest.approx(100, abs=2)
+    assert mockapi.count() > 0
+
+    mockapi.reset_counts()
+    assert bash_script(script, homedir, env=mockapi.env()) == 'failed (0)\n'
+    assert mockapi.count() == 0
+
+    # ...and is forgotten once it's been found
+    mockapi.add_repos(service, 'nobody', [ 'a' ])
+    assert _refresh(homedir, mockapi, service, 'nobody') == [ 'a' ]
+    assert _meta(homedir, service, 'nobody')['miss_at'] == ''
+
+@pytest.mark.parametrize("error", [ None, 'NOT_FOUND', 'INTERNAL' ])
+def test_github_missing_org(tmp_path, mockapi, error):
+    # GitHub answers with a null owner for an org that doesn't exist, with
+    # or without a NOT_FOUND error; any other error is a failure
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['github'])
+    mockapi.github_missing_error = error
+
+    assert bash_script('_get_repo_list github nobody || echo failed', homedir, env=mockapi.env()) == 'failed\n'
+    assert bool(_meta(homedir, 'github', 'nobody').get('miss_at')) == (error != 'INTERNAL')
+
+def test_gitlab_owner_type(tmp_path, mockapi):
+    # GitLab lists users' and groups' projects with different requests;
+    # once we know which an org is, we ask for it directly
+    homedir = str(tmp_path)
+    fake_auth(homedir, ['gitlab'])
+    mockapi.add_repos('gitlab', 'grp', [ 'a', 'b' ], owner='group')
+    mockapi.add_repos('gitlab', 'usr', [ 'c' ], owner='user')
+
+    assert _refresh(homedir, mockapi, 'gitlab', 'grp') == [ 'a', 'b' ]
+    assert _refresh(homedir, mockapi, 'gitlab', 'usr') == [ 'c' ]
+    assert _meta(homedir, 'gitlab', 'grp')['owner_type'] == 'group'
+    assert _meta(homedir, 'gitlab', 'usr')['owner_type'] == 'user'
+
+    mockapi.reset_counts()
+    cache = os.path.join(homedir, '.cache/git-clone-completion/gitlab.grp.cache')
+    bash_script(f'GG_FULL_REFRESH=0 _refresh_repo_cache gitlab grp "{cache}"', homedir, env=mockapi.env())
+    assert mockapi.count('/api/v4/groups/grp/') == 1
+    assert mockapi.count() == 1
+
+def test_prefetch(tmp_path, mockapi):
+    # gg-prefetch refreshes every org we have a directory for
+    homedir = str(tmp_path)
+    fake_auth(homedir, [ 'github', 'gitlab' ])
+    for host, org in [ ('github.com', 'alice'), ('github.com', 'bob'), ('gitlab.com', 'carol'), ('bitbucket.org', 'dave') ]:
+        os.makedirs(os.path.join(homedir, 'projects', host, org))
+    mockapi.add_repos('github', 'alice', [ 'a1', 'a2' ])
+    mockapi.add_repos('github', 'bob', [ 'b1' ])
+    mockapi.add_repos('gitlab', 'carol', [ 'c1' ])
+
+    out = bash_script('gg-prefetch -j 2', homedir, env=mockapi.env())
+    lines = sorted(line.split()[0] + ' ' + line.split()[-1] for line in out.splitlines() if not line.startswith('skipped'))
+    assert lines == [ 'ok github.com/alice', 'ok github.com/bob', 'ok gitlab.com/carol' ]
+    assert 'bitbucket.org (run init-bitbucket-completion to authenticate)' in out
+
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    with open(os.path.join(cachedir, 'github.alice.cache')) as fp:
+        assert fp.read().split() == [ 'a1', 'a2' ]
+    assert not os.path.exists(os.path.join(cachedir, 'prefetch.lock'))
+
+    # from cron: quiet unless something fails, and an error exit code if so
+    mockapi.fail_status = 500
+    lib = os.path.join(os.path.dirname(__file__), '..', 'git-clone-completion.bash')
+    env = dict(os.environ, HOME=homedir, **mockapi.env())
+    p = subprocess.run([ 'bash', lib, 'sync', '-q', 'gitlab' ], env=env, stdout=subprocess.PIPE, encoding='utf-8')
+    assert p.returncode == 1
+    assert [ line.split()[0] + ' ' + line.split()[-1] for line in p.stdout.splitlines() ] == [ 'failed gitlab.com/carol' ]
+
+    # ...and leave backing-off orgs alone
+    p = subprocess.run([ 'bash', lib, 'sync', 'gitlab' ], env=env, stdout=subprocess.PIPE, encoding='utf-8')
+    assert p.returncode == 0
+    assert p.stdout.split() == [ 'deferred', 'gitlab.com/carol' ]
+
+def test_prefetch_busy(tmp_path, mockapi):
+    # orgs someone else is refreshing are reported as such, not as done
+    homedir = str(tmp_path)
+    fake_auth(homedir, [ 'github', 'gitlab' ])
+    cachedir = os.path.join(homedir, '.cache/git-clone-completion')
+    os.makedirs(cachedir)
+    for host, service, org in [ ('github.com', 'github', 'alice'), ('github.com', 'github', 'bob'), ('gitlab.com', 'gitlab', 'carol') ]:
+        os.makedirs(os.path.join(homedir, 'projects', host, org))
+        mockapi.add_repos(service, org, [ 'r' ])
+    for lock in [ 'github.bob.lock', 'gitlab.carol.lock' ]:
+        open(os.path.join(cachedir, lock), 'w').close()
+
+    out = bash_script('gg-prefetch github gitlab', homedir, env=mockapi.env())
+    lines = sorted(line.split()[0] + ' ' + line.split()[-1] for line in out.splitlines())
+    assert lines == [ 'busy github.com/bob', 'busy gitlab.com/carol', 'ok github.com/alice' ]
+    assert sorted(fn for fn in os.listdir(cachedir) if fn.endswith('.cache')) == [ 'github.alice.cache' ]
+
+@pytest.mark.env(ignore_changes=r"^([+-]GG_API_github=.*|\+RANDOM=.*)$")
+class TestColdCompletion:
+    def test_survives_interrupt(self, bash, mockapi):
+        # the download started by the first completion carries on after
+        # it's returned, and the user's pressed ^C
+        fake_auth(bash.homedir, ['github'])
+        repos = [ f'repo{i:04d}' for i in range(300) ]
+        mockapi.add_repos('github', 'big', repos)
+        bash.run(f"GG_API_github={mockapi.url}", expect_output=False)
+
+        assert bash.complete("git clone git@github.com:big/repo000") == [ f'big/repo000{i}' for i in range(10) ]
+        bash.sendintr()
+        bash.expect_exact(bash.PS1)
+        _wait_unlocked(bash.homedir, 'github', 'big')
+        assert bash.complete("git clone git@github.com:big/repo029") == [ f'big/repo029{i}' for i in range(10) ]
+        with open(os.path.join(bash.homedir, '.cache/git-clone-completion/github.big.cache')) as fp:
+            assert fp.read().split() == repos
@@ -0,0 +1,46 @@
+from conftest import *
+
+import json
+
+@pytest.mark.env(ignore_changes=r"^[+-](GG_TRACE|__gg_trace_stack|BASHPID|EPOCHREALTIME)=.*$")
+class TestTrace:
+    def test_trace(self, bash):
+        fake_auth(bash.homedir, ['github'])
+        cachedir = os.path.join(bash.homedir, '.cache/git-clone-completion')
+        os.makedirs(cachedir)
+        with open(os.path.join(cachedir, 'github.foo.cache'), 'w') as fp:
+            fp.write('bar\nbaz\nfoo\n')
+        with open(os.path.join(cachedir, 'github.foo.meta'), 'w') as fp:
+            fp.write(f'last_sync={int(time.time()) + 3600}\n')
+
+        # nothing is traced by default
+        trace = os.path.join(bash.homedir, 'trace.jsonl')
+        assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+        assert not os.path.exists(trace)
+
+        bash.run(f"GG_TRACE='{trace}'", expect_output=False)
+        for _ in range(3):
+            assert bash.complete("git clone git@github.com:foo/b") == [ 'foo/bar', 'foo/baz' ]
+
+        with open(trace) as fp:
+            spans = [ json.loads(line) for line in fp ]
+        complete = [ s for s in spans if s['span'] == 'complete' ]
+        assert len(complete) == 3
+        assert all(s['depth'] == 0 for s in complete)
+        assert { 'reassemble', 'arg_index', 'cache_read', 'prefix_match', 'fancy' } <= { s['span'] for s in spans }
+        # (the in-shell memo, where there is one, returns just the matches)
+        memo = bash.run("echo ${__gg_memo_assoc:-0}").strip() == '1'
+        repos = '2' if memo else '3'
+        assert all(s['repos'] == repos for s in spans if s['span'] == 'cache_read')
+
+        # nested spans lie within their parents
+        outer = complete[0]
+        for s in spans:
+            if s['depth'] > 0 and s['t'] < complete[1]['t']:
+                assert outer['t'] <= s['t'] and s['t'] + s['dur_us'] <= outer['t'] + outer['dur_us']
+
+        report = bash.run("gg-trace-report").strip().splitlines()
+        assert report[0].split()[0] == 'span'
+        rows = { line.split()[0]: line.split() for line in report[1:] }
+        assert rows['complete'][1] == '3' and rows['complete'][3] == '100.0%'
+        assert rows['cache_read'][1] == '3'